@@ -52,11 +52,26 @@ def create_app(config_class=Config):
             os.makedirs(app.config['UPLOAD_FOLDER'])
 
     from .wages import deduct_daily_wages
+    from .ledger import snapshot_ledger
+    from .forecast import forecast_jars
+    from .reorder import refresh_reorders
+    from .periods import close_periods
+    from .partitions import create_partitions
     
     if not scheduler.running:
         scheduler.init_app(app)
         if not scheduler.get_job('deduct-wages'):
             scheduler.add_job(id='deduct-wages', func=deduct_daily_wages, args=[app], trigger='cron', hour=20, minute=0)
+        if not scheduler.get_job('ledger-snapshots'):
+            scheduler.add_job(id='ledger-snapshots', func=snapshot_ledger, args=[app], trigger='cron', hour=23, minute=30)
+        if not scheduler.get_job('jar-forecast'):
+            scheduler.add_job(id='jar-forecast', func=forecast_jars, args=[app], trigger='cron', hour=23, minute=45)
+        if not scheduler.get_job('reorder-suggestions'):
+            scheduler.add_job(id='reorder-suggestions', func=refresh_reorders, args=[app], trigger='cron', hour=0, minute=15)
+        if not scheduler.get_job('period-close'):
+            scheduler.add_job(id='period-close', func=close_periods, args=[app], trigger='cron', hour=0, minute=30)
+        if not scheduler.get_job('table-partitions'):
+            scheduler.add_job(id='table-partitions', func=create_partitions, args=[app], trigger='cron', hour=0, minute=45)
         scheduler.start()
 
     # --- Register Blueprints ---
@@ -98,6 +113,11 @@ def create_app(config_class=Config):
     app.register_blueprint(supplier_bp, url_prefix='/supplier')
     
     from app.models import User, Customer
+    from app import identity # Registers the LoginIdentity sync listener
+    from app import principal_cache # Registers the cache invalidation listeners
+    from app import report_cache # Registers the report data version listener
+    from app import instrumentation
+    instrumentation.init_app(app)
     from datetime import datetime
 
     from app.push_notifications import bp as push_notifications_bp
@@ -134,6 +154,24 @@ def create_app(config_class=Config):
     from . import seeder
     seeder.init_app(app)
 
+    from . import ledger
+    ledger.init_app(app)
+
+    from . import forecast
+    forecast.init_app(app)
+
+    from . import reorder
+    reorder.init_app(app)
+
+    from . import periods
+    periods.init_app(app)
+
+    from . import partitions
+    partitions.init_app(app)
+
+    from . import benchmarks
+    benchmarks.init_app(app)
+
     # --- CUSTOM TEMPLATE FILTERS ---
     @app.template_filter('to_ist')
     def to_ist_filter(utc_dt):
@@ -15,6 +15,10 @@ from wtforms.widgets import ListWidget, CheckboxInput
 from wtforms.fields import DateField as WTDateField # Use specific DateField import
 from flask_babel import _, lazy_gettext as _l
 from app.email import send_email
+from app.identity import identifier_taken, normalize_identifier
+from app.pagination import keyset_paginate, SortKey
+from app.loaders import load
+from app.unit_of_work import unit_of_work
 from sqlalchemy import func
 
 from functools import wraps
@@ -96,9 +100,8 @@ class AdminProfileForm(FlaskForm):
         self.original_email = original_email
 
     def validate_username(self, username):
-        if username.data != self.original_username:
-            user = User.query.filter(func.lower(User.username) == username.data.lower()).first()
-            if user is not None:
+        if normalize_identifier(username.data) != normalize_identifier(self.original_username):
+            if identifier_taken('username', username.data):
                 raise ValidationError(_('This username is already taken.'))
 
     def validate_mobile_number(self, mobile_number):
@@ -108,9 +111,8 @@ class AdminProfileForm(FlaskForm):
                 raise ValidationError(_('This mobile number is already registered.'))
 
     def validate_email(self, email):
-        if email.data and email.data != self.original_email:
-            user = User.query.filter(func.lower(User.email) == email.data.lower()).first()
-            if user:
+        if email.data and normalize_identifier(email.data) != normalize_identifier(self.original_email):
+            if identifier_taken('email', email.data):
                 raise ValidationError('This email address is already registered.')
 
 # --- MultiCheckboxField for Email Form ---
@@ -166,8 +168,7 @@ class UserForm(FlaskForm):
         self.business_id.choices = [(0, 'N/A')] + [(b.id, b.name) for b in Business.query.order_by('name').all()]
 
     def validate_username(self, username):
-        if User.query.filter(func.lower(User.username) == username.data.lower()).first() or \
-           Customer.query.filter(func.lower(Customer.username) == username.data.lower()).first():
+        if identifier_taken('username', username.data):
             raise ValidationError(_('This username is already taken.'))
 
     def validate(self, **kwargs):
@@ -210,9 +211,8 @@ class EditUserForm(FlaskForm):
         self.business_id.choices = [(0, 'N/A')] + [(b.id, b.name) for b in Business.query.order_by('name').all()]
 
     def validate_username(self, username):
-        if username.data != self.original_username:
-            if User.query.filter(func.lower(User.username) == username.data.lower()).first() or \
-               Customer.query.filter(func.lower(Customer.username) == username.data.lower()).first():
+        if normalize_identifier(username.data) != normalize_identifier(self.original_username):
+            if identifier_taken('username', username.data):
                 raise ValidationError(_('This username is already taken.'))
 
     def validate_mobile_number(self, mobile_number):
@@ -240,18 +240,21 @@ class EditUserForm(FlaskForm):
 @login_required
 @admin_required
 def dashboard():
-    # Pagination parameters
-    page_biz = request.args.get('page_biz', 1, type=int)
-    page_users = request.args.get('page_users', 1, type=int)
+    # Keyset pagination; each list keeps its own cursor
     per_page = 5 # Items per page for lists, adjust as needed
 
-    businesses_pagination = Business.query.order_by(Business.name).paginate(
-        page=page_biz, per_page=per_page, error_out=False
+    businesses_pagination = keyset_paginate(
+        Business.query, [SortKey(Business.name), SortKey(Business.id)],
+        cursor=request.args.get('biz_cursor'), per_page=per_page, count='estimate'
     )
 
-    users_pagination = User.query.filter(User.role.in_(['manager', 'staff', 'supplier'])).order_by(
-        User.business_id, User.role, User.username).paginate(
-        page=page_users, per_page=per_page, error_out=False
+    # Suppliers have no business; sort them first as business 0
+    users_pagination = keyset_paginate(
+        User.query.options(*load('user_with_business')).filter(User.role.in_(['manager', 'staff', 'supplier'])),
+        [SortKey(func.coalesce(User.business_id, 0), value=lambda u: u.business_id or 0),
+         SortKey(User.role), SortKey(func.coalesce(User.username, ''), value=lambda u: u.username or ''),
+         SortKey(User.id)],
+        cursor=request.args.get('users_cursor'), per_page=per_page, count='estimate'
     )
 
     return render_template(
@@ -389,6 +392,7 @@ def reset_stock(id):
 @bp.route('/user/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@unit_of_work
 def add_user():
     form = UserForm()
     if form.validate_on_submit():
@@ -427,7 +431,7 @@ def add_user():
 
         db.session.add(user)
         try:
-            db.session.commit() # Commit first to get user ID
+            db.session.flush() # Flush first to get user ID; everything commits together at the end
 
             if form.id_proof.data:
                 f = form.id_proof.data
@@ -435,7 +439,6 @@ def add_user():
                 filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
                 f.save(filepath)
                 user.id_proof_filename = filename
-                # No need to commit again immediately unless necessary, will commit with supplier profile if needed
 
             # Create Supplier Profile if role is supplier
             if form.role.data == 'supplier':
@@ -445,11 +448,7 @@ def add_user():
                     address=form.address.data # Use address from main form
                 )
                 db.session.add(supplier_profile)
-                db.session.commit() # Commit supplier profile
-            
-            elif user.id_proof_filename:
-                db.session.commit() # Commit ID proof filename if added
-            
+                db.session.flush()
 
             flash(_('User "%(username)s" has been created.', username=user.username))
             if not form.password.data:
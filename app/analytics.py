@@ -0,0 +1,124 @@
+# File: app/analytics.py
+
+from collections import namedtuple
+import numpy as np
+from sqlalchemy import select
+from app import db
+from app.models import (Customer, DailyLog, EventBooking, Expense, ProductSale, User,
+                        PurchaseOrder, PurchaseOrderItem, SupplierProduct, EXPENSE_CATEGORIES)
+from app.payroll import month_payroll
+
+# Monthly report metrics computed in memory: each table's rows for the month are
+# fetched once as column arrays and every metric is a NumPy group-by over them,
+# instead of one aggregate query per metric. Staff attendance and wages come from
+# app.payroll.
+
+CustomerTotal = namedtuple('CustomerTotal', 'name total_jars total_amount')
+ProductTotal = namedtuple('ProductTotal', 'product_name total_quantity total_amount')
+
+
+def _columns(stmt):
+    """The statement's result as {column name: object array}, from one round trip."""
+    result = db.session.execute(stmt)
+    names = list(result.keys())
+    rows = result.all()
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: np.array(column, dtype=object) for name, column in zip(names, columns)}
+
+
+def _numbers(column):
+    """Object column -> float array, NULL as 0 (as SUM ignores NULLs)."""
+    return np.nan_to_num(column.astype(float))
+
+
+def _ids(column):
+    """Object column of ids -> int64 array, NULL as -1."""
+    return np.nan_to_num(column.astype(float), nan=-1).astype(np.int64)
+
+
+def group_sum(keys, *values):
+    """(sorted unique keys, [per-key sum of each values array])."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, [np.bincount(inverse, weights=value, minlength=len(unique)) for value in values]
+
+
+def month_metrics(business, year, month, start, end):
+    """
+    Every monthly figure manager.reports shows for one business, for logs with a
+    timestamp in [start, end] (the month's UTC bounds): totals, expenses per category,
+    jars lost at events, per-customer and per-product summaries, and per-staff attendance and wages
+    (app.payroll). Eight queries at most, whatever the number of staff.
+    """
+    logs = _columns(select(DailyLog.customer_id, DailyLog.jars_delivered, DailyLog.amount_collected)
+                    .join(Customer, DailyLog.customer_id == Customer.id)
+                    .where(Customer.business_id == business.id, DailyLog.timestamp.between(start, end)))
+    sales = _columns(select(ProductSale.product_name, ProductSale.quantity, ProductSale.total_amount)
+                     .where(ProductSale.business_id == business.id, ProductSale.timestamp.between(start, end)))
+    events = _columns(select(EventBooking.final_amount, EventBooking.quantity, EventBooking.jars_returned)
+                      .join(Customer, EventBooking.customer_id == Customer.id)
+                      .where(Customer.business_id == business.id, EventBooking.status == 'Completed',
+                             EventBooking.collection_timestamp.between(start, end)))
+    expenses = _columns(select(Expense.amount, Expense.category)
+                        .join(User, Expense.user_id == User.id)
+                        .where(User.business_id == business.id, Expense.timestamp.between(start, end)))
+
+    log_amounts, log_jars = _numbers(logs['amount_collected']), _numbers(logs['jars_delivered'])
+    jar_sales = float(log_amounts.sum())
+    product_sales = float(_numbers(sales['total_amount']).sum())
+    event_sales = float(_numbers(events['final_amount']).sum())
+    returned = events['jars_returned'] != None  # noqa: E711
+    jars_lost = int((_numbers(events['quantity'][returned]) - _numbers(events['jars_returned'][returned])).sum())
+    expense_amounts = _numbers(expenses['amount'])
+    categories, (category_amounts,) = group_sum(expenses['category'].astype(str), expense_amounts)
+    by_category = dict(zip(categories.tolist(), category_amounts.tolist()))
+
+    # Per customer, then merged by name as the report lists them
+    customer_ids, (customer_jars, customer_amounts) = group_sum(_ids(logs['customer_id']), log_jars, log_amounts)
+    names = dict(db.session.execute(select(Customer.id, Customer.name).where(Customer.id.in_(customer_ids.tolist()))).all()) \
+        if len(customer_ids) else {}
+    by_name = {}
+    for customer_id, jars, amount in zip(customer_ids.tolist(), customer_jars.tolist(), customer_amounts.tolist()):
+        total = by_name.setdefault(names[customer_id], [0, 0.0])
+        total[0] += int(jars)
+        total[1] += amount
+    customer_summary = sorted((CustomerTotal(name, jars, amount) for name, (jars, amount) in by_name.items()),
+                              key=lambda row: -row.total_amount)
+
+    products, (product_quantities, product_amounts) = group_sum(
+        sales['product_name'].astype(str), _numbers(sales['quantity']), _numbers(sales['total_amount']))
+    product_summary = [ProductTotal(name, int(quantity), amount) for name, quantity, amount
+                       in zip(products.tolist(), product_quantities.tolist(), product_amounts.tolist())]
+
+    return {
+        'jar_sales': jar_sales, 'product_sales': product_sales, 'event_sales': event_sales,
+        'total_monthly_sales': jar_sales + product_sales + event_sales,
+        'total_monthly_expenses': float(expense_amounts.sum()),
+        'expense_by_category': {category: by_category.get(category, 0.0) for category in EXPENSE_CATEGORIES},
+        'total_jars_lost': jars_lost,
+        'customer_summary': customer_summary,
+        'monthly_product_summary': product_summary,
+        'staff_monthly_summary': month_payroll(business, year, month, start, end),
+    }
+
+
+def supplier_metrics(supplier_id, start, end):
+    """Sales, cost, income and per-product totals of a supplier's orders delivered in [start, end)."""
+    items = _columns(select(PurchaseOrderItem.quantity, PurchaseOrderItem.price_at_purchase,
+                            SupplierProduct.manufacture_price, SupplierProduct.name)
+                     .join(PurchaseOrder, PurchaseOrderItem.order_id == PurchaseOrder.id)
+                     .join(SupplierProduct, PurchaseOrderItem.product_id == SupplierProduct.id)
+                     .where(PurchaseOrder.supplier_id == supplier_id, PurchaseOrder.status == 'Delivered',
+                            PurchaseOrder.completion_date >= start, PurchaseOrder.completion_date < end))
+    quantities = _numbers(items['quantity'])
+    sales = quantities * _numbers(items['price_at_purchase'])
+    costs = quantities * _numbers(items['manufacture_price'])
+    names, (product_quantities, product_sales, product_income) = group_sum(
+        items['name'].astype(str), quantities, sales, sales - costs)
+
+    total_sales_amount, total_cost = float(sales.sum()), float(costs.sum())
+    return dict(total_sales_amount=total_sales_amount,
+                total_cost=total_cost,
+                net_income=total_sales_amount - total_cost,
+                product_summary={name: {'quantity': int(quantity), 'sales': sale, 'income': income}
+                                 for name, quantity, sale, income in zip(names.tolist(), product_quantities.tolist(),
+                                                                         product_sales.tolist(), product_income.tolist())})
@@ -6,7 +6,7 @@ from app.models import User, Customer
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField
 from wtforms.validators import DataRequired
-from sqlalchemy import or_, func
+from app.identity import find_login_candidates
 from flask_babel import _, lazy_gettext as _l
 
 class LoginForm(FlaskForm):
@@ -37,26 +37,13 @@ def login():
         login_identifier = form.username.data
         
         user_to_login = None
-        
-        # First, try to find an employee (User) by username, email or mobile
-        user = User.query.filter(
-            or_(func.lower(User.username) == login_identifier.lower(), 
-                func.lower(User.email) == login_identifier.lower(), 
-                User.mobile_number == login_identifier)
-        ).first()
-
-        if user and user.check_password(form.password.data):
-            user_to_login = user
 
-        # If no employee was found, try to find a Customer
-        if not user_to_login:
-            customer = Customer.query.filter(
-                or_(func.lower(Customer.username) == login_identifier.lower(), 
-                    func.lower(Customer.email) == login_identifier.lower(), 
-                    Customer.mobile_number == login_identifier)
-            ).first()
-            if customer and customer.check_password(form.password.data):
-                user_to_login = customer
+        # One indexed lookup covers usernames, emails and mobile numbers of
+        # employees and customers alike (employees are returned first).
+        for candidate in find_login_candidates(login_identifier):
+            if candidate.check_password(form.password.data):
+                user_to_login = candidate
+                break
         
         if user_to_login:
             login_user(user_to_login, remember=form.remember_me.data)
@@ -0,0 +1,376 @@
+# File: app/benchmarks.py
+
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, insert, select, delete, func, cast, Date
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import Business, Customer, User, ProductSale, DailyLog, Expense, EventBooking, LoginIdentity
+from app.projections import CUSTOMER_LIST, CUSTOMER_DUES, STAFF_LIST, PRODUCT_SALE_REPORT
+
+
+def _measure(fetch, repeat):
+    """(best seconds, peak traced bytes, row count) of fetch(), each run on an empty identity map."""
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        rows = fetch()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        del rows
+
+    # Memory is traced in a separate run; tracing slows everything down
+    db.session.expunge_all()
+    tracemalloc.start()
+    rows = fetch()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, len(rows)
+
+
+def _seed(rows):
+    """A throwaway business with `rows` customers and product sales and rows // 50 staff."""
+    stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    business = Business(name=f'Benchmark {stamp}')
+    db.session.add(business)
+    db.session.flush()
+
+    password_hash = generate_password_hash('benchmark')
+    db.session.execute(insert(Customer), [{
+        'name': f'Customer {i:05d}', 'mobile_number': f'{i:010d}', 'business_id': business.id,
+        'password_hash': password_hash, 'area': f'Area {i % 40}', 'village': f'Village {i % 12}',
+        'landmark': 'Near the old water tank, opposite the primary school', 'note': 'Leave jars at the back gate',
+        'daily_jars': 1 + i % 3, 'price_per_jar': 20.0, 'due_amount': float(i % 7 * 20),
+        'customer_type': 'dealer' if i % 10 == 0 else 'customer'
+    } for i in range(rows)])
+    db.session.execute(insert(User), [{
+        'username': f'bench-{stamp}-{i}', 'email': f'bench-{stamp}-{i}@example.com', 'role': 'staff',
+        'password_hash': password_hash, 'wage_type': 'daily', 'daily_wage': 300.0,
+        'business_id': business.id, 'address': 'Ward 4, Main Road', 'cash_balance': 0.0
+    } for i in range(max(rows // 50, 1))])
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    db.session.execute(insert(ProductSale), [{
+        'product_name': 'Dispenser', 'quantity': 1, 'price_per_item': 150.0, 'total_amount': 150.0,
+        'customer_name': f'Lead {i}', 'customer_mobile': f'{i:010d}', 'business_id': business.id,
+        'timestamp': month_start + timedelta(minutes=i)
+    } for i in range(rows)])
+    return business.id
+
+
+@click.command('bench-list-pages')
+@click.option('--rows', default=10000, show_default=True, help='Customers and product sales in the test business.')
+@click.option('--repeat', default=5, show_default=True, help='Timed runs per query; the best one is reported.')
+@with_appcontext
+def bench_list_pages_command(rows, repeat):
+    """Compares full entities with column projections for the read-only list pages.
+
+    The test business is created inside a transaction that is rolled back at the end.
+    """
+    try:
+        business_id = _seed(rows)
+        pages = [
+            ('customers.index', lambda: Customer.query.filter_by(business_id=business_id).order_by(Customer.name).all(),
+             lambda: db.session.query(*CUSTOMER_LIST).filter(Customer.business_id == business_id).order_by(Customer.name).all()),
+            ('delivery dues', lambda: Customer.query.filter(Customer.business_id == business_id, Customer.due_amount > 0).all(),
+             lambda: db.session.query(*CUSTOMER_DUES).filter(Customer.business_id == business_id, Customer.due_amount > 0).all()),
+            ('manager.staff_list', lambda: User.query.filter_by(business_id=business_id, role='staff').all(),
+             lambda: db.session.query(*STAFF_LIST).filter(User.business_id == business_id, User.role == 'staff').all()),
+            ('reports leads', lambda: ProductSale.query.filter_by(business_id=business_id).all(),
+             lambda: db.session.query(*PRODUCT_SALE_REPORT).filter(ProductSale.business_id == business_id).all()),
+        ]
+        print(f"{'page':<20}{'rows':>7}{'entities ms':>13}{'columns ms':>12}{'entities KiB':>14}{'columns KiB':>13}")
+        for name, entities, columns in pages:
+            entity_time, entity_peak, count = _measure(entities, repeat)
+            column_time, column_peak, _ = _measure(columns, repeat)
+            print(f"{name:<20}{count:>7}{entity_time * 1000:>13.1f}{column_time * 1000:>12.1f}"
+                  f"{entity_peak / 1024:>14.0f}{column_peak / 1024:>13.0f}")
+    finally:
+        db.session.rollback()
+
+
+@click.command('bench-delivery')
+@click.option('--deliveries', default=50, show_default=True, help='Deliveries to log.')
+@with_appcontext
+def bench_delivery_command(deliveries):
+    """Statements and commits per logged delivery, on a scratch SQLite database.
+
+    Drives the real log_delivery view through the test client, half paid in cash and
+    half on due, so it covers the journal posting and the invoice.
+    """
+    from app import create_app
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+
+    # Same settings as this app, pointed at the scratch database
+    config = {key: value for key, value in current_app.config.items() if key.isupper()}
+    config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', TESTING=True, WTF_CSRF_ENABLED=False,
+                  QUERY_COUNT_LOGGING=True, MAIL_SUPPRESS_SEND=True)
+    scratch = create_app(type('ScratchConfig', (), config))
+
+    try:
+        with scratch.app_context():
+            db.create_all()
+            business = Business(name='Benchmark')
+            db.session.add(business)
+            db.session.flush()
+            staff = User(username='bench-staff', role='staff', business_id=business.id, daily_wage=300.0)
+            db.session.add(staff)
+            customers = [Customer(name=f'Customer {i}', mobile_number=f'{i:010d}', business_id=business.id)
+                         for i in range(deliveries)]
+            db.session.add_all(customers)
+            db.session.commit()
+            staff_id, customer_ids = staff.get_id(), [c.id for c in customers]
+
+            commits = []
+            event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+            client = scratch.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = staff_id
+                session['_fresh'] = True
+
+            statements = 0
+            started = time.perf_counter()
+            for i, customer_id in enumerate(customer_ids):
+                form = {'jars_delivered': 2, 'is_due': 'on'} if i % 2 else {'jars_delivered': 2}
+                response = client.post(f'/log_delivery/{customer_id}', data=form)
+                statements += int(response.headers.get('X-Query-Count', 0))
+            elapsed = time.perf_counter() - started
+
+        print(f"{deliveries} deliveries in {elapsed * 1000:.0f} ms")
+        print(f"statements per delivery: {statements / deliveries:.1f}")
+        print(f"commits per delivery:    {len(commits) / deliveries:.1f}")
+    finally:
+        os.remove(path)
+
+
+@click.command('bench-forecast')
+@click.option('--customers', default=10000, show_default=True, help='Customers in the synthetic business.')
+@click.option('--days', default=365, show_default=True, help='Days of delivery history.')
+def bench_forecast_command(customers, days):
+    """Times building the history array and fitting the jar forecast on synthetic data.
+
+    The grouped DailyLog query is left out; this measures the NumPy side of app.forecast.
+    """
+    import numpy as np
+    from app.forecast import history_matrix, fit
+
+    rng = np.random.default_rng(0)
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    # Each customer takes a few jars on most days, more at the weekend
+    weekend = np.isin((np.arange(days) + start.weekday()) % 7, [5, 6])
+    rates = rng.uniform(0.5, 3.0, size=(customers, 1)) * np.where(weekend, 1.5, 1.0)
+    jars = rng.poisson(rates)
+    rows, cols = np.nonzero(jars)
+    day_strings = (np.datetime64(start, 'D') + cols).astype(str).tolist()  # what SQLite's date() returns
+
+    started = time.perf_counter()
+    ids, history = history_matrix((rows + 1).tolist(), day_strings, jars[rows, cols].tolist(), start, days)
+    built = time.perf_counter()
+    forecast = fit(history, start, 7, 0.05)
+    total = fit(history.sum(axis=0, keepdims=True), start, 7, 0.05)[0]
+    fitted = time.perf_counter()
+
+    print(f"{len(rows)} (customer, day) rows, {len(ids)} customers x {days} days")
+    print(f"history array: {(built - started) * 1000:.0f} ms")
+    print(f"fit:           {(fitted - built) * 1000:.0f} ms")
+    print(f"tomorrow: {total[0]:.0f} jars business-wide, {forecast[:, 0].sum():.0f} summed over customers")
+
+
+def _month_by_queries(business, start, end):
+    """The monthly figures as manager.reports computed them before app.analytics: one aggregate query per metric."""
+    business_id = business.id
+    jar_sales = db.session.query(func.sum(DailyLog.amount_collected)).join(Customer).filter(
+        Customer.business_id == business_id, DailyLog.timestamp.between(start, end)).scalar() or 0.0
+    product_sales = db.session.query(func.sum(ProductSale.total_amount)).filter(
+        ProductSale.business_id == business_id, ProductSale.timestamp.between(start, end)).scalar() or 0.0
+    completed = (Customer.business_id == business_id, EventBooking.status == 'Completed',
+                 EventBooking.collection_timestamp.between(start, end))
+    event_sales = db.session.query(func.sum(EventBooking.final_amount)).join(Customer).filter(*completed).scalar() or 0.0
+    jars_lost = db.session.query(func.sum(EventBooking.quantity - EventBooking.jars_returned)).join(Customer).filter(*completed).scalar() or 0
+    expenses = db.session.query(func.sum(Expense.amount)).join(User).filter(
+        User.business_id == business_id, Expense.timestamp.between(start, end)).scalar() or 0.0
+    customers = db.session.query(
+        Customer.name, func.sum(DailyLog.jars_delivered).label('total_jars'), func.sum(DailyLog.amount_collected).label('total_amount')
+    ).join(DailyLog).filter(Customer.business_id == business_id, DailyLog.timestamp.between(start, end)
+    ).group_by(Customer.name).order_by(func.sum(DailyLog.amount_collected).desc()).all()
+    products = db.session.query(
+        ProductSale.product_name, func.sum(ProductSale.quantity), func.sum(ProductSale.total_amount)
+    ).filter(ProductSale.business_id == business_id, ProductSale.timestamp.between(start, end)).group_by(ProductSale.product_name).all()
+
+    staff_summary = []
+    for staff in User.query.filter_by(role='staff', business_id=business_id).order_by(User.id).all():
+        daily = db.session.query(
+            cast(DailyLog.timestamp, Date).label('delivery_date'), func.sum(DailyLog.jars_delivered).label('jars_sum')
+        ).filter(DailyLog.user_id == staff.id, DailyLog.timestamp.between(start, end)).group_by('delivery_date').subquery()
+        full_days = db.session.query(func.count(daily.c.delivery_date)).filter(daily.c.jars_sum >= business.full_day_jar_count).scalar()
+        half_days = db.session.query(func.count(daily.c.delivery_date)).filter(
+            daily.c.jars_sum >= business.half_day_jar_count, daily.c.jars_sum < business.full_day_jar_count).scalar()
+        wages = db.session.query(func.sum(Expense.amount)).filter(
+            Expense.user_id == staff.id, Expense.description.like('Daily Wage%'), Expense.timestamp.between(start, end)).scalar() or 0.0
+        staff_summary.append((staff.username, full_days, half_days, wages))
+    return (jar_sales + product_sales + event_sales, expenses, jars_lost, len(customers), len(products), staff_summary)
+
+
+@click.command('bench-reports')
+@click.option('--rows', default=10000, show_default=True, help='Customers and product sales in the test business.')
+@click.option('--logs', default=100000, show_default=True, help='Deliveries logged this month.')
+@click.option('--repeat', default=5, show_default=True, help='Timed runs per approach; the best one is reported.')
+@with_appcontext
+def bench_reports_command(rows, logs, repeat):
+    """Compares one query per metric with app.analytics for the monthly section of manager.reports.
+
+    The test business is created inside a transaction that is rolled back at the end.
+    """
+    from app.analytics import month_metrics
+    from app.periods import month_bounds
+
+    try:
+        business_id = _seed(rows)
+        business = db.session.get(Business, business_id)
+        today = datetime.utcnow()
+        start, end = month_bounds(today.year, today.month)
+        days = max(today.day - 1, 1)
+        customer_ids = db.session.execute(select(Customer.id).where(Customer.business_id == business_id)).scalars().all()
+        staff_ids = db.session.execute(select(User.id).where(User.business_id == business_id)).scalars().all()
+        month_start = today.replace(day=1, hour=6, minute=0, second=0, microsecond=0)
+        db.session.execute(insert(DailyLog), [{
+            'customer_id': customer_ids[i % len(customer_ids)], 'user_id': staff_ids[i % len(staff_ids)],
+            'jars_delivered': 1 + i % 3, 'amount_collected': 20.0 * (1 + i % 3),
+            'timestamp': month_start + timedelta(days=i % days, seconds=i % 36000)
+        } for i in range(logs)])
+        db.session.execute(insert(Expense), [{
+            'user_id': staff_id, 'amount': 300.0, 'description': 'Daily Wage', 'category': 'wage', 'timestamp': month_start + timedelta(days=day, hours=14)
+        } for staff_id in staff_ids for day in range(days)])
+        db.session.execute(insert(EventBooking), [{
+            'customer_id': customer_ids[i], 'quantity': 20, 'jars_returned': 20 - i % 3, 'final_amount': 400.0,
+            'status': 'Completed', 'event_date': month_start.date(), 'collection_timestamp': month_start + timedelta(hours=i % 48)
+        } for i in range(min(rows // 100, len(customer_ids)))])
+
+        statements = []
+
+        def count_statement(*args):
+            statements.append(1)
+
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        results = {}
+        print(f"{logs} deliveries, {len(customer_ids)} customers, {len(staff_ids)} staff")
+        print(f"{'approach':<20}{'ms':>10}{'queries':>9}")
+        for name, compute in (('query per metric', lambda: _month_by_queries(business, start, end)),
+                              ('analytics', lambda: month_metrics(business, today.year, today.month, start, end))):
+            best = None
+            for _ in range(repeat):
+                statements.clear()
+                started = time.perf_counter()
+                results[name] = compute()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{name:<20}{best * 1000:>10.1f}{len(statements):>9}")
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+        by_queries, by_arrays = results['query per metric'], results['analytics']
+        # Wages aren't compared: the old loop summed the wage expenses, app.payroll computes them from attendance
+        totals_match = (round(by_queries[0], 2) == round(by_arrays['total_monthly_sales'], 2)
+                        and round(by_queries[1], 2) == round(by_arrays['total_monthly_expenses'], 2)
+                        and by_queries[2] == by_arrays['total_jars_lost']
+                        and by_queries[3] == len(by_arrays['customer_summary'])
+                        and by_queries[4] == len(by_arrays['monthly_product_summary']))
+        attendance_match = [row[:3] for row in by_queries[5]] == [
+            (row['username'], row['full_days'], row['half_days']) for row in by_arrays['staff_monthly_summary']]
+        print(f"totals and summaries match: {'yes' if totals_match else 'NO'}")
+        if attendance_match:
+            print("attendance matches: yes")
+        elif db.engine.dialect.name == 'sqlite':
+            print("attendance differs: SQLite's CAST(... AS DATE) keeps only the year, so the query version counts a month as one day")
+        else:
+            print("attendance matches: NO")
+    finally:
+        db.session.rollback()
+
+
+@click.command('stress-counters')
+@click.option('--threads', default=8, show_default=True, help='Concurrent workers, each with its own session.')
+@click.option('--iterations', default=50, show_default=True, help='Rounds per worker.')
+@with_appcontext
+def stress_counters_command(threads, iterations):
+    """Hammers one business's cash, dues and stock counters (app.counters) from many threads.
+
+    Every round adds cash to a staff member, adds dues to a customer and sells a jar
+    with the stock guard; stock starts at half the attempted sales. The totals must
+    come out exact and stock must stop at zero. Runs against the configured database
+    on a throwaway business, deleted at the end.
+    """
+    from app.counters import adjust
+
+    stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    attempts = threads * iterations
+    business = Business(name=f'Stress {stamp}', jar_stock=attempts // 2)
+    db.session.add(business)
+    db.session.flush()
+    staff = User(username=f'stress-{stamp}', role='staff', business_id=business.id, cash_balance=0.0)
+    customer = Customer(name='Stress customer', mobile_number='0000000000', business_id=business.id, due_amount=0.0)
+    db.session.add_all([staff, customer])
+    db.session.commit()
+    business_id, staff_id, customer_id = business.id, staff.id, customer.id
+    app = current_app._get_current_object()
+
+    def worker(_):
+        sold = errors = 0
+        with app.app_context():
+            for _ in range(iterations):
+                try:
+                    adjust(User, staff_id, cash_balance=10.0)
+                    adjust(Customer, customer_id, due_amount=5.0)
+                    if adjust(Business, business_id, guard=True, jar_stock=-1) is not None:
+                        sold += 1
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    errors += 1
+                    print(f"error: {e}")
+        return sold, errors
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(worker, range(threads)))
+        elapsed = time.perf_counter() - started
+        sold, errors = sum(r[0] for r in results), sum(r[1] for r in results)
+        committed = attempts - errors
+
+        db.session.expire_all()
+        cash = db.session.get(User, staff_id).cash_balance
+        due = db.session.get(Customer, customer_id).due_amount
+        stock = db.session.get(Business, business_id).jar_stock
+        checks = [('cash', cash, committed * 10.0), ('dues', due, committed * 5.0),
+                  ('stock', stock, attempts // 2 - sold), ('jars sold', sold, min(committed, attempts // 2))]
+        print(f"{threads} threads x {iterations} rounds in {elapsed * 1000:.0f} ms, {errors} failed")
+        for name, actual, expected in checks:
+            print(f"{name:<10}{actual:>10} expected {expected:<10}{'ok' if actual == expected else 'MISMATCH'}")
+        if errors or any(actual != expected for _, actual, expected in checks):
+            raise click.ClickException('Counters lost or duplicated updates.')
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(LoginIdentity).where(
+            (LoginIdentity.user_id == staff_id) | (LoginIdentity.customer_id == customer_id)))
+        db.session.execute(delete(Customer).where(Customer.id == customer_id))
+        db.session.execute(delete(User).where(User.id == staff_id))
+        db.session.execute(delete(Business).where(Business.id == business_id))
+        db.session.commit()
+
+
+def init_app(app):
+    """Register the CLI commands with the Flask app."""
+    app.cli.add_command(bench_list_pages_command)
+    app.cli.add_command(bench_delivery_command)
+    app.cli.add_command(bench_forecast_command)
+    app.cli.add_command(bench_reports_command)
+    app.cli.add_command(stress_counters_command)
@@ -5,6 +5,7 @@ from flask_login import current_user, login_required
 from app import db
 from app.billing import bp
 from app.models import SubscriptionPlan, Coupon, Business, Payment
+from app.tenant import get_business
 import razorpay
 from datetime import datetime, timedelta
 
@@ -23,7 +24,7 @@ def subscribe():
 @login_required
 def checkout(plan_id):
     plan = SubscriptionPlan.query.get_or_404(plan_id)
-    business = Business.query.get(current_user.business_id)
+    business = get_business()
     
     # Use sale price as the base amount
     final_amount = plan.sale_price
@@ -71,7 +72,7 @@ def checkout(plan_id):
 @login_required
 def cod_checkout(plan_id):
     plan = SubscriptionPlan.query.get_or_404(plan_id)
-    business = Business.query.get(current_user.business_id)
+    business = get_business()
     
     business.subscription_status = 'active'
     business.subscription_plan_id = plan.id
@@ -105,7 +106,7 @@ def payment_success():
     razorpay_signature = data.get('razorpay_signature')
 
     payment = Payment.query.filter_by(razorpay_order_id=razorpay_order_id).first_or_404()
-    business = Business.query.get(current_user.business_id)
+    business = get_business()
     plan = SubscriptionPlan.query.get(payment.subscription_plan_id)
 
     if not all([razorpay_order_id, razorpay_payment_id, razorpay_signature, payment, business, plan]):
@@ -0,0 +1,70 @@
+# File: app/counters.py
+
+from sqlalchemy import update, select, func, union_all, literal, cast, null, Integer, Float
+from sqlalchemy.orm import attributes
+from app import db
+
+
+def adjust(model, pk, guard=False, **deltas):
+    """
+    Atomically adds each delta to its column in the database:
+
+        UPDATE model SET col = COALESCE(col, 0) + :delta WHERE id = :pk RETURNING col
+
+    Concurrent requests can't overwrite each other's changes. The UPDATE takes the
+    row lock, which is held until the transaction commits (the read-back below
+    relies on it), so callers should commit soon after. With guard=True the row is
+    only updated if no column would drop below zero (used for stock).
+
+    Returns a dict of the new values, or None if the row doesn't exist or the guard
+    failed. A copy of the row already in the session is refreshed with the new values.
+
+        adjust(User, current_user.id, cash_balance=amount)
+        adjust(Business, business.id, guard=True, jar_stock=-quantity)
+    """
+    columns = {name: getattr(model, name) for name in deltas}
+    stmt = update(model).where(model.id == pk).values(
+        {name: func.coalesce(column, 0) + deltas[name] for name, column in columns.items()}
+    )
+    if guard:
+        stmt = stmt.where(*(func.coalesce(column, 0) + deltas[name] >= 0 for name, column in columns.items()))
+
+    if db.session.get_bind().dialect.update_returning:
+        row = db.session.execute(
+            stmt.returning(*columns.values()), execution_options={'synchronize_session': False}
+        ).first()
+    else:
+        # Older databases: the UPDATE still holds the row lock, so reading it back is consistent
+        result = db.session.execute(stmt, execution_options={'synchronize_session': False})
+        row = db.session.execute(select(*columns.values()).where(model.id == pk)).first() if result.rowcount else None
+
+    if row is None:
+        return None
+    values = dict(zip(columns, row))
+
+    obj = db.session.identity_map.get(db.session.identity_key(model, pk))
+    if obj is not None:
+        for name, value in values.items():
+            attributes.set_committed_value(obj, name, value)
+    return values
+
+
+def dues_snapshot(customer_id):
+    """
+    (due amount, ids of the customer's Due logs, ids of their Unpaid invoices), read
+    in one UNION ALL so all three come from the same snapshot. A delivery logged on
+    due commits its log, invoice and due increase together, so clearing exactly
+    these and subtracting exactly this amount leaves any later due delivery untouched.
+    """
+    from app.models import Customer, DailyLog, Invoice
+    rows = db.session.execute(union_all(
+        select(literal('customer').label('kind'), Customer.due_amount.label('amount'), cast(null(), Integer).label('id'))
+        .where(Customer.id == customer_id),
+        select(literal('log'), cast(null(), Float), DailyLog.id)
+        .where(DailyLog.customer_id == customer_id, DailyLog.payment_status == 'Due'),
+        select(literal('invoice'), cast(null(), Float), Invoice.id)
+        .where(Invoice.customer_id == customer_id, Invoice.status == 'Unpaid'),
+    )).all()
+    amount = next((row.amount for row in rows if row.kind == 'customer'), None) or 0.0
+    return (amount, [row.id for row in rows if row.kind == 'log'],
+            [row.id for row in rows if row.kind == 'invoice'])
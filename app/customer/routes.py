@@ -5,11 +5,12 @@ from app import db
 from app.customer import bp
 from app.models import Customer, DailyLog, JarRequest, EventBooking, Invoice, User
 from app.email import send_jar_request_notification, send_event_booking_notification
+from app.identity import identifier_taken
 from flask_wtf import FlaskForm
 from wtforms import IntegerField, DateField, SubmitField, StringField, PasswordField
 from wtforms.validators import DataRequired, NumberRange, ValidationError, Optional, Email, EqualTo
 from datetime import date, timedelta
-from math import ceil
+from app.timeline import customer_timeline
 
 # --- Forms ---
 class JarRequestForm(FlaskForm):
@@ -36,9 +37,8 @@ class CustomerProfileForm(FlaskForm):
 
     def validate_email(self, email):
         if email.data and email.data != self.original_email:
-            # Check in both User and Customer tables for email uniqueness
-            if User.query.filter_by(email=email.data).first() or \
-               Customer.query.filter(Customer.email == email.data, Customer.id != current_user.id).first():
+            # One lookup covers both User and Customer emails
+            if identifier_taken('email', email.data, exclude=current_user):
                 raise ValidationError('This email address is already registered.')
 
 class ChangePasswordForm(FlaskForm):
@@ -55,8 +55,11 @@ def dashboard():
     event_booking_form = EventBookingForm()
     due_amount = current_user.due_amount or 0.0
     
-    # --- Fetch Bookings ---
-    bookings = EventBooking.query.filter_by(customer_id=current_user.id).order_by(EventBooking.event_date.desc()).all()
+    # --- Pagination for Bookings ---
+    page_bookings = request.args.get('page_bookings', 1, type=int)
+    bookings_pagination = current_user.bookings.order_by(EventBooking.event_date.desc(), EventBooking.id.desc()).paginate(
+        page=page_bookings, per_page=5, error_out=False
+    )
 
     # --- Pagination for Invoices ---
     page_invoices = request.args.get('page_invoices', 1, type=int)
@@ -64,21 +67,10 @@ def dashboard():
         page=page_invoices, per_page=5, error_out=False
     )
 
-    # --- Create and Paginate Unified Activity Log ---
-    logs = DailyLog.query.filter_by(customer_id=current_user.id).all()
-    
-    activity_log = []
-    for log in logs:
-        activity_log.append({'type': 'Regular Delivery', 'item': log, 'date': log.timestamp})
-
-    activity_log.sort(key=lambda x: x['date'], reverse=True)
-    
-    page_activity = request.args.get('page_activity', 1, type=int)
-    per_page_activity = 10
-    start = (page_activity - 1) * per_page_activity
-    end = start + per_page_activity
-    paginated_activity = activity_log[start:end]
-    total_activity_pages = ceil(len(activity_log) / per_page_activity)
+    # --- Unified Activity Timeline (keyset paginated) ---
+    activity_log, newer_cursor, older_cursor = customer_timeline(
+        current_user.id, before=request.args.get('before'), after=request.args.get('after'), per_page=10
+    )
 
     return render_template(
         'customer/dashboard.html', 
@@ -87,10 +79,10 @@ def dashboard():
         event_form=event_booking_form,
         invoices_pagination=invoices_pagination, 
         due_amount=due_amount,
-        bookings=bookings,  # Pass bookings to the template
-        activity_log=paginated_activity,
-        page_activity=page_activity,
-        total_activity_pages=total_activity_pages
+        bookings_pagination=bookings_pagination,
+        activity_log=activity_log,
+        newer_cursor=newer_cursor,
+        older_cursor=older_cursor
     )
 
 
@@ -0,0 +1,224 @@
+# File: app/customer_import.py
+
+import csv
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from types import SimpleNamespace
+from email_validator import validate_email, EmailNotValidError
+from flask import current_app
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from app import db
+from app.identity import normalize_identifier
+from app.models import Customer, LoginIdentity
+
+DEFAULT_PASSWORD = '123456'
+
+# Accepted header spellings -> Customer field
+HEADERS = {
+    'name': 'name', 'customer name': 'name',
+    'mobile': 'mobile_number', 'mobile number': 'mobile_number', 'mobile_number': 'mobile_number', 'phone': 'mobile_number',
+    'type': 'customer_type', 'customer type': 'customer_type', 'customer_type': 'customer_type',
+    'house number': 'house_number', 'house_number': 'house_number', 'house no': 'house_number',
+    'area': 'area', 'landmark': 'landmark',
+    'village': 'village', 'city': 'village', 'city / village': 'village',
+    'daily jars': 'daily_jars', 'daily_jars': 'daily_jars',
+    'price per jar': 'price_per_jar', 'price_per_jar': 'price_per_jar', 'price': 'price_per_jar',
+    'email': 'email', 'password': 'password', 'note': 'note',
+}
+REQUIRED = ('name', 'mobile_number', 'village')
+
+
+class ImportFileError(ValueError):
+    """The file as a whole can't be read (wrong format, missing columns)."""
+
+
+def _cell(value):
+    """Spreadsheet cells come back as numbers; 9876543210.0 must read as '9876543210'."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _records(header, rows):
+    fields = [HEADERS.get(_cell(column).lower()) for column in header]
+    missing = [field for field in REQUIRED if field not in fields]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}.")
+    for line, row in enumerate(rows, start=2):
+        values = {field: _cell(value) for field, value in zip(fields, row) if field}
+        if any(values.values()):
+            yield line, values
+
+
+def read_rows(file_storage):
+    """Yields (line number, {field: text}) from an uploaded CSV or XLSX file, one row at a time."""
+    filename = (file_storage.filename or '').lower()
+    if filename.endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError('Excel import needs the openpyxl package; upload a CSV file instead.')
+        sheet = load_workbook(file_storage.stream, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+    elif filename.endswith('.csv'):
+        rows = csv.reader(io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline=''))
+    else:
+        raise ImportFileError('Upload a .csv or .xlsx file.')
+
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError('The file is empty.')
+    return _records(header, rows)
+
+
+def _validate(values):
+    """Returns (clean row, None) or (None, reason), with the same rules as CustomerForm."""
+    name = values.get('name', '')
+    if not 3 <= len(name) <= 120:
+        return None, 'Name must be 3 to 120 characters.'
+    mobile = values.get('mobile_number', '')
+    if not re.fullmatch(r'[0-9]{10}', mobile):
+        return None, 'Mobile number must be exactly 10 digits.'
+    village = values.get('village', '')
+    if not village or len(village) > 100:
+        return None, 'City / Village is required (up to 100 characters).'
+    customer_type = (values.get('customer_type') or 'customer').lower()
+    if customer_type not in ('customer', 'dealer'):
+        return None, 'Type must be customer or dealer.'
+    try:
+        daily_jars = int(float(values.get('daily_jars') or 1))
+        price_per_jar = float(values.get('price_per_jar') or 15)
+    except ValueError:
+        return None, 'Daily jars and price per jar must be numbers.'
+    email = values.get('email') or None
+    if email:
+        try:
+            email = validate_email(email, check_deliverability=False).normalized
+        except EmailNotValidError:
+            return None, 'Invalid email address.'
+    password = values.get('password') or None
+    if password and len(password) < 4:
+        return None, 'Password must be at least 4 characters.'
+    return {
+        'name': name, 'mobile_number': mobile, 'customer_type': customer_type,
+        'house_number': values.get('house_number', '')[:100] or None, 'area': values.get('area', '')[:100] or None,
+        'landmark': values.get('landmark', '')[:200] or None, 'village': village,
+        'note': values.get('note', '')[:300] or None, 'daily_jars': daily_jars, 'price_per_jar': price_per_jar,
+        'email': email, 'password': password,
+    }, None
+
+
+def _taken(kind, identifiers):
+    """Which of these identifiers already belong to someone, in one query."""
+    if not identifiers:
+        return set()
+    return {identifier for (identifier,) in db.session.query(LoginIdentity.identifier).filter(
+        LoginIdentity.kind == kind, LoginIdentity.identifier.in_(identifiers)
+    )}
+
+
+def _assign_usernames(rows):
+    """cust_<mobile> like add_customer, with _2, _3... on collisions, checked in bulk."""
+    pending = {f"cust_{row['mobile_number']}": row for row in rows}
+    suffix = 1
+    while pending:
+        taken = _taken('username', list(pending))
+        for username, row in pending.items():
+            if username not in taken:
+                row['username'] = username
+        suffix += 1
+        pending = {f"cust_{row['mobile_number']}_{suffix}": row for name, row in pending.items() if name in taken}
+
+
+def _import_batch(batch, business_id, seen_mobiles, seen_emails, errors, pool):
+    rows = []
+    for line, values in batch:
+        row, reason = _validate(values)
+        if reason is None and row['mobile_number'] in seen_mobiles:
+            reason = 'Mobile number appears more than once in the file.'
+        if reason is None and row['email'] and normalize_identifier(row['email']) in seen_emails:
+            reason = 'Email appears more than once in the file.'
+        if reason:
+            errors.append((line, reason))
+            continue
+        seen_mobiles.add(row['mobile_number'])
+        if row['email']:
+            seen_emails.add(normalize_identifier(row['email']))
+        row['line'] = line
+        rows.append(row)
+
+    # One set query per batch against uq_customer_mobile_business, one for emails
+    existing = {mobile for (mobile,) in db.session.query(Customer.mobile_number).filter(
+        Customer.business_id == business_id, Customer.mobile_number.in_([row['mobile_number'] for row in rows])
+    )} if rows else set()
+    taken_emails = _taken('email', [normalize_identifier(row['email']) for row in rows if row['email']])
+    accepted = []
+    for row in rows:
+        if row['mobile_number'] in existing:
+            errors.append((row['line'], 'A customer with this mobile number already exists.'))
+        elif row['email'] and normalize_identifier(row['email']) in taken_emails:
+            errors.append((row['line'], 'This email address is already registered.'))
+        else:
+            accepted.append(row)
+    if not accepted:
+        return []
+
+    _assign_usernames(accepted)
+    # Hashing dominates the import; hashlib releases the GIL, so threads run it in parallel
+    hashes = pool.map(generate_password_hash, [row['password'] or DEFAULT_PASSWORD for row in accepted])
+    params = [{
+        'name': row['name'], 'username': row['username'], 'mobile_number': row['mobile_number'],
+        'email': row['email'], 'password_hash': password_hash, 'role': 'customer',
+        'customer_type': row['customer_type'], 'house_number': row['house_number'], 'area': row['area'],
+        'landmark': row['landmark'], 'village': row['village'], 'note': row['note'],
+        'daily_jars': row['daily_jars'], 'price_per_jar': row['price_per_jar'], 'due_amount': 0.0,
+        'business_id': business_id,
+    } for row, password_hash in zip(accepted, hashes)]
+    ids = db.session.execute(insert(Customer).returning(Customer.id), params).scalars().all()
+
+    # Bulk inserts skip the ORM flush, so add the login identities app.identity would have
+    identities = []
+    for customer_id, row in zip(ids, accepted):
+        row['id'] = customer_id
+        identities.append({'kind': 'username', 'identifier': normalize_identifier(row['username']), 'customer_id': customer_id})
+        identities.append({'kind': 'mobile', 'identifier': row['mobile_number'], 'customer_id': customer_id})
+        if row['email']:
+            identities.append({'kind': 'email', 'identifier': normalize_identifier(row['email']), 'customer_id': customer_id})
+    db.session.execute(insert(LoginIdentity), identities)
+    return accepted
+
+
+def import_customers(records, business_id):
+    """
+    Imports (line, values) records into one business in batches of
+    CUSTOMER_IMPORT_BATCH_SIZE: rows are validated, checked for duplicates with one
+    query per batch and inserted with one multi-row INSERT per batch. Nothing is
+    committed; the caller commits once at the end.
+
+    Returns (imported rows, [(line, reason), ...] for skipped rows).
+    """
+    batch_size = current_app.config['CUSTOMER_IMPORT_BATCH_SIZE']
+    imported, errors = [], []
+    seen_mobiles, seen_emails = set(), set()
+    with ThreadPoolExecutor(max_workers=current_app.config['CUSTOMER_IMPORT_HASH_WORKERS']) as pool:
+        records = iter(records)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            imported.extend(_import_batch(batch, business_id, seen_mobiles, seen_emails, errors, pool))
+    return imported, sorted(errors)
+
+
+def welcome_recipients(imported, business):
+    """Lightweight stand-ins for the welcome email template (name, username, business)."""
+    return [
+        (SimpleNamespace(name=row['name'], username=row['username'], email=row['email'], business=business),
+         row['password'] or DEFAULT_PASSWORD)
+        for row in imported if row['email']
+    ]
@@ -5,11 +5,24 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import Customer, User # Import User for validation
 from . import bp
-from app.email import send_customer_welcome_email
+from app.email import send_customer_welcome_email, queue_customer_welcome_emails
+from app.search_index import customer_search_index
+from app.identity import identifier_taken, normalize_identifier
+from app.pagination import keyset_paginate, SortKey
+from app.projections import CUSTOMER_LIST
+from app.customer_import import read_rows, import_customers, welcome_recipients, ImportFileError
+from app import repricing
+from app import reservations
+from app.models import PriceChange, EventBooking
+from app.principal_cache import invalidate_principal
+from app.tenant import get_business
+from app.unit_of_work import unit_of_work, after_commit
 from flask_wtf import FlaskForm
-from wtforms import StringField, IntegerField, SubmitField, FloatField, PasswordField, TextAreaField, SelectField
-from wtforms.validators import DataRequired, Length, Optional, ValidationError, Email, Regexp
+from flask_wtf.file import FileField, FileAllowed, FileRequired
+from wtforms import StringField, IntegerField, SubmitField, FloatField, PasswordField, TextAreaField, SelectField, BooleanField
+from wtforms.validators import DataRequired, Length, Optional, ValidationError, Email, Regexp, NumberRange
 from sqlalchemy import func, distinct, or_
+from sqlalchemy.exc import IntegrityError
 import random # Import random for username generation
 
 # Import the new decorator
@@ -49,9 +62,8 @@ class CustomerForm(FlaskForm):
 
     def validate_email(self, email):
         # Username is no longer on the form, so only validate email
-        if email.data and email.data != self.original_email:
-            if Customer.query.filter(Customer.email == email.data).first() or \
-               User.query.filter(User.email == email.data).first():
+        if email.data and normalize_identifier(email.data) != normalize_identifier(self.original_email):
+            if identifier_taken('email', email.data):
                 raise ValidationError('This email address is already registered.')
 
     def validate_mobile_number(self, mobile_number):
@@ -70,16 +82,56 @@ class CustomerForm(FlaskForm):
         elif existing_customer:
              raise ValidationError('This mobile number is already registered for another customer.')
 
+class CustomerImportForm(FlaskForm):
+    file = FileField('Customer File (CSV or Excel)', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'xlsx'], 'CSV or Excel (.xlsx) files only!')
+    ])
+    send_welcome_emails = BooleanField('Email login details to customers who have an email address', default=True)
+    submit = SubmitField('Import Customers')
+
+class BulkPriceForm(FlaskForm):
+    village = SelectField('City / Village', choices=[('', 'All')], validate_choice=False, validators=[Optional()])
+    area = StringField('Area / Locality', validators=[Optional(), Length(max=100)])
+    customer_type = SelectField('Type', choices=[('', 'All'), ('customer', 'Customers'), ('dealer', 'Dealers')], validators=[Optional()])
+    price_mode = SelectField('Price Change', choices=[
+        ('', 'Keep current price'), ('percent', 'Change by %'), ('amount', 'Change by ₹'), ('set', 'Set price to ₹')
+    ], validators=[Optional()])
+    price_value = FloatField('Value', validators=[Optional()])
+    daily_jars = IntegerField('Set Daily Jars (Optional)', validators=[Optional(), NumberRange(min=0)])
+    preview = SubmitField('Preview')
+    apply = SubmitField('Apply Changes')
+
+    def validate_price_value(self, price_value):
+        if self.price_mode.data == 'set' and price_value.data is not None and price_value.data < 0:
+            raise ValidationError('Price cannot be negative.')
+
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        # Not in validate_price_value: Optional() skips field validators when the field is blank
+        if self.price_mode.data and self.price_value.data is None:
+            self.price_value.errors.append('Enter a value for the price change.')
+            return False
+        if not self.price_mode.data and self.daily_jars.data is None:
+            self.daily_jars.errors.append('Choose a price change or a new daily jars value.')
+            return False
+        return True
+
 @bp.route('/list')
 @login_required
 @manager_required
 @subscription_required
 def index():
-    query = Customer.query.filter_by(business_id=current_user.business_id)
+    # Only the listed columns are read (see app.projections)
+    query = db.session.query(*CUSTOMER_LIST).filter(Customer.business_id == current_user.business_id)
 
-    # Calculate total counts before applying filters
-    customer_count = query.filter_by(customer_type='customer').count()
-    dealer_count = query.filter_by(customer_type='dealer').count()
+    # Calculate total counts before applying filters (one grouped query)
+    type_counts = dict(db.session.query(Customer.customer_type, func.count(Customer.id)).filter(
+        Customer.business_id == current_user.business_id
+    ).group_by(Customer.customer_type).all())
+    customer_count = type_counts.get('customer', 0)
+    dealer_count = type_counts.get('dealer', 0)
     total_count = customer_count + dealer_count
 
     # Search functionality
@@ -94,24 +146,23 @@ def index():
     # Filter by Type
     filter_type = request.args.get('filter_type', 'all')
     if filter_type == 'customer':
-        query = query.filter_by(customer_type='customer')
+        query = query.filter(Customer.customer_type == 'customer')
     elif filter_type == 'dealer':
-        query = query.filter_by(customer_type='dealer')
+        query = query.filter(Customer.customer_type == 'dealer')
 
-    # Sorting functionality
+    # Sorting functionality; area and village can be empty, so they sort as ''
     sort_by = request.args.get('sort', 'name')
-    order_by_column = Customer.name # Default
+    sort_key = SortKey(Customer.name) # Default
     if sort_by == 'area':
-        order_by_column = Customer.area
+        sort_key = SortKey(func.coalesce(Customer.area, ''), value=lambda c: c.area or '')
     elif sort_by == 'village':
-        order_by_column = Customer.village
-    # Apply sorting before pagination
-    query = query.order_by(order_by_column)
-
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 10 # Display 10 items per page, adjust as needed
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        sort_key = SortKey(func.coalesce(Customer.village, ''), value=lambda c: c.village or '')
+
+    # Keyset pagination; the unfiltered totals are already known, otherwise estimate
+    pagination = keyset_paginate(query, [sort_key, SortKey(Customer.id)], cursor=request.args.get('cursor'),
+                                 per_page=10, count='estimate' if search_term else None)
+    if not search_term:
+        pagination.total = {'customer': customer_count, 'dealer': dealer_count}.get(filter_type, total_count)
     customers = pagination.items # Get items for the current page
 
     return render_template(
@@ -147,7 +198,7 @@ def add_customer():
         # --- Auto-generate a unique username ---
         username_candidate = f"cust_{form.mobile_number.data.replace('+', '')}"
         # Check for collision (highly unlikely, but good practice)
-        if User.query.filter_by(username=username_candidate).first() or Customer.query.filter_by(username=username_candidate).first():
+        if identifier_taken('username', username_candidate):
             # If collision, add a random suffix
             username_candidate = f"{username_candidate}_{random.randint(100,999)}"
         # ---
@@ -174,6 +225,7 @@ def add_customer():
 
         db.session.add(customer)
         db.session.commit()
+        customer_search_index.invalidate(customer.business_id)
 
         # --- Send Welcome Email if Email Exists ---
         if customer.email:
@@ -193,6 +245,69 @@ def add_customer():
         return redirect(url_for('customers.index'))
     return render_template('customers/customer_form.html', form=form, title='Add New Customer/Dealer', village_names=village_names)
 
+@bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@manager_required
+@subscription_required
+@unit_of_work
+def bulk_import():
+    form = CustomerImportForm()
+    imported, errors = None, []
+    if form.validate_on_submit():
+        try:
+            imported, errors = import_customers(read_rows(form.file.data), current_user.business_id)
+        except ImportFileError as e:
+            flash(str(e), 'danger')
+        except IntegrityError:
+            # A customer with one of these mobiles/emails was added while the file was importing
+            db.session.rollback()
+            imported = None
+            flash('Some of these customers were added by someone else during the import. Nothing was imported; please try again.', 'danger')
+        else:
+            if imported:
+                after_commit(customer_search_index.invalidate, current_user.business_id)
+                if form.send_welcome_emails.data:
+                    after_commit(queue_customer_welcome_emails, welcome_recipients(imported, get_business()))
+            flash(f'{len(imported)} customer(s) imported, {len(errors)} row(s) skipped.', 'success' if imported else 'warning')
+
+    return render_template('customers/import_customers.html', title='Import Customers', form=form,
+                           imported=imported, errors=errors[:100], error_count=len(errors))
+
+@bp.route('/bulk_update', methods=['GET', 'POST'])
+@login_required
+@manager_required
+@subscription_required
+@unit_of_work
+def bulk_update():
+    form = BulkPriceForm()
+    form.village.choices = [('', 'All')] + [(name, name) for (name,) in db.session.query(Customer.village).distinct().filter(
+        Customer.business_id == current_user.business_id,
+        Customer.village != None,
+        Customer.village != ''
+    ).order_by(Customer.village)]
+
+    count, sample = None, []
+    if form.validate_on_submit():
+        change = dict(
+            village=form.village.data, area=(form.area.data or '').strip(), customer_type=form.customer_type.data,
+            price_mode=form.price_mode.data or None, price_value=form.price_value.data, daily_jars=form.daily_jars.data
+        )
+        if form.apply.data:
+            price_change = repricing.apply_change(current_user.business_id, current_user.id, **change)
+            # The UPDATE bypasses the ORM, so drop cached copies of the customers it touched
+            for customer_id in repricing.changed_customer_ids(price_change.id):
+                after_commit(invalidate_principal, f'customer-{customer_id}')
+            after_commit(customer_search_index.invalidate, current_user.business_id)
+            flash(f'{price_change.customers_affected} customer(s) updated. Past invoices keep their original prices.', 'success')
+            return redirect(url_for('customers.bulk_update'))
+        count, sample = repricing.preview(current_user.business_id, **change)
+
+    history = PriceChange.query.filter_by(business_id=current_user.business_id).order_by(
+        PriceChange.timestamp.desc()
+    ).limit(10).all()
+    return render_template('customers/bulk_update.html', title='Bulk Update Prices', form=form,
+                           count=count, sample=sample, history=history)
+
 @bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 @manager_required
@@ -228,6 +343,7 @@ def edit_customer(id):
             customer.set_password(form.password.data)
 
         db.session.commit()
+        customer_search_index.invalidate(customer.business_id)
         flash(f'{customer.customer_type.capitalize()} "{customer.name}" has been updated.', 'success')
         return redirect(url_for('customers.index'))
     
@@ -243,8 +359,13 @@ def edit_customer(id):
 @subscription_required
 def delete_customer(id):
     customer = Customer.query.filter_by(id=id, business_id=current_user.business_id).first_or_404()
+    # Their bookings go with them; free whatever confirmed or delivered ones still hold
+    for booking in EventBooking.query.filter(EventBooking.customer_id == customer.id,
+                                             EventBooking.status.in_(['Confirmed', 'Delivered'])):
+        reservations.release(customer.business_id, booking.event_date, booking.quantity, booking.dispensers_booked or 0)
     db.session.delete(customer)
     db.session.commit()
+    customer_search_index.invalidate(customer.business_id)
     flash(f'Customer "{customer.name}" has been deleted.', 'danger')
     return redirect(url_for('customers.index'))
 
@@ -257,7 +378,5 @@ def check_username():
     if not username:
         return jsonify({'available': False})
     
-    is_taken = User.query.filter_by(username=username).first() or \
-               Customer.query.filter_by(username=username).first()
-               
+    is_taken = identifier_taken('username', username)
     return jsonify({'available': not is_taken})
\ No newline at end of file
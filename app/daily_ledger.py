@@ -0,0 +1,88 @@
+# File: app/daily_ledger.py
+
+from sqlalchemy import select, union_all, literal, func, tuple_, null, case, cast, Integer, String
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import DailyLog, Expense, ProductSale, EventBooking, Customer, User, coded_text
+from app.timeline import encode_cursor, decode_cursor
+
+KINDS = ('event', 'expense', 'jar_sale', 'product_sale')
+
+# Typed NULLs for the columns a branch doesn't have: PostgreSQL types a bare NULL in
+# a subquery as text, which can't then be matched with the other branches' integers
+NO_TEXT, NO_NUMBER = cast(null(), String), cast(null(), Integer)
+
+
+def _branches(business_id, start, end):
+    """(select, timestamp column) for every kind of transaction in [start, end] of one business."""
+    staff = aliased(User)
+    collector = aliased(User)
+    return [
+        (select(
+            DailyLog.timestamp.label('ts'), literal('jar_sale').label('kind'), DailyLog.id.label('id'),
+            staff.username.label('staff'), Customer.name.label('customer'), DailyLog.jars_delivered.label('quantity'),
+            NO_TEXT.label('product'), DailyLog.amount_collected.label('amount'),
+            coded_text(DailyLog.payment_status).label('payment_status'), coded_text(DailyLog.payment_method).label('payment_method'),
+            NO_TEXT.label('description')
+        ).join(Customer, DailyLog.customer_id == Customer.id).outerjoin(staff, DailyLog.user_id == staff.id).where(
+            Customer.business_id == business_id, DailyLog.timestamp.between(start, end)
+        ), DailyLog.timestamp),
+        (select(
+            EventBooking.collection_timestamp, literal('event'), EventBooking.id,
+            collector.username, Customer.name, EventBooking.quantity,
+            NO_TEXT, EventBooking.final_amount, literal('Paid'), NO_TEXT, NO_TEXT
+        ).join(Customer, EventBooking.customer_id == Customer.id).outerjoin(
+            collector, EventBooking.collected_by_id == collector.id
+        ).where(
+            Customer.business_id == business_id, EventBooking.status == 'Completed',
+            EventBooking.collection_timestamp.between(start, end)
+        ), EventBooking.collection_timestamp),
+        (select(
+            ProductSale.timestamp, literal('product_sale'), ProductSale.id,
+            staff.username, ProductSale.customer_name, ProductSale.quantity,
+            ProductSale.product_name, ProductSale.total_amount, literal('Paid'), literal('Cash'), NO_TEXT
+        ).outerjoin(staff, ProductSale.user_id == staff.id).where(
+            ProductSale.business_id == business_id, ProductSale.timestamp.between(start, end)
+        ), ProductSale.timestamp),
+        (select(
+            Expense.timestamp, literal('expense'), Expense.id,
+            staff.username, NO_TEXT, NO_NUMBER, NO_TEXT, Expense.amount, NO_TEXT, NO_TEXT, Expense.description
+        ).join(staff, Expense.user_id == staff.id).where(
+            staff.business_id == business_id, Expense.timestamp.between(start, end)
+        ), Expense.timestamp),
+    ]
+
+
+def daily_totals(business_id, start, end):
+    """(total sales, total expenses) of the day, summed in the database."""
+    ledger = union_all(*(query for query, _ in _branches(business_id, start, end))).subquery()
+    is_expense = ledger.c.kind == 'expense'
+    sales, expenses = db.session.execute(select(
+        func.coalesce(func.sum(case((is_expense, 0.0), else_=func.coalesce(ledger.c.amount, 0.0))), 0.0),
+        func.coalesce(func.sum(case((is_expense, ledger.c.amount), else_=0.0)), 0.0)
+    )).one()
+    return sales, expenses
+
+
+def daily_ledger_page(business_id, start, end, before=None, per_page=50):
+    """
+    One page of the day's jar sales, event settlements, product sales and expenses,
+    latest first, as a single UNION ALL with keyset pagination on (timestamp, kind, id).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    cursor = decode_cursor(before, kinds=KINDS)
+    parts = []
+    for query, ts_column in _branches(business_id, start, end):
+        if cursor:
+            query = query.where(ts_column <= cursor[0])
+        parts.append(select(query.order_by(ts_column.desc()).limit(per_page + 1).subquery()))
+    ledger = union_all(*parts).subquery()
+
+    query = select(ledger)
+    if cursor:
+        query = query.where(tuple_(ledger.c.ts, ledger.c.kind, ledger.c.id) < tuple_(*cursor))
+    query = query.order_by(ledger.c.ts.desc(), ledger.c.kind.desc(), ledger.c.id.desc()).limit(per_page + 1)
+    rows = db.session.execute(query).all()
+
+    next_cursor = encode_cursor(rows[per_page - 1]) if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
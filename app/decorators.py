@@ -4,6 +4,8 @@ from flask_login import current_user
 from app.models import Business, SupplierProfile, User
 from datetime import datetime
 from app import db
+from app.principal_cache import get_subscription_state
+from app.tenant import get_business
 
 def manager_required(f):
     @wraps(f)
@@ -54,21 +56,23 @@ def subscription_required(f):
         if current_user.role != 'manager':
              return f(*args, **kwargs)
 
-        business = Business.query.get(current_user.business_id)
-        if not business:
+        # Only the subscription columns are needed here; they are cached for the request
+        state = get_subscription_state(current_user.business_id)
+        if not state:
             flash("You are not associated with a business.", "danger")
             return redirect(url_for('auth.logout'))
 
         is_active = False
         now = datetime.utcnow()
 
-        if business.subscription_status == 'active' and business.subscription_ends_at and business.subscription_ends_at > now:
+        if state['subscription_status'] == 'active' and state['subscription_ends_at'] and state['subscription_ends_at'] > now:
             is_active = True
-        elif business.subscription_status == 'trial' and business.trial_ends_at and business.trial_ends_at > now:
+        elif state['subscription_status'] == 'trial' and state['trial_ends_at'] and state['trial_ends_at'] > now:
             is_active = True
 
         if not is_active:
-            if business.subscription_status == 'trial':
+            if state['subscription_status'] == 'trial':
+                business = get_business()
                 business.subscription_status = 'expired'
                 db.session.commit()
             return redirect(url_for('billing.expired'))
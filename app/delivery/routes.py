@@ -11,11 +11,21 @@ from app.delivery import bp
 from app.models import Customer, DailyLog, Expense, User, JarRequest, EventBooking, Business, Invoice
 from app.email import send_delivery_confirmation_email, send_event_booking_notification
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, IntegerField, FloatField, DateField
+from wtforms import StringField, PasswordField, SubmitField, IntegerField, FloatField, DateField, SelectField
 from wtforms.validators import DataRequired, NumberRange, ValidationError, Optional, Email, EqualTo, Length
 from sqlalchemy import or_
 from datetime import date, datetime, timedelta
 from app.invoices.routes import create_invoice_for_transaction
+from app.search_index import customer_search_index
+from app.identity import identifier_taken
+from app.tenant import get_business
+from app.counters import adjust, dues_snapshot
+from app.ledger import post
+from app.loaders import load
+from app.projections import CUSTOMER_DUES
+from app.unit_of_work import unit_of_work, after_commit
+from app import reservations
+from app import report_cache
 
 # --- Forms ---
 
@@ -32,8 +42,7 @@ class StaffProfileForm(FlaskForm):
     def validate_email(self, email):
         if email.data and email.data != self.original_email:
             # Check if email is already taken by another user or customer
-            if User.query.filter(User.email == email.data).first() or \
-               Customer.query.filter(Customer.email == email.data).first():
+            if identifier_taken('email', email.data, exclude=current_user):
                 raise ValidationError('This email address is already registered.')
 
 class ChangePasswordForm(FlaskForm):
@@ -69,6 +78,8 @@ class SearchForm(FlaskForm):
     search_term = StringField('Search by Name or Mobile')
 class ExpenseForm(FlaskForm):
     amount = FloatField('Amount (₹)', validators=[DataRequired()])
+    category = SelectField('Category', choices=[('fuel', 'Fuel'), ('maintenance', 'Maintenance'), ('other', 'Other')],
+                           default='fuel', validators=[DataRequired()])
     description = StringField('Description (e.g., Fuel)', validators=[DataRequired()], default='Fuel')
     submit_expense = SubmitField('Add Expense')
 
@@ -86,23 +97,23 @@ def dashboard():
 
     today = date.today()
     
-    jar_requests = db.session.query(JarRequest).join(Customer).filter(
+    jar_requests = db.session.query(JarRequest).join(Customer).options(*load('jar_request_with_customer')).filter(
         Customer.business_id == current_user.business_id,
         JarRequest.status == 'Pending'
     ).order_by(JarRequest.request_timestamp).all()
     
-    event_bookings_today = db.session.query(EventBooking).join(Customer).filter(
+    event_bookings_today = db.session.query(EventBooking).join(Customer).options(*load('booking_with_customer')).filter(
         Customer.business_id == current_user.business_id,
         EventBooking.status == 'Confirmed',
         EventBooking.event_date == today
     ).order_by(EventBooking.request_timestamp).all()
 
-    bookings_to_collect = db.session.query(EventBooking).join(Customer).filter(
+    bookings_to_collect = db.session.query(EventBooking).join(Customer).options(*load('booking_with_customer')).filter(
         Customer.business_id == current_user.business_id,
         EventBooking.status == 'Delivered'
     ).order_by(EventBooking.delivery_timestamp).all()
     
-    customers_with_dues = Customer.query.filter(
+    customers_with_dues = db.session.query(*CUSTOMER_DUES).filter(
         Customer.business_id == current_user.business_id,
         Customer.due_amount > 0
     ).order_by(Customer.name).all()
@@ -191,7 +202,7 @@ def generate_upi_qr(customer_id, amount):
     if not current_user.business_id:
         return jsonify({'error': 'Staff not associated with a business.'}), 403
         
-    business = Business.query.get(current_user.business_id)
+    business = get_business()
     customer = Customer.query.get_or_404(customer_id) # Get customer for name reference
 
     if not business or business.id != customer.business_id:
@@ -240,6 +251,7 @@ def generate_upi_qr(customer_id, amount):
 
 @bp.route('/log_delivery/<int:customer_id>', methods=['POST'])
 @login_required
+@unit_of_work
 def log_delivery(customer_id):
     customer = Customer.query.get_or_404(customer_id)
     user = User.query.get(current_user.id)
@@ -284,20 +296,13 @@ def log_delivery(customer_id):
     )
     db.session.add(log)
 
-    if user.cash_balance is None:
-        user.cash_balance = 0.0
-
     if payment_status == 'Paid':
         # Only add to cash balance if it was paid in Cash
         if payment_method == 'Cash':
-             user.cash_balance += amount
+            post('cash', user.id, amount, 'delivery', user.business_id, source=log)
         # Clear due amount logic remains complex, handled separately
     else: # Status is 'Due'
-        if customer.due_amount is None:
-            customer.due_amount = 0.0
-        customer.due_amount += amount
-
-    db.session.commit()
+        post('due', customer.id, amount, 'delivery', customer.business_id, source=log)
 
     invoice_items = [{
         'description': f"Supply of {jars_delivered} water jar(s)",
@@ -309,33 +314,29 @@ def log_delivery(customer_id):
     invoice = create_invoice_for_transaction(customer, customer.business, invoice_items, issue_date=log.timestamp.date(), status=invoice_status)
 
     if invoice and payment_status == 'Paid': # Send confirmation only if paid
-        send_delivery_confirmation_email(customer, customer.business, jars_delivered, amount, payment_status)
+        after_commit(send_delivery_confirmation_email, customer, customer.business, jars_delivered, amount, payment_status)
 
     flash(f'Successfully logged delivery of {jars_delivered} jar(s) to {customer.name}. Status: {payment_status} ({payment_method}).') # <-- Added method to flash
     return redirect(url_for('delivery.dashboard'))
 
 @bp.route('/add_expense', methods=['POST'])
 @login_required
+@unit_of_work
 def add_expense():
     expense_form = ExpenseForm()
     if expense_form.validate_on_submit():
-        user = User.query.get(current_user.id)
         amount = expense_form.amount.data
         description = expense_form.description.data
 
         expense = Expense(
             amount=amount,
             description=description,
-            user_id=user.id
+            category=expense_form.category.data,
+            user_id=current_user.id
         )
         db.session.add(expense)
 
-        if user.cash_balance is None:
-            user.cash_balance = 0.0
-
-        user.cash_balance -= amount
-
-        db.session.commit()
+        post('cash', current_user.id, -amount, 'expense', current_user.business_id, source=expense)
         flash(f'Expense of ₹{amount:.2f} for "{description}" recorded.')
     else:
         flash('Invalid expense data.')
@@ -344,6 +345,7 @@ def add_expense():
 
 @bp.route('/clear_dues', methods=['POST'])
 @login_required
+@unit_of_work
 def clear_dues():
     form = ClearDuesForm()
     if form.validate_on_submit():
@@ -351,29 +353,27 @@ def clear_dues():
         if customer.business_id != current_user.business_id:
             abort(403)
 
-        amount_cleared = customer.due_amount
-        customer.due_amount = 0.0
+        # Subtract what was read rather than zeroing, so a due added meanwhile isn't lost
+        amount_cleared, due_log_ids, unpaid_invoice_ids = dues_snapshot(customer.id)
+        if amount_cleared:
+            post('due', customer.id, -amount_cleared, 'dues_cleared', customer.business_id)
 
-        # Update staff's cash balance
-        staff_member = User.query.get(current_user.id)
-        if staff_member.cash_balance is None:
-            staff_member.cash_balance = 0.0
-        staff_member.cash_balance += amount_cleared
+            # Update staff's cash balance
+            post('cash', current_user.id, amount_cleared, 'dues_collected', current_user.business_id)
 
-        # Mark 'Due' logs as 'Paid'
-        DailyLog.query.filter_by(customer_id=customer.id, payment_status='Due').update({'payment_status': 'Paid'})
+        # Mark the 'Due' logs that amount covered as 'Paid'
+        DailyLog.query.filter(DailyLog.id.in_(due_log_ids)).update({'payment_status': 'Paid'})
+        report_cache.touch(db.session.connection(), [customer.business_id]) # Bulk update; bypasses the flush hook
         
-        # Mark all 'Unpaid' invoices as 'Paid' for this customer
-        Invoice.query.filter_by(customer_id=customer.id, status='Unpaid').update({'status': 'Paid'})
+        # Mark the 'Unpaid' invoices that amount covered as 'Paid'
+        Invoice.query.filter(Invoice.id.in_(unpaid_invoice_ids)).update({'status': 'Paid'})
         
-        db.session.commit()
         flash(f'Dues of ₹{amount_cleared:.2f} for {customer.name} have been cleared and added to your cash balance.', 'success')
     else:
         flash('Invalid request to clear dues.', 'danger')
 
     return redirect(url_for('delivery.dashboard'))
 
-# --- API ROUTE FOR LIVE SEARCH ---
 # --- API ROUTE FOR LIVE SEARCH ---
 @bp.route('/api/search_customers')
 @login_required
@@ -382,6 +382,10 @@ def search_customers():
     if not query:
         return jsonify([])
 
+    results = customer_search_index.search(current_user.business_id, query, limit=10)
+    if results is not None:
+        return jsonify(results)
+
     term = f"%{query}%"
     customers = Customer.query.filter(
         Customer.business_id == current_user.business_id,
@@ -400,6 +404,7 @@ def search_customers():
 
 @bp.route('/confirm_jar_request/<int:request_id>')
 @login_required
+@unit_of_work
 def confirm_jar_request(request_id):
     jar_request = db.session.query(JarRequest).join(Customer).filter(
         Customer.business_id == current_user.business_id,
@@ -418,16 +423,12 @@ def confirm_jar_request(request_id):
     )
     db.session.add(log)
     
-    user = User.query.get(current_user.id)
-    if user.cash_balance is None: user.cash_balance = 0.0
-    user.cash_balance += log.amount_collected
+    post('cash', current_user.id, log.amount_collected, 'jar_request', current_user.business_id, source=log)
     
     jar_request.status = 'Delivered'
     jar_request.delivered_by_id = current_user.id
     jar_request.delivery_timestamp = datetime.utcnow()
     
-    db.session.commit()
-    
     # --- AUTOMATIC INVOICE GENERATION FOR REQUEST ---
     invoice_items = [{
         'description': f"Supply of {log.jars_delivered} requested water jar(s)",
@@ -443,6 +444,7 @@ def confirm_jar_request(request_id):
 
 @bp.route('/confirm_event_delivery/<int:booking_id>')
 @login_required
+@unit_of_work
 def confirm_event_delivery(booking_id):
     booking = db.session.query(EventBooking).join(Customer).filter(
         Customer.business_id == current_user.business_id,
@@ -452,20 +454,18 @@ def confirm_event_delivery(booking_id):
     if booking.paid_to_manager:
         flash('Delivery confirmed. Payment was handled by the manager.')
     else:
-        staff_member = User.query.get(current_user.id)
-        if staff_member.cash_balance is None: staff_member.cash_balance = 0.0
-        staff_member.cash_balance += booking.amount
+        post('cash', current_user.id, booking.amount, 'event_payment', current_user.business_id, source=booking)
         flash(f'Delivery confirmed. ₹{booking.amount:.2f} collected and added to your balance.')
     
     booking.status = 'Delivered'
     booking.delivered_by_id = current_user.id
     booking.delivery_timestamp = datetime.utcnow()
-    db.session.commit()
     
     return redirect(url_for('delivery.dashboard'))
 
 @bp.route('/collect_event_jars/<int:booking_id>', methods=['POST'])
 @login_required
+@unit_of_work
 def collect_event_jars(booking_id):
     booking = db.session.query(EventBooking).join(Customer).filter(
         Customer.business_id == current_user.business_id,
@@ -484,14 +484,14 @@ def collect_event_jars(booking_id):
         flash(str(e), 'danger')
         return redirect(url_for('delivery.dashboard'))
 
-    business = Business.query.get(current_user.business_id)
-    staff_member = User.query.get(current_user.id)
-
-    business.jar_stock += jars_returned
-    business.dispenser_stock += dispensers_returned
-
+    business = get_business()
     missing_jars = booking.quantity - jars_returned
     missing_dispensers = (booking.dispensers_booked or 0) - dispensers_returned
+
+    # Returned items are free again; missing ones are written off
+    reservations.release(business.id, booking.event_date, booking.quantity, booking.dispensers_booked or 0)
+    if missing_jars or missing_dispensers:
+        adjust(Business, business.id, jar_stock=-missing_jars, dispenser_stock=-missing_dispensers)
     
     amount_for_missing_jars = 0
     amount_for_missing_dispensers = 0
@@ -505,8 +505,7 @@ def collect_event_jars(booking_id):
     
     if total_amount_for_missing_items > 0:
         flash(f"Please collect an additional ₹{total_amount_for_missing_items:.2f} for missing items.", "warning")
-        if staff_member.cash_balance is None: staff_member.cash_balance = 0.0
-        staff_member.cash_balance += total_amount_for_missing_items
+        post('cash', current_user.id, total_amount_for_missing_items, 'event_missing_items', current_user.business_id, source=booking)
 
     booking.status = 'Completed'
     booking.jars_returned = jars_returned
@@ -540,6 +539,5 @@ def collect_event_jars(booking_id):
     create_invoice_for_transaction(booking.customer, booking.customer.business, invoice_items, issue_date=booking.collection_timestamp.date(), status='Paid')
     # --- END ---
     
-    db.session.commit()
     flash(f"Collection from {booking.customer.name} completed. Stock and balance updated.", "success")
     return redirect(url_for('delivery.dashboard'))
\ No newline at end of file
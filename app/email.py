@@ -135,6 +135,37 @@ def send_new_order_to_supplier_email(order):
                    user_or_customer=supplier_user)
 
 # --- Add New Function for Customer Welcome Email ---
+def send_bulk_async_email(app, messages):
+    """Sends a batch of emails over a single SMTP connection."""
+    with app.app_context():
+        try:
+            with mail.connect() as connection:
+                for msg in messages:
+                    try:
+                        connection.send(msg)
+                    except Exception as e:
+                        app.logger.error(f"Failed to send email to {msg.recipients}: {e}")
+        except Exception as e:
+            app.logger.error(f"Failed to open mail connection for {len(messages)} email(s): {e}")
+
+def queue_customer_welcome_emails(recipients):
+    """
+    Queues welcome emails for customers added in bulk: the messages are rendered now
+    and sent by one background thread over one connection, instead of a thread each.
+    `recipients` is a list of (customer, password).
+    """
+    if not recipients:
+        return
+    login_url = url_for('auth.login', _external=True)
+    messages = []
+    for customer, password in recipients:
+        msg = Message(f'[Aquajal] Welcome to {customer.business.name}!',
+                      sender=current_app.config['ADMINS'][0], recipients=[customer.email])
+        msg.body = render_template('email/customer_welcome.txt', customer=customer, password=password, login_url=login_url)
+        msg.html = render_template('email/customer_welcome.html', customer=customer, password=password, login_url=login_url)
+        messages.append(msg)
+    Thread(target=send_bulk_async_email, args=(current_app._get_current_object(), messages)).start()
+
 def send_customer_welcome_email(customer, password):
     """Sends a welcome email to a newly added customer."""
     login_url = url_for('auth.login', _external=True)
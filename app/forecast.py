@@ -0,0 +1,152 @@
+# File: app/forecast.py
+
+from datetime import date, datetime, timedelta
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert, delete, func
+from app import db
+from app.models import Business, Customer, DailyLog, JarForecast
+
+# A weekday seen only a few times leans towards "no weekly pattern"; this many
+# weeks of prior weight are mixed into every weekday factor.
+SEASON_PRIOR_WEEKS = 2.0
+# Per-customer forecasts below this many jars a day are not stored
+MIN_CUSTOMER_JARS = 0.05
+
+
+def history_matrix(customer_ids, days, jars, start, n_days):
+    """
+    Turns (customer_id, day, jars) triples into (sorted unique customer ids, a
+    customers x days array of jars delivered). `days` may be dates or ISO date strings
+    (SQLite's date() returns text); day 0 is `start`.
+    """
+    ids, rows = np.unique(np.asarray(customer_ids, dtype=np.int64), return_inverse=True)
+    cols = (np.asarray(days, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    matrix = np.zeros((len(ids), n_days))
+    matrix[rows, cols] = np.asarray(jars, dtype=float)
+    return ids, matrix
+
+
+def fit(history, start, horizon, alpha):
+    """
+    Forecasts each row of `history` (series x days, day 0 = `start`) for the
+    `horizon` days that follow it, as level x weekday factor:
+
+    - level: exponentially weighted mean of the series since its first delivery
+      (days before a customer's first delivery don't drag the level down);
+    - weekday factor: the series' mean on that weekday over the same span, relative
+      to its overall mean, shrunk towards 1 by SEASON_PRIOR_WEEKS.
+
+    Everything is a handful of array operations over the whole matrix, so 10k
+    customers x 365 days fits in well under a second. Returns a series x horizon array.
+    """
+    n_series, n_days = history.shape
+    delivered = history > 0
+    first = np.where(delivered.any(axis=1), delivered.argmax(axis=1), n_days)
+
+    # Newest day has weight 1; suffix_weights[i] is the total weight of days i.. (0 past the end)
+    weights = (1.0 - alpha) ** np.arange(n_days - 1, -1, -1)
+    suffix_weights = np.append(np.cumsum(weights[::-1])[::-1], 0.0)
+    level = np.divide(history @ weights, suffix_weights[first],
+                      out=np.zeros(n_series), where=suffix_weights[first] > 0)
+
+    weekday = (np.arange(n_days) + start.weekday()) % 7
+    onehot = np.eye(7)[weekday]
+    suffix_counts = np.vstack([np.cumsum(onehot[::-1], axis=0)[::-1], np.zeros((1, 7))])
+    weekday_counts = suffix_counts[first]
+    weekday_mean = np.divide(history @ onehot, weekday_counts,
+                             out=np.zeros((n_series, 7)), where=weekday_counts > 0)
+    span = (n_days - first)[:, None]
+    mean = np.divide(history.sum(axis=1, keepdims=True), span, out=np.zeros((n_series, 1)), where=span > 0)
+    raw_factor = np.divide(weekday_mean, mean, out=np.ones((n_series, 7)), where=mean > 0)
+    factor = (weekday_counts * raw_factor + SEASON_PRIOR_WEEKS) / (weekday_counts + SEASON_PRIOR_WEEKS)
+
+    horizon_weekday = (np.arange(n_days, n_days + horizon) + start.weekday()) % 7
+    return level[:, None] * factor[:, horizon_weekday]
+
+
+def _history(business_id, start, n_days):
+    """Jars per customer per day for one business, from one grouped query."""
+    day = func.date(DailyLog.timestamp)
+    rows = db.session.execute(
+        select(DailyLog.customer_id, day, func.sum(DailyLog.jars_delivered))
+        .join(Customer, DailyLog.customer_id == Customer.id)
+        .where(Customer.business_id == business_id,
+               DailyLog.timestamp >= datetime.combine(start, datetime.min.time()),
+               DailyLog.timestamp < datetime.combine(start + timedelta(days=n_days), datetime.min.time()))
+        .group_by(DailyLog.customer_id, day)
+    ).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((0, n_days))
+    return history_matrix(*zip(*rows), start, n_days)
+
+
+def forecast_business(business_id, today=None):
+    """Replaces the business's forecast rows for the days after `today`. Returns the number written."""
+    config = current_app.config
+    today = today or date.today()
+    n_days, horizon, alpha = config['FORECAST_HISTORY_DAYS'], config['FORECAST_HORIZON_DAYS'], config['FORECAST_ALPHA']
+    start = today - timedelta(days=n_days - 1)
+    dates = [today + timedelta(days=offset) for offset in range(1, horizon + 1)]
+    generated_at = datetime.utcnow()
+
+    customer_ids, history = _history(business_id, start, n_days)
+    total = fit(history.sum(axis=0, keepdims=True), start, horizon, alpha)[0]
+    rows = [{'business_id': business_id, 'customer_id': None, 'forecast_date': day,
+             'jars': round(float(jars), 2), 'generated_at': generated_at} for day, jars in zip(dates, total)]
+    if len(customer_ids):
+        per_customer = fit(history, start, horizon, alpha)
+        for row, col in zip(*np.nonzero(per_customer >= MIN_CUSTOMER_JARS)):
+            rows.append({'business_id': business_id, 'customer_id': int(customer_ids[row]), 'forecast_date': dates[col],
+                         'jars': round(float(per_customer[row, col]), 2), 'generated_at': generated_at})
+
+    db.session.execute(delete(JarForecast).where(JarForecast.business_id == business_id))
+    db.session.execute(insert(JarForecast), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def refresh_forecasts(business_id=None):
+    """Recomputes every business's forecast (or one), committing per business. Returns rows written."""
+    query = db.session.query(Business.id)
+    if business_id is not None:
+        query = query.filter(Business.id == business_id)
+    return sum(forecast_business(bid) for (bid,) in query.all())
+
+
+def business_forecast(business_id):
+    """[(date, jars)] of the business-wide forecast, from tomorrow on."""
+    return db.session.query(JarForecast.forecast_date, JarForecast.jars).filter(
+        JarForecast.business_id == business_id, JarForecast.customer_id == None,  # noqa: E711
+        JarForecast.forecast_date > date.today()
+    ).order_by(JarForecast.forecast_date).all()
+
+
+def customers_expected(business_id, day):
+    """How many customers are expected to take at least half a jar on `day`."""
+    return db.session.query(func.count(JarForecast.id)).filter(
+        JarForecast.business_id == business_id, JarForecast.customer_id != None,  # noqa: E711
+        JarForecast.forecast_date == day, JarForecast.jars >= 0.5
+    ).scalar()
+
+
+def forecast_jars(app):
+    """Scheduled nightly, after the day's deliveries are in."""
+    with app.app_context():
+        count = refresh_forecasts()
+        print(f"[{datetime.utcnow()}] Jar forecast rows written: {count}")
+
+
+@click.command('forecast-jars')
+@click.option('--business', 'business_id', type=int, default=None, help='Only forecast one business.')
+@with_appcontext
+def forecast_jars_command(business_id):
+    """Recomputes the jar forecasts now instead of waiting for the nightly job."""
+    print(f"✅ {refresh_forecasts(business_id)} forecast row(s) written.")
+
+
+def init_app(app):
+    """Register the CLI command with the Flask app."""
+    app.cli.add_command(forecast_jars_command)
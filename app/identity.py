@@ -0,0 +1,127 @@
+# File: app/identity.py
+
+from sqlalchemy import event, inspect, or_, tuple_
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import LoginIdentity, User, Customer
+
+# Model attribute that feeds each identity kind
+IDENTITY_FIELDS = {'username': 'username', 'email': 'email', 'mobile': 'mobile_number'}
+
+
+def normalize_identifier(value):
+    """Identifiers are matched case-insensitively, exactly like the old func.lower() lookups."""
+    return (value or '').strip().lower()
+
+
+def _desired_identities(principal):
+    identities = set()
+    for kind, field in IDENTITY_FIELDS.items():
+        identifier = normalize_identifier(getattr(principal, field, None))
+        if identifier:
+            identities.add((kind, identifier))
+    return identities
+
+
+def _changed_kinds(principal):
+    """Identity kinds whose normalized value is new in this flush (all of them for a new principal)."""
+    state = inspect(principal)
+    if state.transient or state.pending:
+        return set(IDENTITY_FIELDS)
+    changed = set()
+    for kind, field in IDENTITY_FIELDS.items():
+        history = state.attrs[field].history
+        old = history.deleted[0] if history.deleted else None
+        if history.has_changes() and normalize_identifier(old) != normalize_identifier(getattr(principal, field, None)):
+            changed.add(kind)
+    return changed
+
+
+def _owned_by_others(principal, keys):
+    """The unique (kind, identifier) pairs among `keys` that another principal already holds."""
+    keys = [key for key in keys if key[0] != 'mobile']
+    if not keys:
+        return set()
+    owner = LoginIdentity.user_id if isinstance(principal, User) else LoginIdentity.customer_id
+    query = db.session.query(LoginIdentity.kind, LoginIdentity.identifier).filter(
+        tuple_(LoginIdentity.kind, LoginIdentity.identifier).in_(keys))
+    if principal.id is not None:
+        query = query.filter(or_(owner.is_(None), owner != principal.id))
+    with db.session.no_autoflush:
+        return {tuple(row) for row in query.all()}
+
+
+def sync_identities(principal):
+    """
+    Adds/removes LoginIdentity rows so they match the principal's current identifiers.
+
+    An unchanged identifier without a row is a clash the login_identity migration
+    reported (it belongs to someone else), and is left with its owner so editing
+    another field still works. A new or changed identifier is always added: if it
+    is taken, the unique index makes the flush fail rather than save a principal
+    that can't log in.
+    """
+    desired = _desired_identities(principal)
+    current = {(identity.kind, identity.identifier): identity for identity in principal.login_identities}
+
+    for key, identity in current.items():
+        if key not in desired:
+            principal.login_identities.remove(identity)  # delete-orphan removes the row
+    missing = desired - set(current)
+    changed = _changed_kinds(principal)
+    legacy = {key for key in missing if key[0] not in changed}
+    for kind, identifier in missing - _owned_by_others(principal, legacy):
+        principal.login_identities.append(LoginIdentity(kind=kind, identifier=identifier))
+
+
+def _identifiers_changed(principal):
+    state = inspect(principal)
+    return any(state.attrs[field].history.has_changes() for field in IDENTITY_FIELDS.values())
+
+
+@event.listens_for(db.session, 'before_flush')
+def _sync_identities_before_flush(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, (User, Customer)) or obj in session.deleted:
+            continue
+        if obj in session.new or _identifiers_changed(obj):
+            sync_identities(obj)
+
+
+def find_login_candidates(login_identifier):
+    """
+    Returns the Users/Customers matching a username, email or mobile number in one
+    indexed query. Employees come first, mirroring the previous User-then-Customer order.
+    """
+    identifier = normalize_identifier(login_identifier)
+    if not identifier:
+        return []
+    identities = LoginIdentity.query.options(
+        joinedload(LoginIdentity.user), joinedload(LoginIdentity.customer)
+    ).filter(
+        LoginIdentity.identifier == identifier
+    ).order_by(LoginIdentity.user_id.is_(None), LoginIdentity.id).all()
+
+    candidates = []
+    for identity in identities:
+        if identity.principal is not None and identity.principal not in candidates:
+            candidates.append(identity.principal)
+    return candidates
+
+
+def identifier_taken(kind, value, exclude=None, users_only=False):
+    """
+    Single-query uniqueness check across Users and Customers.
+    `exclude` is the principal being edited, whose own identifiers don't count.
+    """
+    identifier = normalize_identifier(value)
+    if not identifier:
+        return False
+    query = LoginIdentity.query.filter_by(kind=kind, identifier=identifier)
+    if users_only:
+        query = query.filter(LoginIdentity.user_id.isnot(None))
+    if isinstance(exclude, User):
+        query = query.filter(or_(LoginIdentity.user_id.is_(None), LoginIdentity.user_id != exclude.id))
+    elif isinstance(exclude, Customer):
+        query = query.filter(or_(LoginIdentity.customer_id.is_(None), LoginIdentity.customer_id != exclude.id))
+    return db.session.query(query.exists()).scalar()
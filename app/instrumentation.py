@@ -0,0 +1,30 @@
+# File: app/instrumentation.py
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_app(app):
+    """
+    Counts SQL statements per request. With QUERY_COUNT_LOGGING enabled the count is
+    logged and returned in an X-Query-Count header, which makes it easy to compare a
+    page before and after a change (e.g. with PRINCIPAL_CACHE_TTL=0 vs. the default).
+    """
+    @app.before_request
+    def reset_query_count():
+        g.query_count = 0
+
+    @app.after_request
+    def report_query_count(response):
+        if app.config.get('QUERY_COUNT_LOGGING'):
+            count = g.get('query_count', 0)
+            response.headers['X-Query-Count'] = str(count)
+            app.logger.info(f"{request.method} {request.path} -> {count} queries")
+        return response
@@ -8,6 +8,8 @@ from app.models import Invoice, Customer, InvoiceItem, EventBooking, DailyLog, U
 from weasyprint import HTML, CSS
 from app.email import send_invoice_email
 from app.decorators import manager_required
+from app.pagination import keyset_paginate, SortKey
+from app.loaders import load
 from datetime import date, timedelta
 
 # --- HELPER FUNCTIONS ---
@@ -17,6 +19,7 @@ def generate_new_invoice_number(business_id):
     return f"AQUA-{business_id}-{date.today().year}-{last_invoice_num + 1:04d}"
 
 def create_invoice_for_transaction(customer, business, items, issue_date=None, status='Unpaid'):
+    """Adds an invoice for a delivery or event to the caller's transaction; the caller commits."""
     if not issue_date:
         issue_date = date.today()
 
@@ -44,14 +47,14 @@ def create_invoice_for_transaction(customer, business, items, issue_date=None, s
         )
         new_invoice.items.append(item)
     
-    db.session.commit()
+    db.session.flush()
     return new_invoice
 
 # Route to view a single invoice as HTML
 @bp.route('/view/<int:invoice_id>')
 @login_required
 def view_invoice(invoice_id):
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.query.options(*load('invoice_document')).get_or_404(invoice_id)
     # Security check
     if isinstance(current_user, Customer) and invoice.customer_id != current_user.id:
         abort(403)
@@ -65,7 +68,7 @@ def view_invoice(invoice_id):
 @bp.route('/download/<int:invoice_id>')
 @login_required
 def download_invoice(invoice_id):
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.query.options(*load('invoice_document')).get_or_404(invoice_id)
     # Security check
     if isinstance(current_user, Customer) and invoice.customer_id != current_user.id:
         abort(403)
@@ -87,7 +90,7 @@ def email_invoice(invoice_id):
     if current_user.role != 'manager':
         abort(403)
     
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.query.options(*load('invoice_document')).get_or_404(invoice_id)
     if invoice.business_id != current_user.business_id:
         abort(403)
     
@@ -104,16 +107,22 @@ def email_invoice(invoice_id):
 @login_required
 @manager_required
 def list_invoices():
-    page = request.args.get('page', 1, type=int)
-    
-    # Fetch customer invoices
-    customer_invoices = Invoice.query.filter_by(business_id=current_user.business_id).order_by(Invoice.issue_date.desc()).paginate(page=page, per_page=10)
+    # Fetch customer invoices (keyset paginated on issue date, newest first)
+    customer_invoices = keyset_paginate(
+        Invoice.query.options(*load('invoice_list')).filter_by(business_id=current_user.business_id),
+        [SortKey(Invoice.issue_date, descending=True), SortKey(Invoice.id, descending=True)],
+        cursor=request.args.get('cursor'), per_page=10
+    )
     
     # Fetch supplier invoices (Purchase Orders)
-    supplier_invoices = PurchaseOrder.query.filter(
-        PurchaseOrder.business_id == current_user.business_id,
-        PurchaseOrder.invoice_number.isnot(None)
-    ).order_by(PurchaseOrder.order_date.desc()).all()
+    supplier_invoices = keyset_paginate(
+        PurchaseOrder.query.options(*load('supplier_invoice_list')).filter(
+            PurchaseOrder.business_id == current_user.business_id,
+            PurchaseOrder.invoice_number.isnot(None)
+        ),
+        [SortKey(PurchaseOrder.order_date, descending=True), SortKey(PurchaseOrder.id, descending=True)],
+        cursor=request.args.get('supplier_cursor'), per_page=10
+    )
 
     return render_template('manager/list_invoices.html', 
                            customer_invoices=customer_invoices, 
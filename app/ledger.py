@@ -0,0 +1,189 @@
+# File: app/ledger.py
+
+import click
+from datetime import datetime
+from flask import has_request_context
+from flask.cli import with_appcontext
+from flask_login import current_user
+from sqlalchemy import func, insert, select, and_, literal
+from sqlalchemy.orm import aliased
+from app import db
+from app.counters import adjust
+from app.models import LedgerEntry, LedgerSnapshot, User, Customer
+
+# account -> (model holding the cached balance, column)
+ACCOUNTS = {
+    'cash': (User, 'cash_balance'),
+    'due': (Customer, 'due_amount'),
+}
+TOLERANCE = 0.005
+
+
+def post(account, account_id, amount, kind, business_id, source=None):
+    """
+    Moves `amount` into an account and journals it. The cached balance is updated
+    atomically (app.counters.adjust) and the value it returns becomes the entry's
+    running balance, so concurrent posts can't produce a broken chain.
+
+        post('cash', current_user.id, amount, 'delivery', current_user.business_id, source=log)
+    """
+    model, column = ACCOUNTS[account]
+    values = adjust(model, account_id, **{column: amount})
+    if values is None:
+        raise ValueError(f"No {account} account with id {account_id}.")
+
+    source_type = source_id = None
+    if source is not None:
+        if source.id is None:
+            db.session.flush()
+        source_type, source_id = source.__tablename__, source.id
+
+    entry = LedgerEntry(
+        business_id=business_id,
+        account=account,
+        account_id=account_id,
+        amount=amount,
+        balance=values[column],
+        kind=kind,
+        source_type=source_type,
+        source_id=source_id,
+        created_by_id=current_user.id if has_request_context() and current_user.is_authenticated
+                      and isinstance(current_user, User) else None
+    )
+    db.session.add(entry)
+    return entry
+
+
+def balance_at(account, account_id, when):
+    """Balance of an account at `when`: the running balance of the last entry before it."""
+    balance = db.session.query(LedgerEntry.balance).filter(
+        LedgerEntry.account == account,
+        LedgerEntry.account_id == account_id,
+        LedgerEntry.timestamp <= when
+    ).order_by(LedgerEntry.timestamp.desc(), LedgerEntry.id.desc()).limit(1).scalar()
+    return balance or 0.0
+
+
+def statement(account, account_id, start, end):
+    """Returns (opening_balance, entries) for start <= timestamp < end."""
+    entries = LedgerEntry.query.filter(
+        LedgerEntry.account == account,
+        LedgerEntry.account_id == account_id,
+        LedgerEntry.timestamp >= start,
+        LedgerEntry.timestamp < end
+    ).order_by(LedgerEntry.timestamp, LedgerEntry.id).all()
+    if entries:
+        opening = entries[0].balance - entries[0].amount
+    else:
+        opening = balance_at(account, account_id, start)
+    return opening, entries
+
+
+def _latest_entries(business_id=None):
+    """Subquery of (account, account_id, entry_id) for the newest entry of every account."""
+    query = select(
+        LedgerEntry.account, LedgerEntry.account_id, func.max(LedgerEntry.id).label('entry_id')
+    ).group_by(LedgerEntry.account, LedgerEntry.account_id)
+    if business_id:
+        query = query.where(LedgerEntry.business_id == business_id)
+    return query.subquery()
+
+
+def _latest_snapshots(business_id=None):
+    query = select(
+        LedgerSnapshot.account, LedgerSnapshot.account_id, func.max(LedgerSnapshot.entry_id).label('entry_id')
+    ).group_by(LedgerSnapshot.account, LedgerSnapshot.account_id)
+    if business_id:
+        query = query.where(LedgerSnapshot.business_id == business_id)
+    return query.subquery()
+
+
+def reconcile(business_id=None):
+    """
+    Checks every account in bulk and returns a list of problems:
+    - the cached balance (User.cash_balance / Customer.due_amount) must equal the last running balance;
+    - the last snapshot plus the amounts journaled after it must equal the last running balance.
+    """
+    problems = []
+    latest = _latest_entries(business_id)
+
+    for account, (model, column) in ACCOUNTS.items():
+        cached = func.coalesce(getattr(model, column), 0.0)
+        rows = db.session.query(model.id, cached, LedgerEntry.balance).outerjoin(
+            latest, and_(latest.c.account == account, latest.c.account_id == model.id)
+        ).outerjoin(LedgerEntry, LedgerEntry.id == latest.c.entry_id).filter(
+            func.abs(cached - func.coalesce(LedgerEntry.balance, 0.0)) > TOLERANCE
+        )
+        if business_id:
+            rows = rows.filter(model.business_id == business_id)
+        for account_id, cached_balance, journal_balance in rows:
+            problems.append(f"{account} #{account_id}: cached balance {cached_balance:.2f}, "
+                            f"journal {journal_balance or 0.0:.2f}")
+
+    # Accounts without a snapshot are summed from their first entry
+    snapshots = _latest_snapshots(business_id)
+    later = aliased(LedgerEntry)
+    last = aliased(LedgerEntry)
+    snapshot_entry_id = func.coalesce(snapshots.c.entry_id, 0)
+    amount_since = select(func.coalesce(func.sum(later.amount), 0.0)).where(
+        later.account == latest.c.account, later.account_id == latest.c.account_id, later.id > snapshot_entry_id
+    ).scalar_subquery()
+    rows = db.session.query(
+        latest.c.account, latest.c.account_id, func.coalesce(LedgerSnapshot.balance, 0.0), amount_since, last.balance
+    ).join(last, last.id == latest.c.entry_id).outerjoin(snapshots, and_(
+        snapshots.c.account == latest.c.account, snapshots.c.account_id == latest.c.account_id
+    )).outerjoin(LedgerSnapshot, and_(
+        LedgerSnapshot.account == snapshots.c.account,
+        LedgerSnapshot.account_id == snapshots.c.account_id,
+        LedgerSnapshot.entry_id == snapshots.c.entry_id
+    ))
+    for account, account_id, snapshot_balance, amount, balance in rows:
+        if abs(snapshot_balance + amount - balance) > TOLERANCE:
+            problems.append(f"{account} #{account_id}: snapshot {snapshot_balance:.2f} + entries {amount:.2f} "
+                            f"!= running balance {balance:.2f}")
+    return problems
+
+
+def take_snapshots(business_id=None):
+    """Snapshots every account that has entries newer than its last snapshot. Returns the number written."""
+    latest = _latest_entries(business_id)
+    snapshots = _latest_snapshots(business_id)
+    source = select(
+        LedgerEntry.business_id, LedgerEntry.account, LedgerEntry.account_id, LedgerEntry.id,
+        LedgerEntry.balance, literal(datetime.utcnow(), db.DateTime)
+    ).join(latest, LedgerEntry.id == latest.c.entry_id).outerjoin(snapshots, and_(
+        snapshots.c.account == latest.c.account, snapshots.c.account_id == latest.c.account_id
+    )).where((snapshots.c.entry_id == None) | (snapshots.c.entry_id < latest.c.entry_id))  # noqa: E711
+    result = db.session.execute(insert(LedgerSnapshot).from_select(
+        ['business_id', 'account', 'account_id', 'entry_id', 'balance', 'taken_at'], source
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def snapshot_ledger(app):
+    """Scheduled nightly; keeps reconciliation scans short."""
+    with app.app_context():
+        count = take_snapshots()
+        print(f"[{datetime.utcnow()}] Ledger snapshots written: {count}")
+
+
+@click.command('reconcile-ledger')
+@click.option('--business', 'business_id', type=int, default=None, help='Only check one business.')
+@click.option('--snapshot', is_flag=True, help='Write new snapshots if everything reconciles.')
+@with_appcontext
+def reconcile_ledger_command(business_id, snapshot):
+    """Verifies cached cash/due balances against the money journal."""
+    problems = reconcile(business_id)
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        raise SystemExit(1)
+    print("✅ All balances match the journal.")
+    if snapshot:
+        print(f"✅ {take_snapshots(business_id)} snapshot(s) written.")
+
+
+def init_app(app):
+    """Register the CLI command with the Flask app."""
+    app.cli.add_command(reconcile_ledger_command)
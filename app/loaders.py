@@ -0,0 +1,77 @@
+# File: app/loaders.py
+
+from flask import current_app
+from sqlalchemy.orm import selectinload, joinedload, contains_eager, raiseload
+from app.models import (
+    PurchaseOrder, PurchaseOrderItem, SupplierProfile, Invoice, Customer,
+    EventBooking, JarRequest, User, ReorderSuggestion, SupplierProduct
+)
+
+# Named eager-loading profiles: everything a template walks for one kind of page,
+# loaded with the rows instead of one query per row. "contains_eager" profiles are
+# for queries that already join the related table for their business filter.
+PROFILES = {
+    # manager/view_orders.html
+    'purchase_order_list': lambda: (
+        joinedload(PurchaseOrder.supplier),
+        selectinload(PurchaseOrder.items).joinedload(PurchaseOrderItem.product),
+    ),
+    # manager/list_invoices.html (supplier invoices tab)
+    'supplier_invoice_list': lambda: (
+        joinedload(PurchaseOrder.supplier),
+    ),
+    # supplier/dashboard.html
+    'supplier_order_list': lambda: (
+        joinedload(PurchaseOrder.business),
+    ),
+    # supplier/order_details.html, procurement/invoice_template.html
+    'purchase_order_document': lambda: (
+        joinedload(PurchaseOrder.business),
+        joinedload(PurchaseOrder.supplier).joinedload(SupplierProfile.user),
+        selectinload(PurchaseOrder.items).joinedload(PurchaseOrderItem.product),
+    ),
+    # invoices/invoice_template.html and the invoice email
+    'invoice_document': lambda: (
+        joinedload(Invoice.customer).joinedload(Customer.business),
+        selectinload(Invoice.items),
+    ),
+    # manager/list_invoices.html (customer invoices tab)
+    'invoice_list': lambda: (
+        joinedload(Invoice.customer),
+    ),
+    # delivery/dashboard.html, manager/dashboard.html
+    'booking_with_customer': lambda: (
+        contains_eager(EventBooking.customer),
+    ),
+    # manager/stock_management.html
+    'booking_outstanding': lambda: (
+        contains_eager(EventBooking.customer),
+        joinedload(EventBooking.delivered_by),
+    ),
+    'jar_request_with_customer': lambda: (
+        contains_eager(JarRequest.customer),
+    ),
+    # admin/dashboard.html
+    'user_with_business': lambda: (
+        joinedload(User.business),
+    ),
+    # manager.dashboard restocking alerts
+    'reorder_suggestion': lambda: (
+        joinedload(ReorderSuggestion.product).joinedload(SupplierProduct.supplier),
+    ),
+}
+
+
+def load(profile):
+    """
+    Loader options for a named profile, for Query.options():
+
+        PurchaseOrder.query.options(*load('purchase_order_list'))
+
+    With SQLALCHEMY_RAISELOAD on (tests and development), every relationship the
+    profile doesn't cover raises instead of lazy loading, so a new N+1 fails loudly.
+    """
+    options = list(PROFILES[profile]())
+    if current_app.config.get('SQLALCHEMY_RAISELOAD'):
+        options.append(raiseload('*'))
+    return options
@@ -1,17 +1,19 @@
 # /water_supply_app/app/manager/routes.py
 
-from flask import render_template, flash, redirect, url_for, request, abort, current_app, session
+from flask import render_template, flash, redirect, url_for, request, abort, current_app, session, jsonify, Response
 from flask_login import login_required, current_user
 from app import db
 from app.manager import bp
 from app.models import (User, DailyLog, Expense, CashHandover, ProductSale, Customer,
                         Business, JarRequest, EventBooking, Invoice, InvoiceItem,
-                        SupplierProduct, SupplierProfile, PurchaseOrder, PurchaseOrderItem)
+                        SupplierProduct, SupplierProfile, PurchaseOrder, PurchaseOrderItem, ReorderSuggestion, ReportJob,
+                        PayrollRun)
 from functools import wraps
 from datetime import date, datetime, timedelta
-from sqlalchemy import func, cast, Date
-from zoneinfo import ZoneInfo
+from sqlalchemy import func
 import os
+import io
+import csv
 import calendar
 from werkzeug.utils import secure_filename
 import razorpay
@@ -28,6 +30,22 @@ from wtforms.validators import DataRequired, Optional, Length, ValidationError,
 from app.delivery.routes import EventBookingByStaffForm
 from app.email import send_booking_confirmed_email_to_staff, send_booking_confirmed_email_to_customer, send_new_order_to_supplier_email
 from app.decorators import manager_required, subscription_required # Import decorators
+from app.identity import identifier_taken, normalize_identifier
+from app.tenant import get_business
+from app.counters import adjust, dues_snapshot
+from app.ledger import ACCOUNTS, post, statement
+from app.daily_ledger import daily_ledger_page
+from app.pagination import keyset_paginate, SortKey
+from app.loaders import load
+from app.projections import STAFF_LIST
+from app.forecast import business_forecast, customers_expected
+from app.periods import monthly_report, is_finished, get_period, close_period, reopen_period, month_bounds
+from app import payroll
+from app.reports import DAILY_LEDGER_PAGE_SIZE, ist_day_bounds, manager_report
+from app import reports as reports_module
+from app.reorder import DRAFT
+from app import reservations
+from app import report_cache
 
 # --- Forms ---
 class AddStaffForm(FlaskForm):
@@ -48,7 +66,7 @@ class AddStaffForm(FlaskForm):
     submit = SubmitField('Create Staff Member')
 
     def validate_username(self, username):
-        if User.query.filter_by(username=username.data).first() or Customer.query.filter_by(username=username.data).first():
+        if identifier_taken('username', username.data):
             raise ValidationError('This username is already taken. Please choose a different one.')
 
     def validate(self, **kwargs):
@@ -115,9 +133,8 @@ class EditStaffByManagerForm(FlaskForm):
         self.original_username = original_username
 
     def validate_username(self, username):
-        if username.data != self.original_username:
-            user = User.query.filter_by(username=self.username.data).first()
-            if user is not None:
+        if normalize_identifier(username.data) != normalize_identifier(self.original_username):
+            if identifier_taken('username', username.data):
                 raise ValidationError('Please use a different username.')
 
     def validate(self, **kwargs):
@@ -166,19 +183,32 @@ class ManagerProfileForm(FlaskForm):
         self.original_email = original_email
 
     def validate_username(self, username):
-        if username.data != self.original_username:
-            user = User.query.filter_by(username=self.username.data).first()
-            if user is not None:
+        if normalize_identifier(username.data) != normalize_identifier(self.original_username):
+            if identifier_taken('username', username.data):
                 raise ValidationError('Please use a different username.')
 
     def validate_email(self, email):
-        if email.data and email.data != self.original_email:
-            user = User.query.filter_by(email=email.data).first()
-            if user:
+        if email.data and normalize_identifier(email.data) != normalize_identifier(self.original_email):
+            if identifier_taken('email', email.data):
                 raise ValidationError('This email address is already registered.')
 
 # --- Custom Decorators (moved to decorators.py) ---
 
+def _low_stock_alert(suggestion, stock):
+    """Alert data for the dashboard once live stock is at or below the suggestion's reorder point."""
+    if suggestion is None or suggestion.product is None or stock is None or stock > suggestion.reorder_point:
+        return None
+    # Top up to the same target the nightly job aimed for
+    target = suggestion.stock + suggestion.order_quantity
+    return {
+        'product': suggestion.product,
+        'final_price': suggestion.unit_price,
+        'quantity': max(target - stock, 1),
+        'reorder_point': suggestion.reorder_point,
+        'burn_rate': suggestion.burn_rate,
+        'draft_order_id': suggestion.purchase_order_id
+    }
+
 # --- Routes ---
 @bp.route('/dashboard', methods=['GET', 'POST'])
 @login_required
@@ -192,40 +222,33 @@ def dashboard():
     low_stock_jar = None
     low_stock_dispenser = None
     quick_order_form = None
+    forecast_tomorrow = None
+    customers_tomorrow = 0
 
     if not current_user.business_id:
         flash("You are not assigned to a business. Please contact the administrator.")
     else:
-        business = Business.query.get(current_user.business_id)
+        business = get_business()
         staff_members = User.query.filter_by(role='staff', business_id=current_user.business_id).order_by(User.username).all()
         total_staff_balance = sum(staff.cash_balance for staff in staff_members if staff.cash_balance)
-        pending_bookings = db.session.query(EventBooking).join(Customer).filter(
+        pending_bookings = db.session.query(EventBooking).join(Customer).options(*load('booking_with_customer')).filter(
             Customer.business_id == current_user.business_id,
             EventBooking.status == 'Pending'
         ).order_by(EventBooking.event_date).all()
         total_dues = db.session.query(func.sum(Customer.due_amount)).filter(Customer.business_id == current_user.business_id).scalar() or 0.0
 
-        if business.jar_stock is not None and business.low_stock_threshold is not None and business.jar_stock <= business.low_stock_threshold:
-            low_stock_jar_product = SupplierProduct.query.filter(SupplierProduct.name.ilike('%jar%')).order_by(SupplierProduct.price).first()
-            if low_stock_jar_product:
-                final_price = low_stock_jar_product.price
-                if low_stock_jar_product.discount_percentage and low_stock_jar_product.discount_percentage > 0:
-                    final_price = low_stock_jar_product.price - (low_stock_jar_product.price * low_stock_jar_product.discount_percentage / 100)
-                low_stock_jar = {
-                    'product': low_stock_jar_product,
-                    'final_price': final_price
-                }
-
-        if business.dispenser_stock is not None and business.low_stock_threshold_dispenser is not None and business.dispenser_stock <= business.low_stock_threshold_dispenser:
-            low_stock_dispenser_product = SupplierProduct.query.filter(SupplierProduct.name.ilike('%dispenser%')).order_by(SupplierProduct.price).first()
-            if low_stock_dispenser_product:
-                final_price = low_stock_dispenser_product.price
-                if low_stock_dispenser_product.discount_percentage and low_stock_dispenser_product.discount_percentage > 0:
-                    final_price = low_stock_dispenser_product.price - (low_stock_dispenser_product.price * low_stock_dispenser_product.discount_percentage / 100)
-                low_stock_dispenser = {
-                    'product': low_stock_dispenser_product,
-                    'final_price': final_price
-                }
+        # Written nightly by app.forecast
+        forecast = business_forecast(current_user.business_id)
+        if forecast and forecast[0].forecast_date == date.today() + timedelta(days=1):
+            forecast_tomorrow = forecast[0].jars
+            customers_tomorrow = customers_expected(current_user.business_id, forecast[0].forecast_date)
+
+        # Precomputed nightly by app.reorder; compared with the live stock here
+        suggestions = {suggestion.category: suggestion for suggestion in ReorderSuggestion.query.options(
+            *load('reorder_suggestion')
+        ).filter_by(business_id=business.id)}
+        low_stock_jar = _low_stock_alert(suggestions.get('Jars'), business.jar_stock)
+        low_stock_dispenser = _low_stock_alert(suggestions.get('Dispensers'), business.dispenser_stock)
 
         if low_stock_jar or low_stock_dispenser:
             quick_order_form = AddToCartForm()
@@ -234,13 +257,16 @@ def dashboard():
     return render_template(
         'manager/dashboard.html',
         title="Manager Dashboard",
+        business=get_business(),
         staff_members=staff_members,
         total_staff_balance=total_staff_balance,
         pending_bookings=pending_bookings,
         total_dues=total_dues,
         low_stock_jar=low_stock_jar,
         low_stock_dispenser=low_stock_dispenser,
-        quick_order_form=quick_order_form
+        quick_order_form=quick_order_form,
+        forecast_tomorrow=forecast_tomorrow,
+        customers_tomorrow=customers_tomorrow
     )
 
 
@@ -261,9 +287,10 @@ def receive_cash(staff_id):
         )
         db.session.add(handover)
 
-        staff.cash_balance = 0.0
+        # Subtract the amount handed over; cash the staff collected meanwhile stays on their balance
+        post('cash', staff.id, -handover.amount, 'handover', staff.business_id, source=handover)
         db.session.commit()
-        flash(f'Successfully received ₹{handover.amount:.2f} from {staff.username}. Their balance is now zero.')
+        flash(f'Successfully received ₹{handover.amount:.2f} from {staff.username}. Their balance is now ₹{staff.cash_balance or 0:.2f}.')
     else:
         flash(f'{staff.username} has no cash balance to hand over.')
 
@@ -278,17 +305,24 @@ def clear_dues(customer_id):
     if customer.business_id != current_user.business_id:
         abort(403)
 
-    amount_cleared = customer.due_amount
-    customer.due_amount = 0.0
+    # Clear what was read, and only the logs and invoices it covers; a due delivery logged meanwhile stays due
+    amount_cleared, due_log_ids, unpaid_invoice_ids = dues_snapshot(customer.id)
+    if amount_cleared:
+        post('due', customer.id, -amount_cleared, 'dues_cleared', customer.business_id)
 
-    DailyLog.query.filter_by(customer_id=customer.id, payment_status='Due').update({'payment_status': 'Paid'})
-    Invoice.query.filter_by(customer_id=customer.id, status='Unpaid').update({'status': 'Paid'})
+    DailyLog.query.filter(DailyLog.id.in_(due_log_ids)).update({'payment_status': 'Paid'})
+    report_cache.touch(db.session.connection(), [customer.business_id]) # Bulk update; bypasses the flush hook
+    Invoice.query.filter(Invoice.id.in_(unpaid_invoice_ids)).update({'status': 'Paid'})
 
     db.session.commit()
     flash(f'Dues of ₹{amount_cleared:.2f} for {customer.name} have been cleared.', 'success')
     return redirect(url_for('customers.index'))
 
 
+def _report_date(default):
+    try: return datetime.strptime(request.args.get('report_date', ''), '%Y-%m-%d').date()
+    except ValueError: return default
+
 @bp.route('/reports')
 @login_required
 @manager_required
@@ -300,8 +334,7 @@ def reports():
 
     today = date.today()
     business_id = current_user.business_id
-    business = Business.query.get(business_id) # Get business object for wage calculation rules
-    IST = ZoneInfo("Asia/Kolkata")
+    business = get_business() # Get business object for wage calculation rules
 
     try:
         report_year = int(request.args.get('year', today.year))
@@ -309,190 +342,201 @@ def reports():
     except (ValueError, TypeError):
         report_year, report_month = today.year, today.month
 
-    num_days_in_month = calendar.monthrange(report_year, report_month)[1]
-    start_of_month = datetime(report_year, report_month, 1)
-    end_of_month = datetime(report_year, report_month, num_days_in_month, 23, 59, 59)
-    start_utc_month = start_of_month.replace(tzinfo=IST).astimezone(ZoneInfo("UTC"))
-    end_utc_month = end_of_month.replace(tzinfo=IST).astimezone(ZoneInfo("UTC"))
-
-    monthly_jar_sales = db.session.query(func.sum(DailyLog.amount_collected)).join(Customer).filter(
-        Customer.business_id == business_id, DailyLog.timestamp.between(start_utc_month, end_utc_month)
-    ).scalar() or 0.0
-
-    monthly_product_sales_total = db.session.query(func.sum(ProductSale.total_amount)).filter(
-        ProductSale.business_id == business_id, ProductSale.timestamp.between(start_utc_month, end_utc_month)
-    ).scalar() or 0.0
-
-    monthly_event_sales = db.session.query(func.sum(EventBooking.final_amount)).join(Customer).filter(
-        Customer.business_id == business_id,
-        EventBooking.status == 'Completed',
-        EventBooking.collection_timestamp.between(start_utc_month, end_utc_month)
-    ).scalar() or 0.0
-
-    total_monthly_sales = monthly_jar_sales + monthly_product_sales_total + monthly_event_sales
-
-    monthly_expenses_total = db.session.query(func.sum(Expense.amount)).join(User).filter(
-        User.business_id == business_id, Expense.timestamp.between(start_utc_month, end_utc_month)
-    ).scalar() or 0.0
-
-    customer_summary = db.session.query(
-        Customer.name, func.sum(DailyLog.jars_delivered).label('total_jars'), func.sum(DailyLog.amount_collected).label('total_amount')
-    ).join(DailyLog).filter(
-        Customer.business_id == business_id, DailyLog.timestamp.between(start_utc_month, end_utc_month)
-    ).group_by(Customer.name).order_by(func.sum(DailyLog.amount_collected).desc()).all()
-
-    monthly_product_summary = db.session.query(
-        ProductSale.product_name, func.sum(ProductSale.quantity).label('total_quantity'), func.sum(ProductSale.total_amount).label('total_amount')
-    ).filter(
-        ProductSale.business_id == business_id, ProductSale.timestamp.between(start_utc_month, end_utc_month)
-    ).group_by(ProductSale.product_name).all()
-
-    booking_logs = db.session.query(EventBooking).join(Customer).filter(
-        Customer.business_id == business_id,
-        EventBooking.status == 'Completed',
-        EventBooking.collection_timestamp.between(start_utc_month, end_utc_month)
-    ).order_by(EventBooking.collection_timestamp.desc()).all()
-    total_jars_lost = sum((booking.quantity - booking.jars_returned) for booking in booking_logs if booking.jars_returned is not None)
-
-    staff_members = User.query.filter_by(role='staff', business_id=business_id).all()
-    staff_monthly_summary = []
-    for staff in staff_members:
-        # Handle Daily Wage Staff
-        if staff.wage_type == 'daily':
-            daily_jars_subquery = db.session.query(
-                cast(DailyLog.timestamp, Date).label('delivery_date'), func.sum(DailyLog.jars_delivered).label('jars_sum')
-            ).filter(
-                DailyLog.user_id == staff.id, DailyLog.timestamp.between(start_utc_month, end_utc_month)
-            ).group_by('delivery_date').subquery()
-
-            full_days = db.session.query(func.count(daily_jars_subquery.c.delivery_date)).filter(daily_jars_subquery.c.jars_sum >= business.full_day_jar_count).scalar()
-            half_days = db.session.query(func.count(daily_jars_subquery.c.delivery_date)).filter(
-                daily_jars_subquery.c.jars_sum >= business.half_day_jar_count, daily_jars_subquery.c.jars_sum < business.full_day_jar_count
-            ).scalar()
-
-            working_days = full_days + half_days
-            # Correct absent days calculation needed if considering non-working days
-            absent_days = num_days_in_month - working_days # Simplified assumption
-
-            total_wages = db.session.query(func.sum(Expense.amount)).filter(
-                Expense.user_id == staff.id, Expense.description.like('Daily Wage%'), Expense.timestamp.between(start_utc_month, end_utc_month)
-            ).scalar() or 0.0
-            wage_info = f'₹{total_wages:.2f} (Daily)'
-
-        # Handle Monthly Salary Staff
-        elif staff.wage_type == 'monthly':
-            full_days = db.session.query(func.count(func.distinct(cast(DailyLog.timestamp, Date)))).filter(
-                 DailyLog.user_id == staff.id, DailyLog.timestamp.between(start_utc_month, end_utc_month)
-            ).scalar() # Count distinct days with any delivery
-            half_days = 0 # Not applicable for monthly salary in this simplified model
-            working_days = full_days
-            absent_days = num_days_in_month - working_days # Simplified assumption
-            total_wages = staff.monthly_salary or 0.0 # Get salary from User model
-            wage_info = f'₹{total_wages:.2f} (Monthly)'
-        else: # Unknown wage type
-             full_days, half_days, absent_days, total_wages = 0, 0, num_days_in_month, 0.0
-             wage_info = 'N/A'
-
-
-        staff_monthly_summary.append({
-            'username': staff.username, 'full_days': full_days, 'half_days': half_days,
-            'absent_days': absent_days, 'total_wages_display': wage_info
-        })
+    report_date = _report_date(today)
+    # Cached per data version of the business, so any sale, expense or booking written since is always reflected
+    cache_key = (report_year, report_month, report_date.isoformat())
+    version = report_cache.data_version('business', business_id)
+    payload = report_cache.peek('business', business_id, cache_key, version)
+    if payload is None and request.args.get('job'):
+        payload = reports_module.job_result(ReportJob.query.filter_by(id=request.args['job'], business_id=business_id).first())
+    if payload is None and reports_module.run_in_background(business, request.args.get('background')):
+        # Large tenants: computed by the scheduler while the page polls manager.report_job_status
+        job = reports_module.start_job(business, report_year, report_month, report_date)
+        payload = reports_module.job_result(job)
+        if payload is None:
+            return render_template('manager/report_pending.html', title="Reports", job=job,
+                                   report_month=report_month, report_year=report_year, report_date=report_date)
+    if payload is None:
+        payload = manager_report(business, report_year, report_month, report_date)
+        report_cache.store('business', business_id, version, cache_key, payload)
 
-    report_date_str = request.args.get('report_date', today.isoformat())
-    try: report_date = datetime.strptime(report_date_str, '%Y-%m-%d').date()
-    except ValueError: report_date = today
-
-    start_utc_day = datetime.combine(report_date, datetime.min.time(), tzinfo=IST).astimezone(ZoneInfo("UTC"))
-    end_utc_day = datetime.combine(report_date, datetime.max.time(), tzinfo=IST).astimezone(ZoneInfo("UTC"))
-
-    # Fetch daily logs without specific order here
-    daily_sales = db.session.query(DailyLog).join(Customer).filter(
-        Customer.business_id == business_id, DailyLog.timestamp.between(start_utc_day, end_utc_day)).all()
-    daily_expenses = db.session.query(Expense).join(User).filter(
-        User.business_id == business_id, Expense.timestamp.between(start_utc_day, end_utc_day)).all()
-    daily_product_sales = db.session.query(ProductSale).filter(
-        ProductSale.business_id == business_id, ProductSale.timestamp.between(start_utc_day, end_utc_day)).all()
-    daily_event_sales = db.session.query(EventBooking).join(Customer).filter(
-        Customer.business_id == business_id,
-        EventBooking.status == 'Completed',
-        EventBooking.collection_timestamp.between(start_utc_day, end_utc_day)
-    ).all()
-
-    # --- Combine and Sort Daily Transactions ---
-    combined_daily_log = []
-    for sale in daily_sales:
-        combined_daily_log.append({'timestamp': sale.timestamp, 'type': 'Jar Sale', 'data': sale})
-    for event in daily_event_sales:
-        # Use collection_timestamp for sorting completed events
-        combined_daily_log.append({'timestamp': event.collection_timestamp, 'type': 'Event Settlement', 'data': event})
-    for sale in daily_product_sales:
-        combined_daily_log.append({'timestamp': sale.timestamp, 'type': 'Product Sale', 'data': sale})
-    for expense in daily_expenses:
-        combined_daily_log.append({'timestamp': expense.timestamp, 'type': 'Expense', 'data': expense})
-
-    # Sort the combined list by timestamp, descending (latest first)
-    combined_daily_log.sort(key=lambda x: x['timestamp'], reverse=True)
-    # --- End Combine and Sort ---
-
-    # Calculate totals (can still do this after fetching)
-    total_daily_sales = sum(s.amount_collected for s in daily_sales) + sum(p.total_amount for p in daily_product_sales) + sum(e.final_amount for e in daily_event_sales if e.final_amount)
-    total_daily_expenses = sum(e.amount for e in daily_expenses)
-
-    attendance = []
-    for staff in staff_members:
-        # Only calculate attendance status for daily wage staff based on jars
-        if staff.wage_type == 'daily':
-            jars_sold = db.session.query(func.sum(DailyLog.jars_delivered)).filter(
-                DailyLog.user_id == staff.id, DailyLog.timestamp.between(start_utc_day, end_utc_day)).scalar() or 0
-            status = "Absent"
-            if jars_sold >= business.full_day_jar_count:
-                status = "Full Day"
-            elif jars_sold >= business.half_day_jar_count:
-                status = "Half Day"
-            jars_display = str(jars_sold)
-        elif staff.wage_type == 'monthly':
-            # For monthly staff, just check if they made any deliveries today
-            delivered_today = db.session.query(DailyLog.id).filter(
-                DailyLog.user_id == staff.id, DailyLog.timestamp.between(start_utc_day, end_utc_day)
-            ).first() is not None
-            status = "Present" if delivered_today else "Absent"
-            jars_display = "-" # Jars not directly tied to attendance status
-        else:
-             status = "N/A"
-             jars_display = "-"
+    return render_template('manager/reports.html', title="Reports",
+        report_month=report_month, report_year=report_year,
+        can_close=is_finished(report_year, report_month),
+        report_date=report_date,
+        current_year=today.year,
+        **payload)
 
-        attendance.append({'username': staff.username, 'jars_sold': jars_display, 'status': status})
 
-    cash_handover_logs = db.session.query(CashHandover).join(
-        User, CashHandover.user_id == User.id
-    ).filter(
-        User.business_id == business_id,
-        # Show handovers received by ANY manager of the business, not just current_user
-        CashHandover.manager.has(role='manager', business_id=business_id),
-        CashHandover.timestamp.between(start_utc_month, end_utc_month)
-    ).order_by(CashHandover.timestamp.desc()).all()
+@bp.route('/reports/jobs/<job_id>')
+@login_required
+@manager_required
+@subscription_required
+def report_job_status(job_id):
+    """Polled by the pending reports page; reads a few columns of the job, never its payload."""
+    job = db.session.query(ReportJob.status, ReportJob.progress, ReportJob.error, ReportJob.year,
+                           ReportJob.month, ReportJob.report_date).filter(
+        ReportJob.id == job_id, ReportJob.business_id == current_user.business_id
+    ).first()
+    if job is None:
+        return jsonify({'error': 'Report job not found.'}), 404
+    result = {'status': job.status, 'progress': job.progress, 'error': job.error}
+    if job.status == 'done':
+        result['url'] = url_for('manager.reports', year=job.year, month=job.month,
+                                report_date=job.report_date.isoformat(), job=job_id)
+    return jsonify(result)
+
+
+@bp.route('/reports/daily')
+@login_required
+@manager_required
+@subscription_required
+def reports_daily():
+    """Next page of the daily transactions log, for incremental loading of the day view."""
+    if not current_user.business_id:
+        return jsonify({'error': 'Not assigned to a business.'}), 400
 
+    report_date = _report_date(date.today())
+    start_utc_day, end_utc_day = ist_day_bounds(report_date)
+    rows, next_cursor = daily_ledger_page(current_user.business_id, start_utc_day, end_utc_day,
+                                          before=request.args.get('before'), per_page=DAILY_LEDGER_PAGE_SIZE)
+    return jsonify({
+        'report_date': report_date.isoformat(),
+        'html': render_template('manager/_daily_ledger_rows.html', daily_ledger=rows),
+        'entries': [dict(row._mapping, ts=row.ts.isoformat()) for row in rows],
+        'next_cursor': next_cursor,
+    })
 
-    monthly_leads = db.session.query(ProductSale).filter(
-        ProductSale.business_id == business_id,
-        ProductSale.timestamp.between(start_utc_month, end_utc_month)
-    ).order_by(ProductSale.timestamp.desc()).all()
 
-    return render_template('manager/reports.html', title="Reports",
-        report_month=report_month, report_year=report_year,
-        total_monthly_sales=total_monthly_sales, total_monthly_expenses=monthly_expenses_total,
-        customer_summary=customer_summary, monthly_product_summary=monthly_product_summary,
-        staff_monthly_summary=staff_monthly_summary,
-        booking_logs=booking_logs,
-        total_jars_lost=total_jars_lost,
-        report_date=report_date,
-        combined_daily_log=combined_daily_log, # Pass the combined sorted list
-        attendance=attendance,
-        total_daily_sales=total_daily_sales, total_daily_expenses=total_daily_expenses,
-        cash_handover_logs=cash_handover_logs,
-        monthly_leads=monthly_leads,
-        current_year=today.year)
+@bp.route('/reports/<int:year>/<int:month>/close', methods=['POST'])
+@login_required
+@manager_required
+@subscription_required
+def close_month(year, month):
+    """Snapshots a finished month now instead of waiting for the nightly close."""
+    if not current_user.business_id or not 1 <= month <= 12:
+        abort(404)
+    if not is_finished(year, month):
+        flash('Only finished months can be closed.', 'warning')
+    else:
+        close_period(get_business(), year, month)
+        db.session.commit()
+        flash(f'{calendar.month_name[month]} {year} closed. Its report is now frozen.', 'success')
+    return redirect(url_for('manager.reports', year=year, month=month))
+
+
+@bp.route('/reports/<int:year>/<int:month>/reopen', methods=['POST'])
+@login_required
+@manager_required
+@subscription_required
+def reopen_month(year, month):
+    """Reopens a closed month; its report is live until it is closed again (at the latest tonight)."""
+    period = get_period(current_user.business_id, year, month)
+    if period is None or period.status != 'closed':
+        abort(404)
+    reopen_period(period, current_user.id)
+    db.session.commit()
+    flash(f'{calendar.month_name[month]} {year} reopened. It will be recomputed and closed again tonight.', 'info')
+    return redirect(url_for('manager.reports', year=year, month=month))
+
+
+@bp.route('/reports/<int:year>/<int:month>/export.csv')
+@login_required
+@manager_required
+@subscription_required
+def export_month_csv(year, month):
+    """The month's summary as CSV: totals, then the customer, product and staff tables."""
+    if not current_user.business_id or not 1 <= month <= 12:
+        abort(404)
+    data, _ = monthly_report(get_business(), year, month)
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Total sales', f"{data['total_monthly_sales']:.2f}"])
+    writer.writerow(['Total expenses', f"{data['total_monthly_expenses']:.2f}"])
+    for category, amount in (data['expense_by_category'] or {}).items():
+        writer.writerow([f'  {category.capitalize()}', f'{amount:.2f}'])
+    writer.writerow(['Jars lost at events', data['total_jars_lost']])
+    writer.writerow([])
+    writer.writerow(['Customer', 'Jars', 'Amount'])
+    writer.writerows([row.name, row.total_jars, f'{row.total_amount:.2f}'] for row in data['customer_summary'])
+    writer.writerow([])
+    writer.writerow(['Product', 'Quantity', 'Amount'])
+    writer.writerows([row.product_name, row.total_quantity, f'{row.total_amount:.2f}'] for row in data['monthly_product_summary'])
+    writer.writerow([])
+    writer.writerow(['Staff', 'Wage type', 'Full days', 'Half days', 'Absent days', 'Wages'])
+    writer.writerows([row['username'], row['wage_type'], row['full_days'], row['half_days'], row['absent_days'],
+                      f"{row['total_wages']:.2f}"] for row in data['staff_monthly_summary'])
+
+    return Response(output.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment;filename=report-{year}-{month:02d}.csv'})
+
+
+@bp.route('/payroll')
+@login_required
+@manager_required
+@subscription_required
+def payroll_page():
+    """A month's attendance and wages per staff member: the latest run, or a live preview if there is none."""
+    if not current_user.business_id:
+        flash("You are not assigned to a business to run payroll.", "warning")
+        return redirect(url_for('manager.dashboard'))
+
+    today = date.today()
+    try:
+        year = int(request.args.get('year', today.year))
+        month = int(request.args.get('month', today.month))
+    except (ValueError, TypeError):
+        year, month = today.year, today.month
+    if not 1 <= month <= 12:
+        year, month = today.year, today.month
+
+    business = get_business()
+    runs = PayrollRun.query.filter_by(business_id=business.id, year=year, month=month).order_by(
+        PayrollRun.created_at.desc(), PayrollRun.id.desc()).all()
+    run = runs[0] if runs else None
+    lines = payroll.run_lines(run) if run else payroll.compute(business, year, month, *month_bounds(year, month))
+    return render_template('manager/payroll.html', title="Payroll", run=run, runs=runs, lines=lines,
+                           total_wages=sum(line['total_wages'] for line in lines),
+                           days_in_month=calendar.monthrange(year, month)[1],
+                           report_year=year, report_month=month, current_year=today.year)
+
+
+@bp.route('/payroll/<int:year>/<int:month>/run', methods=['POST'])
+@login_required
+@manager_required
+@subscription_required
+def run_payroll(year, month):
+    """Computes the month's payroll and saves it as a new run; earlier runs are kept."""
+    if not current_user.business_id or not 1 <= month <= 12:
+        abort(404)
+    run = payroll.run_payroll(get_business(), year, month, *month_bounds(year, month), created_by_id=current_user.id)
+    db.session.commit()
+    flash(f'Payroll for {calendar.month_name[month]} {year} saved: ₹{run.total_wages:.2f} for {len(run.lines)} staff.', 'success')
+    return redirect(url_for('manager.payroll_page', year=year, month=month))
+
+
+@bp.route('/payroll/runs/<int:run_id>/export.csv')
+@login_required
+@manager_required
+@subscription_required
+def export_payroll_csv(run_id):
+    """One payroll run as CSV, one row per staff member."""
+    run = PayrollRun.query.filter_by(id=run_id, business_id=current_user.business_id).first_or_404()
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Payroll', f"{calendar.month_name[run.month]} {run.year}"])
+    writer.writerow(['Run at', run.created_at.strftime('%Y-%m-%d %H:%M'), 'Days counted', run.days_counted])
+    writer.writerow([])
+    writer.writerow(['Staff', 'Wage type', 'Rate', 'Full days', 'Half days', 'Present days', 'Absent days',
+                     'Jars delivered', 'Wages'])
+    writer.writerows([line.username, line.wage_type, f'{line.rate:.2f}', line.full_days, line.half_days,
+                      line.present_days, line.absent_days, line.jars_delivered, f'{line.wages:.2f}'] for line in run.lines)
+    writer.writerow(['Total', '', '', '', '', '', '', '', f'{run.total_wages:.2f}'])
+
+    return Response(output.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment;filename=payroll-{run.year}-{run.month:02d}-{run.id}.csv'})
 
 
 @bp.route('/settings', methods=['GET', 'POST'])
@@ -500,7 +544,9 @@ def reports():
 @manager_required
 @subscription_required
 def settings():
-    business = Business.query.filter_by(id=current_user.business_id).first_or_404()
+    business = get_business()
+    if business is None:
+        abort(404)
     form = BusinessSettingsForm(obj=business)
     if form.validate_on_submit():
         business.new_jar_price = form.new_jar_price.data
@@ -524,10 +570,13 @@ def settings():
 @manager_required
 @subscription_required
 def stock_management():
-    business = Business.query.filter_by(id=current_user.business_id).first_or_404()
+    # Lock the row when stock is about to change
+    business = get_business()
+    if business is None:
+        abort(404)
     form = StockForm()
 
-    outstanding_bookings = db.session.query(EventBooking).join(Customer).filter(
+    outstanding_bookings = db.session.query(EventBooking).join(Customer).options(*load('booking_outstanding')).filter(
         Customer.business_id == current_user.business_id,
         EventBooking.status == 'Delivered'
     ).order_by(EventBooking.event_date).all()
@@ -541,11 +590,7 @@ def stock_management():
         #     flash("Cannot add negative stock values.", "danger")
         #     return redirect(url_for('manager.stock_management'))
 
-        if business.jar_stock is None: business.jar_stock = 0
-        if business.dispenser_stock is None: business.dispenser_stock = 0
-
-        business.jar_stock += jars_added
-        business.dispenser_stock += dispensers_added
+        adjust(Business, business.id, jar_stock=jars_added, dispenser_stock=dispensers_added)
         db.session.commit()
         flash(f'Stock updated. Added {jars_added} jars and {dispensers_added} dispensers.', 'success')
         return redirect(url_for('manager.stock_management'))
@@ -555,21 +600,98 @@ def stock_management():
         title="Stock Management",
         form=form,
         business=business,
-        outstanding_bookings=outstanding_bookings
+        outstanding_bookings=outstanding_bookings,
+        forecast=business_forecast(business.id),
+        available_today=reservations.available(business, date.today())
     )
 
 
+@bp.route('/stock/calendar')
+@login_required
+@manager_required
+@subscription_required
+def booking_calendar():
+    """Jars and dispensers held by confirmed events for the next 90 days."""
+    business = get_business()
+    if business is None:
+        abort(404)
+    days = reservations.calendar(business, days=90)
+    # Pad to whole weeks, Monday first
+    weeks, week = [], [None] * days[0][0].weekday()
+    for day in days:
+        week.append(day)
+        if len(week) == 7:
+            weeks.append(week)
+            week = []
+    if week:
+        weeks.append(week + [None] * (7 - len(week)))
+    return render_template('manager/booking_calendar.html', title='Booking Calendar', business=business, weeks=weeks)
+
+
+@bp.route('/api/availability')
+@login_required
+@manager_required
+@subscription_required
+def availability():
+    """Can the business take N jars / M dispensers on a date? ?date=YYYY-MM-DD&jars=N&dispensers=M"""
+    business = get_business()
+    if business is None:
+        return jsonify({'error': 'Not assigned to a business.'}), 400
+    try:
+        day = date.fromisoformat(request.args.get('date', ''))
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD.'}), 400
+    jars = request.args.get('jars', 0, type=int)
+    dispensers = request.args.get('dispensers', 0, type=int)
+    jars_free, dispensers_free = reservations.available(business, day)
+    return jsonify({
+        'date': day.isoformat(),
+        'jars_available': max(jars_free, 0),
+        'dispensers_available': max(dispensers_free, 0),
+        'available': jars <= jars_free and dispensers <= dispensers_free
+    })
+
+
 # --- STAFF MANAGEMENT ROUTES ---
 @bp.route('/staff')
 @login_required
 @manager_required
 @subscription_required
 def staff_list():
-    staff_members = User.query.filter_by(
-        role='staff', business_id=current_user.business_id
+    staff_members = db.session.query(*STAFF_LIST).filter(
+        User.role == 'staff', User.business_id == current_user.business_id
     ).order_by(User.username).all()
     return render_template('manager/list_staff.html', title="Manage Staff", staff_members=staff_members)
 
+@bp.route('/statement/<account>/<int:account_id>')
+@login_required
+@manager_required
+@subscription_required
+def account_statement(account, account_id):
+    """Cash statement of a staff member or dues statement of a customer, read from the money journal."""
+    if account not in ACCOUNTS:
+        abort(404)
+    model, _ = ACCOUNTS[account]
+    owner = model.query.get_or_404(account_id)
+    if owner.business_id != current_user.business_id:
+        abort(403)
+
+    today = date.today()
+    try:
+        start = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+    except ValueError:
+        start = today.replace(day=1)
+    try:
+        end = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        end = today
+
+    opening, entries = statement(account, account_id, datetime.combine(start, datetime.min.time()),
+                                 datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    closing = entries[-1].balance if entries else opening
+    return render_template('manager/statement.html', title="Statement", account=account, owner=owner,
+                           start=start, end=end, opening=opening, closing=closing, entries=entries)
+
 @bp.route('/staff/add', methods=['GET', 'POST'])
 @login_required
 @manager_required
@@ -665,28 +787,30 @@ def confirm_booking(booking_id):
 
     form = EventConfirmationForm(obj=booking)
     if form.validate_on_submit():
-        business = Business.query.get(current_user.business_id)
+        business = get_business()
 
         # Use the quantity from the form, not the original booking
         jars_to_book = form.quantity.data
 
-        if business.jar_stock < jars_to_book:
-            flash(f'Not enough jar stock to confirm. Only {business.jar_stock} jars available.', 'danger')
+        # Hold the items on the event date; other bookings that day and uncollected earlier events count against stock
+        if booking.status != 'Pending':
+            flash('This booking has already been confirmed.', 'info')
             return redirect(url_for('manager.dashboard'))
-        if business.dispenser_stock < (booking.dispensers_booked or 0):
-            flash(f'Not enough dispenser stock to confirm. Only {business.dispenser_stock} dispensers available.', 'danger')
+        if not reservations.reserve(business, booking.event_date, jars_to_book, booking.dispensers_booked or 0):
+            jars_free, dispensers_free = reservations.available(business, booking.event_date)
+            if jars_free < jars_to_book:
+                flash(f'Not enough jars on {booking.event_date.strftime("%d-%b-%Y")}. Only {max(jars_free, 0)} jars available.', 'danger')
+            else:
+                flash(f'Not enough dispensers on {booking.event_date.strftime("%d-%b-%Y")}. Only {max(dispensers_free, 0)} dispensers available.', 'danger')
             return redirect(url_for('manager.dashboard'))
 
-        business.jar_stock -= jars_to_book
-        business.dispenser_stock -= (booking.dispensers_booked or 0)
-
         booking.quantity = jars_to_book  # Update the booking's quantity
         booking.amount = form.amount.data
         booking.paid_to_manager = form.paid_to_manager.data
         booking.status = 'Confirmed'
         booking.confirmed_by_id = current_user.id
         db.session.commit()
-        flash('Event booking confirmed and stock updated.')
+        flash('Event booking confirmed and stock reserved.')
 
         # --- EMAIL NOTIFICATION TO STAFF & CUSTOMER ---
         staff_users = User.query.filter_by(business_id=current_user.business_id, role='staff').all()
@@ -706,7 +830,7 @@ def confirm_booking(booking_id):
 @manager_required # Ensure only managers access this
 def account():
     user = User.query.get(current_user.id)
-    business = Business.query.get(current_user.business_id)
+    business = get_business()
 
     profile_form = ManagerProfileForm(original_username=user.username, original_email=user.email, obj=user)
     # Pre-fill business details
@@ -859,6 +983,24 @@ def add_to_cart(product_id):
     return redirect(url_for('manager.browse_products'))
 
 
+@bp.route('/procurement/draft/<int:order_id>', methods=['POST'])
+@login_required
+@manager_required
+@subscription_required
+def use_draft_order(order_id):
+    """Moves a nightly draft purchase order (app.reorder) into the cart so it goes through the usual checkout."""
+    order = PurchaseOrder.query.options(*load('purchase_order_list')).filter_by(
+        id=order_id, business_id=current_user.business_id, status=DRAFT
+    ).first_or_404()
+    session['procurement_cart'] = {
+        str(item.product_id): {'quantity': item.quantity, 'supplier_id': order.supplier_id} for item in order.items
+    }
+    ReorderSuggestion.query.filter_by(purchase_order_id=order.id).update({'purchase_order_id': None})
+    db.session.delete(order)
+    db.session.commit()
+    flash(f'Suggested order from {order.supplier.shop_name} added to your cart. Review the quantities and check out.', 'info')
+    return redirect(url_for('manager.view_cart'))
+
 @bp.route('/procurement/cart')
 @login_required
 @manager_required
@@ -1137,7 +1279,13 @@ def procurement_payment_success_confirm(): # Renamed function
 @subscription_required
 def view_orders():
     """Lists all purchase orders placed by the manager's business."""
-    orders = PurchaseOrder.query.filter_by(business_id=current_user.business_id).order_by(PurchaseOrder.order_date.desc()).all()
+    orders = keyset_paginate(
+        PurchaseOrder.query.options(*load('purchase_order_list')).filter(
+            PurchaseOrder.business_id == current_user.business_id, PurchaseOrder.status != DRAFT
+        ),
+        [SortKey(PurchaseOrder.order_date, descending=True), SortKey(PurchaseOrder.id, descending=True)],
+        cursor=request.args.get('cursor'), per_page=10
+    )
     return render_template('manager/view_orders.html', title='My Orders', orders=orders)
 
 @bp.route('/procurement/invoice/<int:order_id>')
@@ -1145,7 +1293,7 @@ def view_orders():
 @manager_required
 @subscription_required # Added decorator
 def view_procurement_invoice(order_id):
-    order = PurchaseOrder.query.get_or_404(order_id)
+    order = PurchaseOrder.query.options(*load('purchase_order_document')).get_or_404(order_id)
     if order.business_id != current_user.business_id:
         abort(403)
     # Check if invoice number exists, else maybe redirect or show error?
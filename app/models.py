@@ -6,10 +6,60 @@ from flask_login import UserMixin
 from datetime import datetime, timedelta, date
 from time import time
 from flask import current_app
-from sqlalchemy import CheckConstraint
+from sqlalchemy import CheckConstraint, case, literal
+from sqlalchemy.types import TypeDecorator
 import jwt
 
 
+class Coded(TypeDecorator):
+    """
+    One of a fixed list of strings, stored as its position in the list (SMALLINT).
+    Code and templates keep using the strings: values are converted when bound and
+    loaded, so filters like `status == 'Pending'` compare small integers. The
+    positions are the stored data: only ever append to a list.
+    """
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def __init__(self, values):
+        super().__init__()
+        self.values = tuple(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value):
+        try:
+            return self._codes[value]
+        except KeyError:
+            raise ValueError(f"{value!r} is not one of {self.values}")
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.code(value)
+
+    def process_literal_param(self, value, dialect):
+        return 'NULL' if value is None else str(self.code(value))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.values[value]
+
+
+def coded_text(column):
+    """A Coded column's values as strings in SQL, e.g. for a UNION of columns with different codes."""
+    return case(*[(column == value, literal(value, db.String)) for value in column.type.values])
+
+
+# Stored positions of the Coded columns' values; append only
+ROLES = ('admin', 'manager', 'staff', 'supplier') # Alphabetical, so ORDER BY role is unchanged
+CUSTOMER_TYPES = ('customer', 'dealer')
+PAYMENT_STATUSES = ('Paid', 'Due')
+PAYMENT_METHODS = ('Cash', 'Online', 'Due')
+LOG_ORIGINS = ('staff_log', 'customer_request')
+JAR_REQUEST_STATUSES = ('Pending', 'Delivered')
+BOOKING_STATUSES = ('Pending', 'Confirmed', 'Delivered', 'Completed')
+ORDER_STATUSES = ('Draft', 'Pending', 'COD - Placed', 'Paid - Online', 'Payment Failed', 'Confirmed', 'Shipped',
+                  'Delivered', 'Cancelled')
+INVOICE_STATUSES = ('Unpaid', 'Paid', 'Overdue')
+
+
 class SubscriptionPlan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
@@ -39,6 +89,8 @@ class Business(db.Model):
     low_stock_threshold = db.Column(db.Integer, default=20)
     low_stock_threshold_dispenser = db.Column(db.Integer, default=5)
     upi_id = db.Column(db.String(100), nullable=True)
+    # Bumped by every write to the business's report data; part of the report cache key (app/report_cache.py)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 
     employees = db.relationship('User', backref='business', lazy='dynamic', cascade="all, delete-orphan")
@@ -58,7 +110,7 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(64), index=True, unique=True)
     email = db.Column(db.String(120), index=True, unique=True)
     password_hash = db.Column(db.String(256))
-    role = db.Column(db.String(10), index=True, default='staff') # Roles: staff, manager, admin, supplier
+    role = db.Column(Coded(ROLES), default='staff') # Roles: staff, manager, admin, supplier
     # Wage Information
     wage_type = db.Column(db.String(10), default='daily', nullable=False) # 'daily' or 'monthly'
     daily_wage = db.Column(db.Float, nullable=True) # Used if wage_type is 'daily'
@@ -76,9 +128,12 @@ class User(UserMixin, db.Model):
     product_sales = db.relationship('ProductSale', backref='staff', lazy='dynamic', cascade="all, delete-orphan")
     supplier_profile = db.relationship('SupplierProfile', back_populates='user', uselist=False, cascade="all, delete-orphan")
     subscriptions = db.relationship('PushSubscription', backref='user', lazy='dynamic', cascade="all, delete-orphan")
+    login_identities = db.relationship('LoginIdentity', back_populates='user', cascade="all, delete-orphan")
 
     __table_args__ = (
         CheckConstraint(wage_type.in_(['daily', 'monthly']), name='ck_user_wage_type'),
+        # Staff lists of a business (dashboards, reports, payroll)
+        db.Index('ix_user_business_staff', 'business_id', 'username', postgresql_where=role == 'staff', sqlite_where=role == 'staff'),
     )
 
     def get_id(self): return f'user-{self.id}'
@@ -106,6 +161,7 @@ class SupplierProfile(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     shop_name = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(250), nullable=True)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0') # See Business.data_version
 
     user = db.relationship('User', back_populates='supplier_profile')
     products = db.relationship('SupplierProduct', backref='supplier', lazy='dynamic', cascade="all, delete-orphan")
@@ -121,6 +177,11 @@ class SupplierProduct(db.Model):
     category = db.Column(db.String(50), nullable=True) # e.g., Jars, Dispensers, Chemicals, etc.
     supplier_id = db.Column(db.Integer, db.ForeignKey('supplier_profile.id'), nullable=False)
 
+    # Cheapest product in a category (app.reorder)
+    __table_args__ = (
+        db.Index('ix_supplier_product_category_price', 'category', 'price'),
+    )
+
 class PurchaseOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
@@ -129,9 +190,18 @@ class PurchaseOrder(db.Model):
     delivery_date = db.Column(db.Date, nullable=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=True)
     total_amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='Pending')
+    status = db.Column(Coded(ORDER_STATUSES), default='Pending')
     completion_date = db.Column(db.DateTime, nullable=True)
-    items = db.relationship('PurchaseOrderItem', backref='order', lazy='dynamic', cascade="all, delete-orphan")
+    items = db.relationship('PurchaseOrderItem', backref='order', cascade="all, delete-orphan")
+
+    # Keyset pagination of the manager's and the supplier's order lists
+    __table_args__ = (
+        db.Index('ix_purchase_order_business_id_order_date', 'business_id', 'order_date', 'id'),
+        db.Index('ix_purchase_order_supplier_id_order_date', 'supplier_id', 'order_date', 'id'),
+        # Reorder drafts (app.reorder)
+        db.Index('ix_purchase_order_draft', 'business_id', 'supplier_id',
+                 postgresql_where=status == 'Draft', sqlite_where=status == 'Draft'),
+    )
 
 class PurchaseOrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -164,17 +234,23 @@ class Customer(UserMixin, db.Model):
     price_per_jar = db.Column(db.Float, nullable=False, default=20.0)
     due_amount = db.Column(db.Float, default=0.0)
     business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
-    customer_type = db.Column(db.String(10), default='customer', nullable=False)
+    customer_type = db.Column(Coded(CUSTOMER_TYPES), default='customer', server_default='0', nullable=False)
     
     logs = db.relationship('DailyLog', backref='customer', lazy='dynamic', cascade="all, delete-orphan")
     requests = db.relationship('JarRequest', backref='customer', lazy='dynamic', cascade="all, delete-orphan")
     bookings = db.relationship('EventBooking', backref='customer', lazy='dynamic', cascade="all, delete-orphan")
     invoices = db.relationship('Invoice', back_populates='customer', lazy='dynamic', cascade="all, delete-orphan")
     subscriptions = db.relationship('PushSubscription', backref='customer', lazy='dynamic', cascade="all, delete-orphan")
+    price_history = db.relationship('CustomerPriceHistory', backref='customer', lazy='dynamic', cascade="all, delete-orphan")
+    forecasts = db.relationship('JarForecast', backref='customer', lazy='dynamic', cascade="all, delete-orphan")
+    login_identities = db.relationship('LoginIdentity', back_populates='customer', cascade="all, delete-orphan")
     
     __table_args__ = (
         db.UniqueConstraint('mobile_number', 'business_id', name='uq_customer_mobile_business'),
-        CheckConstraint(customer_type.in_(['customer', 'dealer']), name='ck_customer_type_values')
+        CheckConstraint(customer_type.in_(['customer', 'dealer']), name='ck_customer_type_values'),
+        db.Index('ix_customer_business_id_name', 'business_id', 'name', 'id'),
+        db.Index('ix_customer_business_dealer', 'business_id', 'name',
+                 postgresql_where=customer_type == 'dealer', sqlite_where=customer_type == 'dealer'),
     )
 
     def get_id(self): return f'customer-{self.id}'
@@ -197,25 +273,37 @@ class DailyLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     jars_delivered = db.Column(db.Integer, nullable=False)
     amount_collected = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
-    payment_status = db.Column(db.String(20), default='Paid') # Paid, Due
-    payment_method = db.Column(db.String(20), default='Cash', nullable=True) # <-- Add: Cash, Online, Due
-    origin = db.Column(db.String(20), default='staff_log', server_default='staff_log') # staff_log, customer_request
+    timestamp = db.Column(db.DateTime, index=True, nullable=False, default=datetime.utcnow)
+    payment_status = db.Column(Coded(PAYMENT_STATUSES), default='Paid') # Paid, Due
+    payment_method = db.Column(Coded(PAYMENT_METHODS), default='Cash', nullable=True) # <-- Add: Cash, Online, Due
+    origin = db.Column(Coded(LOG_ORIGINS), default='staff_log', server_default='0') # staff_log, customer_request
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
     # Add a check constraint for payment_method (optional but good practice)
     __table_args__ = (
         CheckConstraint(payment_method.in_(['Cash', 'Online', 'Due', None]), name='ck_dailylog_payment_method'),
+        db.Index('ix_daily_log_customer_id_timestamp', 'customer_id', 'timestamp'),
+        # Unpaid deliveries, cleared together by clear_dues
+        db.Index('ix_daily_log_due', 'customer_id', postgresql_where=payment_status == 'Due', sqlite_where=payment_status == 'Due'),
     )
 
+# Expense.category values; 'wage' is only set by the daily wage deduction
+EXPENSE_CATEGORIES = ('wage', 'fuel', 'maintenance', 'other')
+
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(200), nullable=False)
-    timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    category = db.Column(db.String(12), nullable=False, default='other', server_default='other')
+    timestamp = db.Column(db.DateTime, index=True, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
+    __table_args__ = (
+        db.Index('ix_expense_user_category_timestamp', 'user_id', 'category', 'timestamp'),
+        CheckConstraint(category.in_(EXPENSE_CATEGORIES), name='ck_expense_category'),
+    )
+
 class CashHandover(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
@@ -232,7 +320,7 @@ class ProductSale(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     customer_name = db.Column(db.String(120))
     customer_mobile = db.Column(db.String(15))
-    timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, index=True, nullable=False, default=datetime.utcnow)
     payment_status = db.Column(db.String(20), default='Paid') # Paid, Due
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     business_id = db.Column(db.Integer, db.ForeignKey('business.id'))
@@ -240,24 +328,36 @@ class ProductSale(db.Model):
 class JarRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     quantity = db.Column(db.Integer, nullable=False)
-    status = db.Column(db.String(20), default='Pending', index=True)
+    status = db.Column(Coded(JAR_REQUEST_STATUSES), default='Pending')
     request_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     delivery_timestamp = db.Column(db.DateTime, nullable=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
     delivered_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_jar_request_customer_id_request_timestamp', 'customer_id', 'request_timestamp'),
+        # The delivery dashboard's open requests
+        db.Index('ix_jar_request_pending', 'request_timestamp', postgresql_where=status == 'Pending', sqlite_where=status == 'Pending'),
+    )
+
 class Invoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
     issue_date = db.Column(db.Date, nullable=False, default=date.today)
     due_date = db.Column(db.Date, nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='Unpaid') # Unpaid, Paid, Overdue
+    status = db.Column(Coded(INVOICE_STATUSES), default='Unpaid') # Unpaid, Paid, Overdue
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
     business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
     
     customer = db.relationship('Customer', back_populates='invoices')
-    items = db.relationship('InvoiceItem', backref='invoice', lazy='dynamic', cascade="all, delete-orphan")
+    items = db.relationship('InvoiceItem', backref='invoice', cascade="all, delete-orphan")
+
+    __table_args__ = (
+        db.Index('ix_invoice_customer_id_issue_date', 'customer_id', 'issue_date'),
+        db.Index('ix_invoice_business_id_issue_date', 'business_id', 'issue_date', 'id'),
+        db.Index('ix_invoice_unpaid', 'customer_id', postgresql_where=status == 'Unpaid', sqlite_where=status == 'Unpaid'),
+    )
 
 class InvoiceItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -274,7 +374,7 @@ class EventBooking(db.Model):
     event_date = db.Column(db.Date, nullable=False, index=True)
     amount = db.Column(db.Float, nullable=True)
     paid_to_manager = db.Column(db.Boolean, default=False)
-    status = db.Column(db.String(20), default='Pending', index=True) # Statuses: Pending, Confirmed, Delivered, Completed
+    status = db.Column(Coded(BOOKING_STATUSES), default='Pending') # Statuses: Pending, Confirmed, Delivered, Completed
     request_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     delivery_timestamp = db.Column(db.DateTime, nullable=True)
     collection_timestamp = db.Column(db.DateTime, nullable=True) 
@@ -290,20 +390,315 @@ class EventBooking(db.Model):
     delivered_by = db.relationship("User", foreign_keys=[delivered_by_id])
     collected_by = db.relationship("User", foreign_keys=[collected_by_id])
 
+    __table_args__ = (
+        db.Index('ix_event_booking_customer_id_request_timestamp', 'customer_id', 'request_timestamp'),
+        # Open bookings are few and read by every dashboard; completed ones by collection date in reports
+        db.Index('ix_event_booking_open', 'event_date', postgresql_where=status.in_(['Pending', 'Confirmed', 'Delivered']),
+                 sqlite_where=status.in_(['Pending', 'Confirmed', 'Delivered'])),
+        db.Index('ix_event_booking_completed', 'collection_timestamp',
+                 postgresql_where=status == 'Completed', sqlite_where=status == 'Completed'),
+    )
+
 class PushSubscription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     subscription_json = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=True)
 
+class LoginIdentity(db.Model):
+    """
+    Normalized login identifiers (username, email, mobile) of every User and Customer.
+    Kept in sync by app.identity so a login is a single indexed lookup.
+    Usernames and emails are unique across both tables; mobiles are not, since
+    customers of different businesses may share a number.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False) # username, email, mobile
+    identifier = db.Column(db.String(120), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True, index=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='CASCADE'), nullable=True, index=True)
+
+    user = db.relationship('User', back_populates='login_identities')
+    customer = db.relationship('Customer', back_populates='login_identities')
+
+    __table_args__ = (
+        db.Index('uq_login_identity_kind_identifier', 'kind', 'identifier', unique=True,
+                 postgresql_where=db.text("kind != 'mobile'"), sqlite_where=db.text("kind != 'mobile'")),
+        CheckConstraint(kind.in_(['username', 'email', 'mobile']), name='ck_login_identity_kind'),
+        CheckConstraint('(user_id IS NULL) != (customer_id IS NULL)', name='ck_login_identity_owner'),
+    )
+
+    @property
+    def principal(self):
+        return self.user or self.customer
+
+class LedgerEntry(db.Model):
+    """
+    Append-only money journal. Every change to a staff member's cash in hand
+    (account 'cash', User.cash_balance) or a customer's dues (account 'due',
+    Customer.due_amount) is recorded with the running balance after it.
+    Written only through app.ledger.post(); rows are never updated or deleted.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=True, index=True)
+    account = db.Column(db.String(10), nullable=False) # cash, due
+    account_id = db.Column(db.Integer, nullable=False) # User.id for cash, Customer.id for due
+    amount = db.Column(db.Float, nullable=False)
+    balance = db.Column(db.Float, nullable=False)
+    kind = db.Column(db.String(30), nullable=False) # opening, delivery, expense, wage, sale, handover, dues_cleared, ...
+    source_type = db.Column(db.String(30), nullable=True) # e.g. 'daily_log'
+    source_id = db.Column(db.Integer, nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    created_by = db.relationship('User', foreign_keys=[created_by_id])
+
+    __table_args__ = (
+        db.Index('ix_ledger_entry_account_timestamp', 'account', 'account_id', 'timestamp', 'id'),
+        CheckConstraint(account.in_(['cash', 'due']), name='ck_ledger_entry_account'),
+    )
+
+class LedgerSnapshot(db.Model):
+    """Verified balance of an account as of a journal entry; reconciliation only re-adds entries after it."""
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=True, index=True)
+    account = db.Column(db.String(10), nullable=False)
+    account_id = db.Column(db.Integer, nullable=False)
+    entry_id = db.Column(db.Integer, db.ForeignKey('ledger_entry.id'), nullable=False)
+    balance = db.Column(db.Float, nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_ledger_snapshot_account_entry', 'account', 'account_id', 'entry_id'),
+    )
+
+class PriceChange(db.Model):
+    """
+    One bulk re-pricing of a business's customers (app.repricing): which customers it
+    matched and what it changed. The per-customer before/after values are in
+    CustomerPriceHistory. Invoices keep their own unit prices, so they are unaffected.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False, index=True)
+    changed_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    village = db.Column(db.String(100), nullable=True) # Filters; None means any
+    area = db.Column(db.String(100), nullable=True)
+    customer_type = db.Column(db.String(10), nullable=True)
+    price_mode = db.Column(db.String(10), nullable=True) # percent, amount, set; None leaves prices alone
+    price_value = db.Column(db.Float, nullable=True)
+    daily_jars = db.Column(db.Integer, nullable=True) # New daily jars; None leaves them alone
+    customers_affected = db.Column(db.Integer, nullable=False, default=0)
+
+    changed_by = db.relationship('User', foreign_keys=[changed_by_id])
+
+    __table_args__ = (
+        CheckConstraint(price_mode.in_(['percent', 'amount', 'set']), name='ck_price_change_price_mode'),
+    )
+
+class CustomerPriceHistory(db.Model):
+    """A customer's price per jar and daily jars before and after one PriceChange."""
+    id = db.Column(db.Integer, primary_key=True)
+    change_id = db.Column(db.Integer, db.ForeignKey('price_change.id', ondelete='CASCADE'), nullable=False, index=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='CASCADE'), nullable=False)
+    old_price = db.Column(db.Float, nullable=False)
+    new_price = db.Column(db.Float, nullable=False)
+    old_daily_jars = db.Column(db.Integer, nullable=True)
+    new_daily_jars = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_customer_price_history_customer_id_change_id', 'customer_id', 'change_id'),
+    )
+
+class JarForecast(db.Model):
+    """
+    Jars expected on a day, written nightly by app.forecast. Rows with no customer_id
+    are the business-wide forecast; the others are per customer.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='CASCADE'), nullable=True)
+    forecast_date = db.Column(db.Date, nullable=False)
+    jars = db.Column(db.Float, nullable=False)
+    generated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_jar_forecast_business_id_forecast_date', 'business_id', 'forecast_date', 'customer_id'),
+    )
+
+class ReorderSuggestion(db.Model):
+    """
+    Nightly restocking advice for one item (Jars or Dispensers) of a business, written by
+    app.reorder: how fast stock is used, when to reorder and how much, the cheapest
+    product to buy and the draft PurchaseOrder prepared with it, if any.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    category = db.Column(db.String(50), nullable=False) # SupplierProduct.category: Jars, Dispensers
+    stock = db.Column(db.Integer, nullable=False) # Stock when computed
+    burn_rate = db.Column(db.Float, nullable=False) # Items used per day
+    reserved = db.Column(db.Integer, nullable=False, default=0) # Held by upcoming event bookings
+    reorder_point = db.Column(db.Integer, nullable=False)
+    order_quantity = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('supplier_product.id', ondelete='SET NULL'), nullable=True)
+    unit_price = db.Column(db.Float, nullable=True) # After the product's discount
+    purchase_order_id = db.Column(db.Integer, db.ForeignKey('purchase_order.id', ondelete='SET NULL'), nullable=True)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    product = db.relationship('SupplierProduct')
+    purchase_order = db.relationship('PurchaseOrder')
+
+    __table_args__ = (
+        db.UniqueConstraint('business_id', 'category', name='uq_reorder_suggestion_business_category'),
+    )
+
+class EventReservation(db.Model):
+    """
+    Jars and dispensers held by confirmed event bookings on a date, per business.
+    Maintained by app.reservations as bookings are confirmed and collected.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    jars_reserved = db.Column(db.Integer, nullable=False, default=0)
+    dispensers_reserved = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('business_id', 'date', name='uq_event_reservation_business_date'),
+    )
+
+class PeriodClose(db.Model):
+    """
+    A closed month of a business. While closed, manager.reports reads the month's
+    totals and summaries from the Period* snapshot tables (app.periods) instead of
+    the raw rows. Reopening marks it for a recompute of just that month.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='closed') # closed, reopened
+    closed_at = db.Column(db.DateTime, nullable=True)
+    reopened_at = db.Column(db.DateTime, nullable=True)
+    reopened_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+    summary = db.relationship('PeriodSummary', uselist=False, cascade="all, delete-orphan")
+    customers = db.relationship('PeriodCustomerSummary', cascade="all, delete-orphan")
+    products = db.relationship('PeriodProductSummary', cascade="all, delete-orphan")
+    staff = db.relationship('PeriodStaffSummary', cascade="all, delete-orphan")
+    expenses = db.relationship('PeriodExpenseSummary', cascade="all, delete-orphan")
+
+    __table_args__ = (
+        db.UniqueConstraint('business_id', 'year', 'month', name='uq_period_close_business_month'),
+        CheckConstraint(status.in_(['closed', 'reopened']), name='ck_period_close_status'),
+    )
+
+class PeriodSummary(db.Model):
+    """Monthly totals of a closed period."""
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('period_close.id', ondelete='CASCADE'), nullable=False, unique=True)
+    jar_sales = db.Column(db.Float, nullable=False)
+    product_sales = db.Column(db.Float, nullable=False)
+    event_sales = db.Column(db.Float, nullable=False)
+    total_sales = db.Column(db.Float, nullable=False)
+    total_expenses = db.Column(db.Float, nullable=False)
+    jars_lost = db.Column(db.Integer, nullable=False)
+
+class PeriodCustomerSummary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('period_close.id', ondelete='CASCADE'), nullable=False, index=True)
+    customer_name = db.Column(db.String(120), nullable=False)
+    total_jars = db.Column(db.Integer, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+
+class PeriodProductSummary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('period_close.id', ondelete='CASCADE'), nullable=False, index=True)
+    product_name = db.Column(db.String(50), nullable=False)
+    total_quantity = db.Column(db.Integer, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+
+class PeriodStaffSummary(db.Model):
+    """Attendance and wages of one staff member in a closed period."""
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('period_close.id', ondelete='CASCADE'), nullable=False, index=True)
+    username = db.Column(db.String(64), nullable=False)
+    wage_type = db.Column(db.String(10), nullable=True)
+    full_days = db.Column(db.Integer, nullable=False)
+    half_days = db.Column(db.Integer, nullable=False)
+    absent_days = db.Column(db.Integer, nullable=False)
+    total_wages = db.Column(db.Float, nullable=False)
+
+class PeriodExpenseSummary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    period_id = db.Column(db.Integer, db.ForeignKey('period_close.id', ondelete='CASCADE'), nullable=False, index=True)
+    category = db.Column(db.String(12), nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+
+class PayrollRun(db.Model):
+    """A month's attendance and wages for every staff member of a business, as computed by app.payroll."""
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id', ondelete='CASCADE'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    days_counted = db.Column(db.Integer, nullable=False) # Days of the month elapsed when the run was made
+    total_wages = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+
+    lines = db.relationship('PayrollLine', backref='run', cascade="all, delete-orphan", order_by='PayrollLine.id')
+
+    __table_args__ = (
+        db.Index('ix_payroll_run_business_month', 'business_id', 'year', 'month', 'created_at'),
+    )
+
+class PayrollLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('payroll_run.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+    username = db.Column(db.String(64), nullable=False)
+    wage_type = db.Column(db.String(10), nullable=True)
+    rate = db.Column(db.Float, nullable=False) # Daily wage or monthly salary at the time of the run
+    full_days = db.Column(db.Integer, nullable=False)
+    half_days = db.Column(db.Integer, nullable=False)
+    present_days = db.Column(db.Integer, nullable=False) # Days with any delivery
+    absent_days = db.Column(db.Integer, nullable=False)
+    jars_delivered = db.Column(db.Integer, nullable=False)
+    wages = db.Column(db.Float, nullable=False)
+
+class ReportJob(db.Model):
+    """
+    A manager.reports payload computed in the background (app.reports) for tenants
+    too large to compute it within a request. The page polls the job and renders
+    from `payload` once it is done.
+    """
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id', ondelete='CASCADE'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    report_date = db.Column(db.Date, nullable=False)
+    data_version = db.Column(db.Integer, nullable=False) # Business.data_version the payload was computed at
+    status = db.Column(db.String(10), nullable=False, default='queued') # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0) # percent
+    error = db.Column(db.String(255), nullable=True)
+    payload = db.deferred(db.Column(db.LargeBinary, nullable=True)) # pickled; not loaded when polling
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_report_job_business_report', 'business_id', 'year', 'month', 'report_date', 'data_version'),
+        CheckConstraint(status.in_(['queued', 'running', 'done', 'failed']), name='ck_report_job_status'),
+    )
+
 @login.user_loader
 def load_user(user_id_string):
     try:
         user_type, user_id = user_id_string.split('-')
         user_id = int(user_id)
     except (ValueError, TypeError): return None
-    if user_type == 'user': return User.query.get(user_id)
-    elif user_type == 'customer': return Customer.query.get(user_id)
+    from app.principal_cache import load_principal
+    if user_type == 'user': return load_principal(User, user_id)
+    elif user_type == 'customer': return load_principal(Customer, user_id)
     return None
 
 class Supplier(db.Model):
@@ -0,0 +1,159 @@
+# File: app/pagination.py
+
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_, func, select, text
+from app import db
+
+
+class SortKey:
+    """
+    One column of a keyset sort. `expression` is what is ordered and compared in SQL;
+    `value` pulls the same value out of a loaded row (defaults to the attribute of
+    the same name). Columns that can be NULL should be wrapped in COALESCE, with a
+    matching `value`, since NULL never compares.
+    """
+    def __init__(self, expression, descending=False, value=None):
+        self.expression = expression
+        self.descending = descending
+        self.value = value or (lambda item, key=expression.key: getattr(item, key))
+
+
+class KeysetPage:
+    """A page of rows plus opaque cursor tokens for the neighbouring pages."""
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'k': [_to_json(v) for v in values], 'dir': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, key_count):
+    """Returns (values, direction) or (None, 'next') for a missing or tampered token."""
+    if not token:
+        return None, 'next'
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values = [_from_json(v) for v in payload['k']]
+        direction = payload['dir']
+        if len(values) != key_count or direction not in ('next', 'prev'):
+            raise ValueError
+        return values, direction
+    except (ValueError, KeyError, TypeError):
+        return None, 'next'
+
+
+def _after(keys, values, backwards):
+    """WHERE clause for rows strictly after `values` in the sort order (before it if backwards)."""
+    clauses = []
+    for i, key in enumerate(keys):
+        # descending XOR backwards means the next rows have smaller values
+        smaller = key.descending != backwards
+        comparison = key.expression < values[i] if smaller else key.expression > values[i]
+        clauses.append(and_(*[keys[j].expression == values[j] for j in range(i)], comparison))
+    return or_(*clauses)
+
+
+def estimated_count(query):
+    """
+    Row count of a query without counting it: the planner's estimate on PostgreSQL,
+    an exact COUNT elsewhere (SQLite is only used for small development databases).
+    """
+    statement = query.order_by(None).statement if hasattr(query, 'statement') else query
+    bind = db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        try:
+            compiled = statement.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})
+        except Exception:
+            compiled = None # A parameter type that can't be inlined; count exactly instead
+        if compiled is not None:
+            plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+    return db.session.execute(select(func.count()).select_from(statement.subquery())).scalar()
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=10, count=None):
+    """
+    Keyset (seek) pagination of an ORM query: rows after the cursor are found with a
+    WHERE on the sort key instead of OFFSET, so page 500 costs the same as page 1 as
+    long as an index covers the sort key. The last key must be unique (normally the id).
+
+    count: None (no count), 'estimate' (see estimated_count) or 'exact'.
+
+        page = keyset_paginate(Customer.query.filter_by(business_id=1),
+                               [SortKey(Customer.name), SortKey(Customer.id)],
+                               cursor=request.args.get('cursor'))
+    """
+    total = None
+    if count == 'exact':
+        total = query.order_by(None).count()
+    elif count == 'estimate':
+        total = estimated_count(query)
+
+    values, direction = decode_cursor(cursor, len(keys))
+    backwards = values is not None and direction == 'prev'
+    if values is not None:
+        query = query.filter(_after(keys, values, backwards))
+
+    order = []
+    for key in keys:
+        descending = key.descending != backwards
+        order.append(key.expression.desc() if descending else key.expression.asc())
+    rows = query.order_by(None).order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def token(item, to):
+        return encode_cursor([key.value(item) for key in keys], to)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = token(rows[-1], 'next')
+        if values is not None and (has_more or not backwards):
+            prev_cursor = token(rows[0], 'prev')
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, total, total_is_estimate=count == 'estimate')
@@ -0,0 +1,114 @@
+# File: app/partitions.py
+
+from datetime import date, datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from app import db
+
+# On PostgreSQL, daily_log, expense and product_sale are range-partitioned by month
+# on "timestamp" (UTC). Each month is a table named <table>_pYYYYMM; <table>_default
+# takes rows outside every month created so far. The nightly job creates the coming
+# months' partitions ahead of time, so new rows never land in the default partition.
+# Reports filter these tables by plain timestamp ranges, which lets PostgreSQL skip
+# every other month. On SQLite the tables aren't partitioned and this is a no-op.
+
+PARTITIONED_TABLES = ('daily_log', 'expense', 'product_sale')
+
+
+def partition_name(table, year, month):
+    return f'{table}_p{year}{month:02d}'
+
+
+def add_months(year, month, n):
+    index = year * 12 + month - 1 + n
+    return index // 12, index % 12 + 1
+
+
+def is_partitioned(connection, table):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {'table': table}).first() is not None
+
+
+def partitions(connection, table):
+    """Names of the table's partitions."""
+    return set(connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+    ), {'table': table}).scalars())
+
+
+def create_partition(connection, table, year, month):
+    """
+    Creates one month's partition as a plain table and attaches it, which locks the
+    parent less than CREATE TABLE ... PARTITION OF, so deliveries keep being logged.
+    Rows of that month already in the default partition are moved into it first.
+    """
+    name, default = partition_name(table, year, month), f'{table}_default'
+    start, end = date(year, month, 1), date(*add_months(year, month, 1), 1)
+    in_range = f""""timestamp" >= '{start}' AND "timestamp" < '{end}'"""
+    connection.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    if default in partitions(connection, table):
+        connection.execute(text(
+            f'WITH moved AS (DELETE FROM "{default}" WHERE {in_range} RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'))
+    # With a matching CHECK, ATTACH doesn't scan the new table
+    connection.execute(text(f'ALTER TABLE "{name}" ADD CONSTRAINT "{name}_range" CHECK ({in_range})'))
+    connection.execute(text(f"""ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM ('{start}') TO ('{end}')"""))
+    connection.execute(text(f'ALTER TABLE "{name}" DROP CONSTRAINT "{name}_range"'))
+
+
+def ensure_partitions(connection, table, year, month, count):
+    """Creates the missing partitions of `count` months from (year, month). Returns the number created."""
+    existing = partitions(connection, table)
+    created = 0
+    for n in range(count):
+        y, m = add_months(year, month, n)
+        if partition_name(table, y, m) not in existing:
+            create_partition(connection, table, y, m)
+            created += 1
+    return created
+
+
+def create_future_partitions(months_ahead=None, today=None):
+    """
+    Makes sure this month and the next PARTITION_MONTHS_AHEAD months have a partition
+    in every partitioned table. Commits. Returns the number of partitions created.
+    """
+    if months_ahead is None:
+        months_ahead = current_app.config['PARTITION_MONTHS_AHEAD']
+    today = today or datetime.utcnow().date()
+    connection = db.session.connection()
+    created = 0
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(connection, table):
+            created += ensure_partitions(connection, table, today.year, today.month, months_ahead + 1)
+    db.session.commit()
+    return created
+
+
+def create_partitions(app):
+    """Scheduled nightly."""
+    with app.app_context():
+        count = create_future_partitions()
+        print(f"[{datetime.utcnow()}] Table partitions created: {count}")
+
+
+@click.command('create-partitions')
+@click.option('--months', type=int, default=None, help='Months ahead to cover (default: PARTITION_MONTHS_AHEAD).')
+@with_appcontext
+def create_partitions_command(months):
+    """Creates upcoming monthly partitions now instead of waiting for the nightly job."""
+    if db.engine.dialect.name != 'postgresql':
+        print("Tables are only partitioned on PostgreSQL; nothing to do.")
+        return
+    print(f"✅ {create_future_partitions(months)} partition(s) created.")
+
+
+def init_app(app):
+    """Register the CLI command with the Flask app."""
+    app.cli.add_command(create_partitions_command)
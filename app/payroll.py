@@ -0,0 +1,172 @@
+# File: app/payroll.py
+
+import calendar
+from datetime import date
+import numpy as np
+from sqlalchemy import func, select
+from app import db
+from app.models import DailyLog, User, PayrollRun, PayrollLine
+
+# Attendance and wages for every staff member of a business, from one grouped
+# activity query (jars and deliveries per staff member per day) turned into a
+# staff x day matrix. Daily staff earn their daily wage per full day and half of
+# it per half day; monthly staff earn their salary. Runs are persisted as
+# PayrollRun/PayrollLine so a month's payroll can be exported and shown as paid.
+
+
+def wages_display(total_wages, wage_type):
+    if wage_type == 'daily':
+        return f'₹{total_wages:.2f} (Daily)'
+    if wage_type == 'monthly':
+        return f'₹{total_wages:.2f} (Monthly)'
+    return 'N/A'
+
+
+def staff_day_matrix(staff_ids, log_user_ids, log_days, log_jars, n_days, log_deliveries=None):
+    """
+    (jars, deliveries): staff x day arrays of jars delivered and delivery rows per
+    staff member per day index. Logs by anyone not in `staff_ids` (sorted) are ignored.
+    `log_deliveries` is the number of rows behind each entry when the logs are already grouped.
+    """
+    jars = np.zeros((len(staff_ids), n_days))
+    deliveries = np.zeros((len(staff_ids), n_days), dtype=np.int64)
+    if len(staff_ids) and len(log_user_ids):
+        if log_deliveries is None:
+            log_deliveries = np.ones(len(log_user_ids), dtype=np.int64)
+        position = np.clip(np.searchsorted(staff_ids, log_user_ids), 0, len(staff_ids) - 1)
+        mine = staff_ids[position] == log_user_ids
+        np.add.at(jars, (position[mine], log_days[mine]), log_jars[mine])
+        np.add.at(deliveries, (position[mine], log_days[mine]), log_deliveries[mine])
+    return jars, deliveries
+
+
+def classify_days(jars, deliveries, business):
+    """(full, half) boolean arrays of the same shape, by the business's jar thresholds."""
+    worked = deliveries > 0
+    full_min, half_min = business.full_day_jar_count, business.half_day_jar_count
+    if full_min is None or half_min is None:
+        nothing = np.zeros(jars.shape, dtype=bool)
+        return nothing, nothing
+    full = worked & (jars >= full_min)
+    half = worked & (jars >= half_min) & (jars < full_min)
+    return full, half
+
+
+def days_elapsed(year, month, today=None):
+    """Days of the month that have started by `today`: all of a past month, none of a future one."""
+    today = today or date.today()
+    if (year, month) < (today.year, today.month):
+        return calendar.monthrange(year, month)[1]
+    if (year, month) == (today.year, today.month):
+        return today.day
+    return 0
+
+
+def _activity(business_id, start, end, user_id=None):
+    """Jars and deliveries per (staff member, UTC date) in [start, end], as arrays."""
+    day = func.date(DailyLog.timestamp)
+    stmt = (select(DailyLog.user_id, day.label('day'), func.sum(DailyLog.jars_delivered), func.count(DailyLog.id))
+            .join(User, DailyLog.user_id == User.id)
+            .where(User.business_id == business_id, User.role == 'staff', DailyLog.timestamp.between(start, end))
+            .group_by(DailyLog.user_id, day))
+    if user_id is not None:
+        stmt = stmt.where(DailyLog.user_id == user_id)
+    rows = db.session.execute(stmt).all()
+    user_ids, days, jars, deliveries = zip(*rows) if rows else ((), (), (), ())
+    return (np.array(user_ids, dtype=np.int64), np.array([str(d) for d in days], dtype='datetime64[D]'),
+            np.nan_to_num(np.array(jars, dtype=float)), np.array(deliveries, dtype=np.int64))
+
+
+def compute(business, year, month, start, end, today=None):
+    """
+    One line per staff member of the business for a month whose logs have a timestamp
+    in [start, end] (the month's UTC bounds), in user id order. Days are counted per
+    UTC date of the logs; absent days are the elapsed days of the month not worked.
+    Two queries, whatever the number of staff.
+    """
+    staff = db.session.execute(select(User.id, User.username, User.wage_type, User.daily_wage, User.monthly_salary)
+                               .where(User.role == 'staff', User.business_id == business.id).order_by(User.id)).all()
+    user_ids, days, jars, deliveries = _activity(business.id, start, end)
+
+    first_day = np.datetime64(start.date(), 'D')
+    n_days = (end.date() - start.date()).days + 1
+    staff_ids = np.array([row.id for row in staff], dtype=np.int64)
+    jars_by_day, deliveries_by_day = staff_day_matrix(staff_ids, user_ids, (days - first_day).astype(np.int64),
+                                                      jars, n_days, deliveries)
+    full, half = classify_days(jars_by_day, deliveries_by_day, business)
+    full_days, half_days = full.sum(axis=1), half.sum(axis=1)
+    present_days = (deliveries_by_day > 0).sum(axis=1)
+    jars_delivered = jars_by_day.sum(axis=1)
+
+    wage_type = np.array([row.wage_type for row in staff], dtype=object)
+    daily_rate = np.nan_to_num(np.array([row.daily_wage for row in staff], dtype=float))
+    monthly_rate = np.nan_to_num(np.array([row.monthly_salary for row in staff], dtype=float))
+    is_daily, is_monthly = wage_type == 'daily', wage_type == 'monthly'
+    wages = np.where(is_daily, daily_rate * (full_days + 0.5 * half_days), np.where(is_monthly, monthly_rate, 0.0))
+    rates = np.where(is_daily, daily_rate, np.where(is_monthly, monthly_rate, 0.0))
+    # Monthly staff get their salary whatever their attendance; their days present are reported as full days
+    full_days = np.where(is_monthly, present_days, full_days)
+    half_days = np.where(is_monthly, 0, half_days)
+    absent_days = np.maximum(days_elapsed(year, month, today) - (full_days + half_days), 0)
+
+    return [{
+        'user_id': user_id, 'username': row.username, 'wage_type': row.wage_type, 'rate': rate,
+        'full_days': full_count, 'half_days': half_count, 'present_days': present, 'absent_days': absent,
+        'jars_delivered': int(jar_count), 'total_wages': total,
+        'total_wages_display': wages_display(total, row.wage_type)
+    } for user_id, row, rate, full_count, half_count, present, absent, jar_count, total in zip(
+        staff_ids.tolist(), staff, rates.tolist(), full_days.tolist(), half_days.tolist(), present_days.tolist(),
+        absent_days.tolist(), jars_delivered.tolist(), wages.tolist())]
+
+
+def day_attendance(business, start, end, user_id=None):
+    """{user_id: (attendance status, jars)} of a business's staff for the logs in [start, end] (one day)."""
+    user_ids, _, jars, deliveries = _activity(business.id, start, end, user_id)
+    staff_ids, inverse = np.unique(user_ids, return_inverse=True)
+    jars = np.bincount(inverse, weights=jars, minlength=len(staff_ids))[:, None]
+    deliveries = np.bincount(inverse, weights=deliveries, minlength=len(staff_ids))[:, None]
+    full, half = classify_days(jars, deliveries, business)
+    return {user_id: ('Full Day' if is_full else 'Half Day' if is_half else 'Absent', int(jar_count))
+            for user_id, is_full, is_half, jar_count in zip(staff_ids.tolist(), full[:, 0].tolist(),
+                                                            half[:, 0].tolist(), jars[:, 0].tolist())}
+
+
+def latest_run(business_id, year, month):
+    return (PayrollRun.query.filter_by(business_id=business_id, year=year, month=month)
+            .order_by(PayrollRun.created_at.desc(), PayrollRun.id.desc()).first())
+
+
+def run_lines(run):
+    """A persisted run's lines in the shape compute() returns."""
+    return [{
+        'user_id': line.user_id, 'username': line.username, 'wage_type': line.wage_type, 'rate': line.rate,
+        'full_days': line.full_days, 'half_days': line.half_days, 'present_days': line.present_days,
+        'absent_days': line.absent_days, 'jars_delivered': line.jars_delivered, 'total_wages': line.wages,
+        'total_wages_display': wages_display(line.wages, line.wage_type)
+    } for line in run.lines]
+
+
+def month_payroll(business, year, month, start, end, today=None):
+    """
+    The month's staff lines for reports: the latest run made after the month ended
+    (the payroll of record), else computed live.
+    """
+    run = latest_run(business.id, year, month)
+    if run is not None and run.days_counted == calendar.monthrange(year, month)[1]:
+        return run_lines(run)
+    return compute(business, year, month, start, end, today)
+
+
+def run_payroll(business, year, month, start, end, created_by_id=None, today=None):
+    """Computes and persists a payroll run. Doesn't commit."""
+    lines = compute(business, year, month, start, end, today)
+    run = PayrollRun(business_id=business.id, year=year, month=month, days_counted=days_elapsed(year, month, today),
+                     total_wages=sum(line['total_wages'] for line in lines), created_by_id=created_by_id)
+    run.lines = [PayrollLine(user_id=line['user_id'], username=line['username'], wage_type=line['wage_type'],
+                             rate=line['rate'], full_days=line['full_days'], half_days=line['half_days'],
+                             present_days=line['present_days'], absent_days=line['absent_days'],
+                             jars_delivered=line['jars_delivered'], wages=line['total_wages'])
+                 for line in lines]
+    db.session.add(run)
+    return run
+
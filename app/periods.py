@@ -0,0 +1,177 @@
+# File: app/periods.py
+
+import calendar
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+from app.models import (Business, PeriodClose, PeriodSummary, PeriodCustomerSummary, PeriodProductSummary,
+                        PeriodStaffSummary, PeriodExpenseSummary, EXPENSE_CATEGORIES)
+from app.analytics import month_metrics
+from app.payroll import wages_display
+
+
+def month_bounds(year, month):
+    """
+    UTC start and end of an IST calendar month, as naive datetimes like the stored
+    timestamps (so PostgreSQL can prune the monthly partitions when filtering by them).
+    """
+    IST = ZoneInfo("Asia/Kolkata")
+    num_days_in_month = calendar.monthrange(year, month)[1]
+    start_of_month = datetime(year, month, 1)
+    end_of_month = datetime(year, month, num_days_in_month, 23, 59, 59)
+    return (start_of_month.replace(tzinfo=IST).astimezone(ZoneInfo("UTC")).replace(tzinfo=None),
+            end_of_month.replace(tzinfo=IST).astimezone(ZoneInfo("UTC")).replace(tzinfo=None))
+
+
+def compute_month(business, year, month):
+    """The monthly section of manager.reports, computed from the raw rows (app.analytics)."""
+    start_utc_month, end_utc_month = month_bounds(year, month)
+    return month_metrics(business, year, month, start_utc_month, end_utc_month)
+
+
+def _read_snapshot(period):
+    """The same shape as compute_month, from a closed period's snapshot tables."""
+    summary = period.summary
+    return {
+        'jar_sales': summary.jar_sales, 'product_sales': summary.product_sales, 'event_sales': summary.event_sales,
+        'total_monthly_sales': summary.total_sales,
+        'total_monthly_expenses': summary.total_expenses,
+        # Periods closed before expenses had categories have no breakdown
+        'expense_by_category': dict({category: 0.0 for category in EXPENSE_CATEGORIES},
+                                    **{row.category: row.total_amount for row in period.expenses}) if period.expenses else None,
+        'total_jars_lost': summary.jars_lost,
+        'customer_summary': db.session.query(
+            PeriodCustomerSummary.customer_name.label('name'), PeriodCustomerSummary.total_jars, PeriodCustomerSummary.total_amount
+        ).filter(PeriodCustomerSummary.period_id == period.id).order_by(PeriodCustomerSummary.total_amount.desc()).all(),
+        'monthly_product_summary': db.session.query(
+            PeriodProductSummary.product_name, PeriodProductSummary.total_quantity, PeriodProductSummary.total_amount
+        ).filter(PeriodProductSummary.period_id == period.id).order_by(PeriodProductSummary.id).all(),
+        'staff_monthly_summary': [
+            {'username': row.username, 'wage_type': row.wage_type, 'full_days': row.full_days, 'half_days': row.half_days,
+             'absent_days': row.absent_days, 'total_wages': row.total_wages,
+             'total_wages_display': wages_display(row.total_wages, row.wage_type)}
+            for row in PeriodStaffSummary.query.filter_by(period_id=period.id).order_by(PeriodStaffSummary.id)
+        ],
+    }
+
+
+def get_period(business_id, year, month):
+    return PeriodClose.query.filter_by(business_id=business_id, year=year, month=month).first()
+
+
+def monthly_report(business, year, month):
+    """(month data, PeriodClose or None). Closed months come from the snapshot only."""
+    period = get_period(business.id, year, month)
+    if period is not None and period.status == 'closed' and period.summary is not None:
+        return _read_snapshot(period), period
+    return compute_month(business, year, month), period
+
+
+def is_finished(year, month, today=None):
+    today = today or date.today()
+    return (year, month) < (today.year, today.month)
+
+
+def close_period(business, year, month):
+    """Snapshots a finished month (again, if it was reopened). Doesn't commit."""
+    if not is_finished(year, month):
+        raise ValueError('Only finished months can be closed.')
+    data = compute_month(business, year, month)
+    period = get_period(business.id, year, month)
+    if period is None:
+        period = PeriodClose(business_id=business.id, year=year, month=month)
+        db.session.add(period)
+    elif period.summary is not None:
+        # Old snapshot rows go first; summary.period_id is unique
+        period.summary = None
+        period.customers, period.products, period.staff, period.expenses = [], [], [], []
+        db.session.flush()
+    period.status = 'closed'
+    period.closed_at = datetime.utcnow()
+    period.summary = PeriodSummary(
+        jar_sales=data['jar_sales'], product_sales=data['product_sales'], event_sales=data['event_sales'],
+        total_sales=data['total_monthly_sales'], total_expenses=data['total_monthly_expenses'], jars_lost=data['total_jars_lost']
+    )
+    period.customers = [PeriodCustomerSummary(customer_name=row.name, total_jars=row.total_jars or 0, total_amount=row.total_amount or 0.0)
+                        for row in data['customer_summary']]
+    period.products = [PeriodProductSummary(product_name=row.product_name, total_quantity=row.total_quantity or 0,
+                                            total_amount=row.total_amount or 0.0)
+                       for row in data['monthly_product_summary']]
+    period.expenses = [PeriodExpenseSummary(category=category, total_amount=amount)
+                       for category, amount in data['expense_by_category'].items()]
+    period.staff = [PeriodStaffSummary(username=row['username'], wage_type=row['wage_type'], full_days=row['full_days'],
+                                       half_days=row['half_days'], absent_days=row['absent_days'], total_wages=row['total_wages'])
+                    for row in data['staff_monthly_summary']]
+    return period
+
+
+def reopen_period(period, user_id):
+    """Drops the snapshot so reports read live rows again; the next close recomputes only this month."""
+    period.status = 'reopened'
+    period.reopened_at = datetime.utcnow()
+    period.reopened_by_id = user_id
+    period.summary = None
+    period.customers = []
+    period.products = []
+    period.staff = []
+    period.expenses = []
+
+
+def _previous_month(today):
+    return (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+
+
+def close_due_periods(today=None):
+    """
+    Closes last month for every business once PERIOD_CLOSE_GRACE_DAYS have passed,
+    and recomputes reopened periods. Commits after each period. Returns the number closed.
+    """
+    today = today or date.today()
+    count = 0
+    if today.day > current_app.config['PERIOD_CLOSE_GRACE_DAYS']:
+        year, month = _previous_month(today)
+        closed = db.session.query(PeriodClose.business_id).filter_by(year=year, month=month)
+        for business in Business.query.filter(Business.id.notin_(closed)).all():
+            close_period(business, year, month)
+            db.session.commit()
+            count += 1
+    for period in PeriodClose.query.filter_by(status='reopened').all():
+        close_period(Business.query.get(period.business_id), period.year, period.month)
+        db.session.commit()
+        count += 1
+    return count
+
+
+def close_periods(app):
+    """Scheduled nightly."""
+    with app.app_context():
+        count = close_due_periods()
+        print(f"[{datetime.utcnow()}] Report periods closed: {count}")
+
+
+@click.command('close-period')
+@click.option('--year', type=int, required=True)
+@click.option('--month', type=int, required=True)
+@click.option('--business', 'business_id', type=int, default=None, help='Only close one business.')
+@with_appcontext
+def close_period_command(year, month, business_id):
+    """Closes (or re-closes) a finished month now, e.g. to backfill older months."""
+    if not is_finished(year, month):
+        raise click.UsageError('Only finished months can be closed.')
+    businesses = Business.query
+    if business_id is not None:
+        businesses = businesses.filter(Business.id == business_id)
+    count = 0
+    for business in businesses.all():
+        close_period(business, year, month)
+        db.session.commit()
+        count += 1
+    print(f"✅ {calendar.month_name[month]} {year} closed for {count} business(es).")
+
+
+def init_app(app):
+    """Register the CLI command with the Flask app."""
+    app.cli.add_command(close_period_command)
@@ -0,0 +1,135 @@
+# File: app/principal_cache.py
+
+import threading
+import time
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+from app.models import User, Customer, Business
+from app.tenant import loaded_business
+
+# Counters change on almost every delivery, so they are never cached; they are
+# left expired on the merged instance and load on first access.
+VOLATILE_COLUMNS = {'cash_balance', 'due_amount'}
+SUBSCRIPTION_COLUMNS = ('subscription_status', 'subscription_ends_at', 'trial_ends_at')
+
+_principals = {}     # 'user-5' -> (expires_at, {column: value})
+_lock = threading.Lock()
+
+
+def _ttl():
+    return current_app.config.get('PRINCIPAL_CACHE_TTL', 0) if has_app_context() else 0
+
+
+def _get(cache, key):
+    with _lock:
+        entry = cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        cache.pop(key, None)
+    return None
+
+
+def _put(cache, key, values):
+    with _lock:
+        cache[key] = (time.monotonic() + _ttl(), values)
+
+
+def _snapshot(obj, skip=()):
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs if attr.key not in skip}
+
+
+def load_principal(model, principal_id):
+    """
+    Returns the User/Customer for load_user. On a cache hit the instance is rebuilt
+    from the cached column values and attached to the session without a SELECT.
+    """
+    if _ttl() <= 0:
+        return model.query.get(principal_id)
+
+    key = f'{model.__name__.lower()}-{principal_id}'
+    values = _get(_principals, key)
+    if values is None:
+        principal = model.query.get(principal_id)
+        if principal is not None:
+            _put(_principals, key, _snapshot(principal, skip=VOLATILE_COLUMNS))
+        return principal
+
+    principal = model(**values)
+    make_transient_to_detached(principal)  # resets history; skipped columns stay expired
+    return db.session.merge(principal, load=False)
+
+
+def get_subscription_state(business_id):
+    """
+    Subscription columns of a business, cached for the request only. They aren't kept
+    across requests: the cache is per worker, and a payment or plan change handled
+    by another worker must take effect on the next request everywhere.
+    """
+    request_cache = g.setdefault('_subscription_states', {})
+    if business_id in request_cache:
+        return request_cache[business_id]
+
+    business = loaded_business()
+    if business is not None and business.id == business_id:
+        return {column: getattr(business, column) for column in SUBSCRIPTION_COLUMNS}
+
+    row = db.session.query(*(getattr(Business, column) for column in SUBSCRIPTION_COLUMNS)).filter(
+        Business.id == business_id
+    ).first()
+    state = dict(zip(SUBSCRIPTION_COLUMNS, row)) if row else None
+    request_cache[business_id] = state
+    return state
+
+
+def invalidate_principal(principal_key):
+    """`principal_key` is the Flask-Login id, e.g. 'user-5' or 'customer-12'."""
+    with _lock:
+        _principals.pop(principal_key, None)
+
+
+def invalidate_business(business_id):
+    if has_app_context():
+        g.pop('_subscription_states', None)
+
+
+def clear():
+    with _lock:
+        _principals.clear()
+
+
+def _has_cached_changes(obj):
+    state = inspect(obj)
+    return any(state.attrs[attr.key].history.has_changes()
+               for attr in state.mapper.column_attrs if attr.key not in VOLATILE_COLUMNS)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_stale_entries(session, flush_context):
+    stale = session.info.setdefault('principal_cache_stale', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (User, Customer)) and (obj in session.deleted or _has_cached_changes(obj)):
+            stale.add(('principal', obj.get_id()))
+        elif isinstance(obj, Business):
+            stale.add(('business', obj.id))
+    # Drop entries right away too, so a concurrent reader can't hold on to them until commit
+    _invalidate(stale)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    _invalidate(session.info.pop('principal_cache_stale', set()))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('principal_cache_stale', None)
+
+
+def _invalidate(stale):
+    for kind, target in stale:
+        if kind == 'principal':
+            invalidate_principal(target)
+        else:
+            invalidate_business(target)
@@ -0,0 +1,52 @@
+# File: app/projections.py
+
+from app.models import Customer, User, EventBooking, CashHandover, ProductSale, SupplierProduct
+
+# Column bundles for read-only list and report pages. Querying these instead of the
+# model returns plain Row named tuples with just the rendered columns: no password
+# hashes, notes or descriptions are read, and nothing lands in the identity map.
+#
+#     rows = db.session.query(*STAFF_LIST).filter(...).all()
+#     rows[0].username
+#
+# Keep each bundle in step with the template named next to it.
+
+# customers/list_customers.html
+CUSTOMER_LIST = (
+    Customer.id, Customer.name, Customer.mobile_number, Customer.customer_type,
+    Customer.area, Customer.village, Customer.note,
+    Customer.daily_jars, Customer.price_per_jar, Customer.due_amount,
+)
+
+# delivery/dashboard.html (customers with dues)
+CUSTOMER_DUES = (
+    Customer.id, Customer.name, Customer.area, Customer.village, Customer.due_amount,
+)
+
+# manager/list_staff.html
+STAFF_LIST = (
+    User.id, User.username, User.mobile_number, User.wage_type, User.daily_wage, User.monthly_salary,
+)
+
+# manager/reports.html (event bookings); add the collector's name from an aliased User join
+BOOKING_REPORT = (
+    EventBooking.id, EventBooking.event_date, EventBooking.quantity, EventBooking.jars_returned,
+    EventBooking.final_amount, Customer.name.label('customer_name'),
+)
+
+# manager/reports.html (cash handovers), joined to the staff User
+HANDOVER_REPORT = (
+    CashHandover.id, CashHandover.timestamp, CashHandover.amount, User.username.label('staff_name'),
+)
+
+# manager/reports.html (product sales / leads)
+PRODUCT_SALE_REPORT = (
+    ProductSale.id, ProductSale.timestamp, ProductSale.product_name, ProductSale.quantity,
+    ProductSale.total_amount, ProductSale.customer_name, ProductSale.customer_mobile,
+)
+
+# supplier/product_list.html
+SUPPLIER_PRODUCT_LIST = (
+    SupplierProduct.id, SupplierProduct.name, SupplierProduct.category,
+    SupplierProduct.price, SupplierProduct.discount_percentage,
+)
@@ -9,6 +9,7 @@ from wtforms.validators import DataRequired, Length, EqualTo, Email, ValidationE
 import random
 import string
 from app.email import send_password_reset_email, send_registration_email
+from app.identity import identifier_taken
 from flask import current_app
 
 class RegistrationForm(FlaskForm):
@@ -23,7 +24,7 @@ class RegistrationForm(FlaskForm):
     submit = SubmitField('Start Your Free Trial')
 
     def validate_username(self, username):
-        if User.query.filter_by(username=username.data).first() or Customer.query.filter_by(username=username.data).first():
+        if identifier_taken('username', username.data):
             raise ValidationError('This username is already taken. Please choose a different one.')
 
     def validate_plant_name(self, plant_name):
@@ -32,8 +33,7 @@ class RegistrationForm(FlaskForm):
             raise ValidationError('This plant name is already registered. Please choose a different one.')
 
     def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
+        if identifier_taken('email', email.data):
             raise ValidationError('This email address is already registered.')
 
     def validate_mobile_number(self, mobile_number):
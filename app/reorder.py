@@ -0,0 +1,159 @@
+# File: app/reorder.py
+
+import math
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, delete, func
+from app import db
+from app.models import (Business, Customer, EventBooking, ProductSale, SupplierProduct,
+                        PurchaseOrder, PurchaseOrderItem, ReorderSuggestion)
+
+DRAFT = 'Draft'
+
+# category -> (ProductSale.product_name, Business stock column, Business threshold column)
+ITEMS = {
+    'Jars': ('New Jar', 'jar_stock', 'low_stock_threshold'),
+    'Dispensers': ('Dispenser', 'dispenser_stock', 'low_stock_threshold_dispenser'),
+}
+
+
+def _by_business(rows):
+    return {row[0]: row[1:] for row in rows}
+
+
+def _usage(since, today, horizon):
+    """
+    Per business, from three grouped queries: items sold, items lost at completed
+    events (booked minus returned) since `since`, and items that pending and confirmed
+    bookings in the next `horizon` days will hold.
+    """
+    sales = db.session.execute(
+        select(ProductSale.business_id, ProductSale.product_name, func.sum(ProductSale.quantity))
+        .where(ProductSale.timestamp >= since)
+        .group_by(ProductSale.business_id, ProductSale.product_name)
+    ).all()
+    sold = {}
+    for business_id, product_name, quantity in sales:
+        sold[(business_id, product_name)] = quantity or 0
+
+    lost = _by_business(db.session.execute(
+        select(Customer.business_id,
+               func.sum(EventBooking.quantity - func.coalesce(EventBooking.jars_returned, 0)),
+               func.sum(func.coalesce(EventBooking.dispensers_booked, 0) - func.coalesce(EventBooking.dispensers_returned, 0)))
+        .join(Customer, EventBooking.customer_id == Customer.id)
+        .where(EventBooking.status == 'Completed', EventBooking.collection_timestamp >= since)
+        .group_by(Customer.business_id)
+    ).all())
+
+    pending = _by_business(db.session.execute(
+        select(Customer.business_id, func.sum(EventBooking.quantity), func.sum(func.coalesce(EventBooking.dispensers_booked, 0)))
+        .join(Customer, EventBooking.customer_id == Customer.id)
+        .where(EventBooking.status.in_(['Pending', 'Confirmed']), EventBooking.event_date >= today,
+               EventBooking.event_date <= today + timedelta(days=horizon))
+        .group_by(Customer.business_id)
+    ).all())
+    return sold, lost, pending
+
+
+def cheapest_product(category):
+    """The lowest priced product after discount across all suppliers, via ix_supplier_product_category_price."""
+    final_price = SupplierProduct.price * (1 - func.coalesce(SupplierProduct.discount_percentage, 0) / 100.0)
+    row = db.session.query(SupplierProduct, final_price).filter(
+        SupplierProduct.category == category
+    ).order_by(final_price, SupplierProduct.id).first()
+    return row if row else (None, None)
+
+
+def reorder_levels(stock, burn_rate, reserved, threshold, config):
+    """
+    (reorder point, order quantity). Reorder when stock can no longer cover lead time
+    plus safety days of usage and the upcoming bookings, and never later than the
+    manager's own low stock threshold; order enough to last REORDER_COVER_DAYS more.
+    """
+    reorder_point = math.ceil(burn_rate * (config['REORDER_LEAD_DAYS'] + config['REORDER_SAFETY_DAYS'])) + reserved
+    reorder_point = max(reorder_point, threshold or 0)
+    target = reorder_point + math.ceil(burn_rate * config['REORDER_COVER_DAYS'])
+    return reorder_point, max(target - (stock or 0), 0)
+
+
+def refresh_suggestions(business_id=None):
+    """
+    Recomputes every business's suggestions (or one business's) and replaces their
+    draft purchase orders: one draft per supplier, for the items at or below their
+    reorder point. Returns the number of drafts created.
+    """
+    config = current_app.config
+    today = date.today()
+    window = config['REORDER_WINDOW_DAYS']
+    since = datetime.combine(today - timedelta(days=window), datetime.min.time())
+    horizon = config['REORDER_LEAD_DAYS'] + config['REORDER_SAFETY_DAYS'] + config['REORDER_COVER_DAYS']
+
+    sold, lost, pending = _usage(since, today, horizon)
+    products = {category: cheapest_product(category) for category in ITEMS}
+
+    businesses = Business.query
+    if business_id is not None:
+        businesses = businesses.filter(Business.id == business_id)
+    businesses = businesses.all()
+    business_ids = [business.id for business in businesses]
+
+    # Old suggestions and drafts are replaced wholesale
+    drafts = select(PurchaseOrder.id).where(PurchaseOrder.business_id.in_(business_ids), PurchaseOrder.status == DRAFT)
+    db.session.execute(delete(ReorderSuggestion).where(ReorderSuggestion.business_id.in_(business_ids)))
+    db.session.execute(delete(PurchaseOrderItem).where(PurchaseOrderItem.order_id.in_(drafts)))
+    db.session.execute(delete(PurchaseOrder).where(PurchaseOrder.id.in_(drafts)))
+
+    created = 0
+    computed_at = datetime.utcnow()
+    for business in businesses:
+        orders = {}  # supplier_id -> draft PurchaseOrder
+        for index, (category, (product_name, stock_column, threshold_column)) in enumerate(ITEMS.items()):
+            stock = getattr(business, stock_column) or 0
+            used = sold.get((business.id, product_name), 0) + ((lost.get(business.id) or (0, 0))[index] or 0)
+            reserved = (pending.get(business.id) or (0, 0))[index] or 0
+            burn_rate = used / window
+            reorder_point, order_quantity = reorder_levels(stock, burn_rate, reserved, getattr(business, threshold_column), config)
+            product, unit_price = products[category]
+
+            suggestion = ReorderSuggestion(
+                business_id=business.id, category=category, stock=stock, burn_rate=round(burn_rate, 3),
+                reserved=reserved, reorder_point=reorder_point, order_quantity=order_quantity,
+                product_id=product.id if product else None, unit_price=unit_price, computed_at=computed_at
+            )
+            if product and order_quantity > 0 and stock <= reorder_point:
+                order = orders.get(product.supplier_id)
+                if order is None:
+                    order = orders[product.supplier_id] = PurchaseOrder(
+                        business_id=business.id, supplier_id=product.supplier_id, total_amount=0.0, status=DRAFT
+                    )
+                    db.session.add(order)
+                    created += 1
+                order.items.append(PurchaseOrderItem(product_id=product.id, quantity=order_quantity, price_at_purchase=unit_price))
+                order.total_amount += order_quantity * unit_price
+                suggestion.purchase_order = order
+            db.session.add(suggestion)
+
+    db.session.commit()
+    return created
+
+
+def refresh_reorders(app):
+    """Scheduled nightly."""
+    with app.app_context():
+        count = refresh_suggestions()
+        print(f"[{datetime.utcnow()}] Reorder suggestions refreshed; draft purchase orders: {count}")
+
+
+@click.command('refresh-reorders')
+@click.option('--business', 'business_id', type=int, default=None, help='Only refresh one business.')
+@with_appcontext
+def refresh_reorders_command(business_id):
+    """Recomputes reorder suggestions and draft purchase orders now."""
+    print(f"✅ {refresh_suggestions(business_id)} draft purchase order(s) prepared.")
+
+
+def init_app(app):
+    """Register the CLI command with the Flask app."""
+    app.cli.add_command(refresh_reorders_command)
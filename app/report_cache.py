@@ -0,0 +1,191 @@
+# File: app/report_cache.py
+
+import pickle
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import event, select, update
+from app import db
+from app.models import (Business, User, Customer, DailyLog, Expense, CashHandover, ProductSale, EventBooking,
+                        PeriodClose, PayrollRun, SupplierProfile, SupplierProduct, PurchaseOrder, PurchaseOrderItem)
+
+# Computed report payloads are cached under (scope, owner, data version, report key).
+# Business.data_version / SupplierProfile.data_version are bumped in the same
+# transaction as any write to data a report reads, so a cached payload is only ever
+# found while the data it was computed from is still current; nothing expires.
+#
+# Writes through the ORM are picked up by the after_flush hook below. Core
+# UPDATE/INSERT statements on report data must call touch() themselves.
+
+BUSINESS_COLUMN = {ProductSale: 'business_id', PeriodClose: 'business_id', PayrollRun: 'business_id',
+                   PurchaseOrder: 'business_id', Customer: 'business_id', User: 'business_id'}
+CUSTOMER_COLUMN = {DailyLog: 'customer_id', EventBooking: 'customer_id'}
+USER_COLUMN = {DailyLog: 'user_id', Expense: 'user_id', CashHandover: 'user_id'}
+SUPPLIER_COLUMN = {PurchaseOrder: 'supplier_id', SupplierProduct: 'supplier_id'}
+
+_MISSING = object()
+
+
+class _LRU:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _RedisBackend:
+    """Shared between workers; entries expire after REPORT_CACHE_SHARED_TTL as old versions are never read again."""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("REPORT_CACHE_REDIS_URL is set but the 'redis' package isn't installed (pip install redis).")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        try:
+            value = self._client.get(key)
+        except Exception as e:
+            current_app.logger.warning(f"Report cache read failed: {e}")
+            return _MISSING
+        return _MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        try:
+            self._client.set(key, pickle.dumps(value), ex=ttl)
+        except Exception as e:
+            current_app.logger.warning(f"Report cache write failed: {e}")
+
+
+_local = _LRU()
+_shared = {}  # redis url -> _RedisBackend
+
+
+def _shared_backend():
+    url = current_app.config.get('REPORT_CACHE_REDIS_URL')
+    if not url:
+        return None
+    if url not in _shared:
+        _shared[url] = _RedisBackend(url)
+    return _shared[url]
+
+
+def data_version(scope, owner_id):
+    """The current version of a business's ('business') or supplier's ('supplier') report data."""
+    model = Business if scope == 'business' else SupplierProfile
+    return db.session.execute(select(model.data_version).where(model.id == owner_id)).scalar() or 0
+
+
+def _cache_key(scope, owner_id, version, key):
+    return ':'.join(['report', scope, str(owner_id), str(version)] + [str(part) for part in key])
+
+
+def peek(scope, owner_id, key, version=None):
+    """The cached payload at `version` (default: the owner's current data version), or None."""
+    size = current_app.config['REPORT_CACHE_SIZE']
+    if size <= 0:
+        return None
+    if version is None:
+        version = data_version(scope, owner_id)
+    cache_key = _cache_key(scope, owner_id, version, key)
+    payload = _local.get(cache_key)
+    if payload is not _MISSING:
+        return payload
+    shared = _shared_backend()
+    if shared is not None:
+        payload = shared.get(cache_key)
+        if payload is not _MISSING:
+            _local.set(cache_key, payload, size)
+            return payload
+    return None
+
+
+def store(scope, owner_id, version, key, payload):
+    """Caches a payload computed from the data at `version` (read before computing it)."""
+    size = current_app.config['REPORT_CACHE_SIZE']
+    if size <= 0:
+        return
+    cache_key = _cache_key(scope, owner_id, version, key)
+    _local.set(cache_key, payload, size)
+    shared = _shared_backend()
+    if shared is not None:
+        shared.set(cache_key, payload, current_app.config['REPORT_CACHE_SHARED_TTL'])
+
+
+def cached_report(scope, owner_id, key, compute):
+    """
+    Returns compute()'s payload for (scope, owner_id, key) at the owner's current data
+    version: from the in-process LRU, then the shared backend, else computed and stored
+    in both. `key` is a tuple of the report's parameters; the payload must be picklable
+    (rows and plain values, no ORM instances).
+    """
+    if current_app.config['REPORT_CACHE_SIZE'] <= 0:
+        return compute()
+    version = data_version(scope, owner_id)
+    payload = peek(scope, owner_id, key, version)
+    if payload is None:
+        payload = compute()
+        store(scope, owner_id, version, key, payload)
+    return payload
+
+
+def touch(connection, business_ids=(), supplier_ids=()):
+    """Bumps the data versions; runs in the caller's transaction, so it commits or rolls back with the write."""
+    business_ids = {business_id for business_id in business_ids if business_id is not None}
+    supplier_ids = {supplier_id for supplier_id in supplier_ids if supplier_id is not None}
+    if business_ids:
+        connection.execute(update(Business).where(Business.id.in_(business_ids))
+                           .values(data_version=Business.data_version + 1))
+    if supplier_ids:
+        connection.execute(update(SupplierProfile).where(SupplierProfile.id.in_(supplier_ids))
+                           .values(data_version=SupplierProfile.data_version + 1))
+
+
+def clear():
+    _local.clear()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_versions(session, flush_context):
+    business_ids, customer_ids, user_ids, supplier_ids, order_ids = set(), set(), set(), set(), set()
+    changed = list(session.new) + list(session.deleted) + [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in changed:
+        model = type(obj)
+        if model is Business:
+            business_ids.add(obj.id)
+        elif model is PurchaseOrderItem:
+            order_ids.add(obj.order_id)
+        for columns, ids in ((BUSINESS_COLUMN, business_ids), (CUSTOMER_COLUMN, customer_ids),
+                             (USER_COLUMN, user_ids), (SUPPLIER_COLUMN, supplier_ids)):
+            if model in columns:
+                ids.add(getattr(obj, columns[model]))
+    if not (business_ids or customer_ids or user_ids or supplier_ids or order_ids):
+        return
+
+    connection = session.connection()
+    customer_ids.discard(None); user_ids.discard(None); order_ids.discard(None)
+    if customer_ids:
+        business_ids.update(connection.execute(select(Customer.business_id).where(Customer.id.in_(customer_ids))).scalars())
+    if user_ids:
+        business_ids.update(connection.execute(select(User.business_id).where(User.id.in_(user_ids))).scalars())
+    if order_ids:
+        supplier_ids.update(connection.execute(select(PurchaseOrder.supplier_id).where(PurchaseOrder.id.in_(order_ids))).scalars())
+    touch(connection, business_ids, supplier_ids)
@@ -0,0 +1,196 @@
+# File: app/reports.py
+
+import pickle
+import uuid
+from datetime import datetime, timedelta
+from threading import Thread
+from zoneinfo import ZoneInfo
+from flask import current_app
+from sqlalchemy import func, update, delete
+from sqlalchemy.orm import aliased
+from app import db, scheduler
+from app.models import (Business, User, Customer, CashHandover, ProductSale, EventBooking, ReportJob)
+from app.daily_ledger import daily_ledger_page, daily_totals
+from app.projections import BOOKING_REPORT, HANDOVER_REPORT, PRODUCT_SALE_REPORT
+from app.periods import monthly_report, month_bounds
+from app.payroll import day_attendance
+from app.report_cache import data_version, store
+
+DAILY_LEDGER_PAGE_SIZE = 50
+
+
+def ist_day_bounds(report_date):
+    """UTC start and end of an IST calendar day, naive like the stored timestamps (see periods.month_bounds)."""
+    IST = ZoneInfo("Asia/Kolkata")
+    start_utc_day = datetime.combine(report_date, datetime.min.time(), tzinfo=IST).astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+    end_utc_day = datetime.combine(report_date, datetime.max.time(), tzinfo=IST).astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+    return start_utc_day, end_utc_day
+
+
+def manager_report(business, report_year, report_month, report_date, progress=None):
+    """
+    Everything manager.reports shows for a month and day, as rows and plain values
+    (picklable, for app.report_cache and ReportJob.payload). `progress(percent)` is
+    called between the steps when given.
+    """
+    progress = progress or (lambda percent: None)
+    business_id = business.id
+    # Closed months are read from their snapshot; open and reopened months are computed live
+    month, period = monthly_report(business, report_year, report_month)
+    progress(50)
+    start_utc_month, end_utc_month = month_bounds(report_year, report_month)
+
+    collector = aliased(User)
+    booking_logs = db.session.query(*BOOKING_REPORT, collector.username.label('collected_by_name')).join(
+        Customer, EventBooking.customer_id == Customer.id
+    ).outerjoin(collector, EventBooking.collected_by_id == collector.id).filter(
+        Customer.business_id == business_id,
+        EventBooking.status == 'Completed',
+        EventBooking.collection_timestamp.between(start_utc_month, end_utc_month)
+    ).order_by(EventBooking.collection_timestamp.desc()).all()
+
+    staff_members = User.query.filter_by(role='staff', business_id=business_id).all()
+
+    start_utc_day, end_utc_day = ist_day_bounds(report_date)
+
+    # Daily transactions come from one UNION ALL query; further pages load via manager.reports_daily
+    daily_ledger, daily_ledger_cursor = daily_ledger_page(business_id, start_utc_day, end_utc_day, per_page=DAILY_LEDGER_PAGE_SIZE)
+    total_daily_sales, total_daily_expenses = daily_totals(business_id, start_utc_day, end_utc_day)
+    progress(70)
+
+    # Today's attendance for all staff from one grouped query (app.payroll)
+    day = day_attendance(business, start_utc_day, end_utc_day)
+    attendance = []
+    for staff in staff_members:
+        status, jars_sold = day.get(staff.id, ("Absent", 0))
+        # Only calculate attendance status for daily wage staff based on jars
+        if staff.wage_type == 'daily':
+            jars_display = str(jars_sold)
+        elif staff.wage_type == 'monthly':
+            # For monthly staff, just check if they made any deliveries today
+            status = "Present" if staff.id in day else "Absent"
+            jars_display = "-" # Jars not directly tied to attendance status
+        else:
+             status = "N/A"
+             jars_display = "-"
+
+        attendance.append({'username': staff.username, 'jars_sold': jars_display, 'status': status})
+
+    progress(85)
+
+    cash_handover_logs = db.session.query(*HANDOVER_REPORT).join(
+        User, CashHandover.user_id == User.id
+    ).filter(
+        User.business_id == business_id,
+        # Show handovers received by ANY manager of the business, not just current_user
+        CashHandover.manager.has(role='manager', business_id=business_id),
+        CashHandover.timestamp.between(start_utc_month, end_utc_month)
+    ).order_by(CashHandover.timestamp.desc()).all()
+
+    monthly_leads = db.session.query(*PRODUCT_SALE_REPORT).filter(
+        ProductSale.business_id == business_id,
+        ProductSale.timestamp.between(start_utc_month, end_utc_month)
+    ).order_by(ProductSale.timestamp.desc()).all()
+
+    return dict(
+        total_monthly_sales=month['total_monthly_sales'], total_monthly_expenses=month['total_monthly_expenses'],
+        expense_by_category=month['expense_by_category'],
+        customer_summary=month['customer_summary'], monthly_product_summary=month['monthly_product_summary'],
+        staff_monthly_summary=month['staff_monthly_summary'],
+        booking_logs=booking_logs,
+        total_jars_lost=month['total_jars_lost'],
+        period={'status': period.status, 'closed_at': period.closed_at} if period else None,
+        daily_ledger=daily_ledger, daily_ledger_cursor=daily_ledger_cursor,
+        attendance=attendance,
+        total_daily_sales=total_daily_sales, total_daily_expenses=total_daily_expenses,
+        cash_handover_logs=cash_handover_logs,
+        monthly_leads=monthly_leads)
+
+
+# --- Background computation for large tenants ---
+
+def run_in_background(business, requested=None):
+    """
+    Whether to compute the report in a ReportJob: `requested` is the page's
+    ?background= value ('1' or '0' force it); otherwise for businesses with at
+    least REPORT_ASYNC_MIN_CUSTOMERS customers (0 disables).
+    """
+    if requested in ('0', '1'):
+        return requested == '1'
+    threshold = current_app.config['REPORT_ASYNC_MIN_CUSTOMERS']
+    if threshold <= 0:
+        return False
+    return db.session.query(func.count(Customer.id)).filter(Customer.business_id == business.id).scalar() >= threshold
+
+
+def start_job(business, year, month, report_date):
+    """
+    Returns the job computing this report at the business's current data version,
+    queueing a new one (on the app's scheduler) unless one is already queued,
+    running or done. Jobs queued or running for longer than REPORT_JOB_TIMEOUT_MINUTES
+    lost their worker and are marked failed first. Commits.
+    """
+    version = data_version('business', business.id)
+    stale = datetime.utcnow() - timedelta(minutes=current_app.config['REPORT_JOB_TIMEOUT_MINUTES'])
+    db.session.execute(update(ReportJob).where(
+        ReportJob.business_id == business.id, ReportJob.status.in_(['queued', 'running']), ReportJob.created_at < stale
+    ).values(status='failed', error='Timed out.', finished_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False})
+    job = ReportJob.query.filter(
+        ReportJob.business_id == business.id, ReportJob.year == year, ReportJob.month == month,
+        ReportJob.report_date == report_date, ReportJob.data_version == version,
+        ReportJob.status.in_(['queued', 'running', 'done'])
+    ).first()
+    if job is not None:
+        return job
+
+    expired = datetime.utcnow() - timedelta(hours=current_app.config['REPORT_JOB_KEEP_HOURS'])
+    db.session.execute(delete(ReportJob).where(ReportJob.business_id == business.id, ReportJob.created_at < expired))
+    job = ReportJob(id=uuid.uuid4().hex, business_id=business.id, year=year, month=month,
+                    report_date=report_date, data_version=version)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    if scheduler.running:
+        scheduler.add_job(id=f'report-{job.id}', func=run_job, args=[app, job.id])
+    else:
+        Thread(target=run_job, args=(app, job.id)).start()
+    return job
+
+
+def run_job(app, job_id):
+    """Computes a queued job's payload, recording progress as it goes."""
+    with app.app_context():
+        job = db.session.get(ReportJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+        job.status, job.progress = 'running', 5
+        db.session.commit()
+
+        def progress(percent):
+            db.session.execute(update(ReportJob).where(ReportJob.id == job_id).values(progress=percent))
+            db.session.commit()
+
+        try:
+            business = db.session.get(Business, job.business_id)
+            payload = manager_report(business, job.year, job.month, job.report_date, progress)
+            job.payload = pickle.dumps(payload)
+            job.status, job.progress, job.finished_at = 'done', 100, datetime.utcnow()
+            db.session.commit()
+            print(f"[{datetime.utcnow()}] Report job {job_id} done.")
+        except Exception as e:
+            db.session.rollback()
+            db.session.execute(update(ReportJob).where(ReportJob.id == job_id).values(
+                status='failed', error=str(e)[:255], finished_at=datetime.utcnow()))
+            db.session.commit()
+            print(f"[{datetime.utcnow()}] Report job {job_id} failed: {e}")
+
+
+def job_result(job):
+    """A done job's payload (also put in the report cache), else None."""
+    if job is None or job.status != 'done':
+        return None
+    payload = pickle.loads(job.payload)
+    store('business', job.business_id, job.data_version, (job.year, job.month, job.report_date.isoformat()), payload)
+    return payload
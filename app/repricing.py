@@ -0,0 +1,89 @@
+# File: app/repricing.py
+
+from datetime import datetime
+from sqlalchemy import select, insert, update, func, case, literal, cast, Numeric, Float
+from app import db
+from app.models import Customer, PriceChange, CustomerPriceHistory
+
+
+def _criteria(business_id, village=None, area=None, customer_type=None):
+    """WHERE clauses for the customers a change applies to; empty filters match everyone."""
+    criteria = [Customer.business_id == business_id]
+    if village:
+        criteria.append(Customer.village == village)
+    if area:
+        criteria.append(Customer.area == area)
+    if customer_type:
+        criteria.append(Customer.customer_type == customer_type)
+    return criteria
+
+
+def _new_price(price_mode, price_value):
+    """SQL expression for the new price per jar, rounded to paise and never below zero."""
+    if price_value is None:
+        return Customer.price_per_jar
+    if price_mode == 'percent':
+        price = Customer.price_per_jar * (1 + price_value / 100.0)
+    elif price_mode == 'amount':
+        price = Customer.price_per_jar + price_value
+    elif price_mode == 'set':
+        price = literal(price_value)
+    else:
+        return Customer.price_per_jar
+    # PostgreSQL only rounds to decimal places on numeric, not on double precision
+    return cast(func.round(cast(case((price < 0, 0.0), else_=price), Numeric), 2), Float)
+
+
+def _new_daily_jars(daily_jars):
+    return Customer.daily_jars if daily_jars is None else literal(daily_jars)
+
+
+def preview(business_id, village=None, area=None, customer_type=None,
+            price_mode=None, price_value=None, daily_jars=None, sample_size=10):
+    """(number of customers matched, first few as rows of name and old/new values)."""
+    criteria = _criteria(business_id, village, area, customer_type)
+    count = db.session.query(func.count(Customer.id)).filter(*criteria).scalar()
+    sample = db.session.query(
+        Customer.id, Customer.name, Customer.village,
+        Customer.price_per_jar.label('old_price'), _new_price(price_mode, price_value).label('new_price'),
+        Customer.daily_jars.label('old_daily_jars'), _new_daily_jars(daily_jars).label('new_daily_jars')
+    ).filter(*criteria).order_by(Customer.name, Customer.id).limit(sample_size).all()
+    return count, sample
+
+
+def apply_change(business_id, changed_by_id, village=None, area=None, customer_type=None,
+                 price_mode=None, price_value=None, daily_jars=None):
+    """
+    Re-prices every matching customer with two set-based statements: an INSERT ... SELECT
+    recording each customer's before/after values, then one UPDATE. Nothing is
+    committed; the caller commits. Returns the PriceChange, with customers_affected set.
+    """
+    change = PriceChange(
+        business_id=business_id, changed_by_id=changed_by_id, timestamp=datetime.utcnow(),
+        village=village or None, area=area or None, customer_type=customer_type or None,
+        price_mode=price_mode, price_value=price_value if price_mode else None, daily_jars=daily_jars
+    )
+    db.session.add(change)
+    db.session.flush()
+
+    criteria = _criteria(business_id, village, area, customer_type)
+    new_price = _new_price(price_mode, price_value)
+    new_daily_jars = _new_daily_jars(daily_jars)
+
+    db.session.execute(insert(CustomerPriceHistory).from_select(
+        ['change_id', 'customer_id', 'old_price', 'new_price', 'old_daily_jars', 'new_daily_jars'],
+        select(literal(change.id), Customer.id, Customer.price_per_jar, new_price, Customer.daily_jars, new_daily_jars)
+        .where(*criteria)
+    ))
+    result = db.session.execute(
+        update(Customer).where(*criteria).values(price_per_jar=new_price, daily_jars=new_daily_jars),
+        execution_options={'synchronize_session': False}
+    )
+    change.customers_affected = result.rowcount
+    return change
+
+
+def changed_customer_ids(change_id):
+    return [customer_id for (customer_id,) in db.session.query(CustomerPriceHistory.customer_id).filter(
+        CustomerPriceHistory.change_id == change_id
+    )]
@@ -0,0 +1,109 @@
+# File: app/reservations.py
+
+from datetime import date, timedelta
+from sqlalchemy import update, delete, case, func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import EventReservation
+
+# Business.jar_stock / dispenser_stock count every item the business owns, including
+# those out at events. A confirmed booking reserves its items on the event date;
+# collecting it releases them and writes off whatever didn't come back. Items on a
+# date are free unless they are reserved that day or still out from an earlier
+# event that hasn't been collected yet.
+
+
+def _change(business_id, day, jars, dispensers):
+    """Adds to the reservation row for (business, day), creating it if needed."""
+    stmt = update(EventReservation).where(
+        EventReservation.business_id == business_id, EventReservation.date == day
+    ).values(jars_reserved=EventReservation.jars_reserved + jars,
+             dispensers_reserved=EventReservation.dispensers_reserved + dispensers)
+    if db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(EventReservation(business_id=business_id, date=day,
+                                            jars_reserved=jars, dispensers_reserved=dispensers))
+    except IntegrityError:
+        # Someone else created the row in the meantime
+        db.session.execute(stmt, execution_options={'synchronize_session': False})
+
+
+def reserved(business_id, day):
+    """
+    (jars, dispensers) unavailable on `day`: reserved that day, plus still out from
+    earlier dates. One range query on uq_event_reservation_business_date.
+    """
+    day = max(day, date.today())
+    held = (EventReservation.date == day) | (EventReservation.date < date.today())
+    jars, dispensers = db.session.query(
+        func.coalesce(func.sum(case((held, EventReservation.jars_reserved), else_=0)), 0),
+        func.coalesce(func.sum(case((held, EventReservation.dispensers_reserved), else_=0)), 0)
+    ).filter(EventReservation.business_id == business_id, EventReservation.date <= day).one()
+    return int(jars), int(dispensers)
+
+
+def available(business, day):
+    """(jars, dispensers) free on `day`."""
+    jars, dispensers = reserved(business.id, day)
+    return (business.jar_stock or 0) - jars, (business.dispenser_stock or 0) - dispensers
+
+
+def sellable(business):
+    """
+    (jars, dispensers) that can leave for good today, e.g. in a product sale: stock
+    less what is still out and the busiest upcoming day's reservations, so no
+    confirmed booking is left short. One range query, like reserved().
+    """
+    today = date.today()
+    overdue, upcoming = EventReservation.date < today, EventReservation.date >= today
+    jars_out, dispensers_out, jars_peak, dispensers_peak = db.session.query(
+        func.coalesce(func.sum(case((overdue, EventReservation.jars_reserved), else_=0)), 0),
+        func.coalesce(func.sum(case((overdue, EventReservation.dispensers_reserved), else_=0)), 0),
+        func.coalesce(func.max(case((upcoming, EventReservation.jars_reserved), else_=0)), 0),
+        func.coalesce(func.max(case((upcoming, EventReservation.dispensers_reserved), else_=0)), 0)
+    ).filter(EventReservation.business_id == business.id).one()
+    return ((business.jar_stock or 0) - int(jars_out) - int(jars_peak),
+            (business.dispenser_stock or 0) - int(dispensers_out) - int(dispensers_peak))
+
+
+def reserve(business, day, jars, dispensers):
+    """
+    Reserves items for a booking on `day` if they are free; returns False (and
+    reserves nothing) if not. The reservation is written before the check, so two
+    bookings confirmed at once can't both take the last jars.
+    """
+    _change(business.id, day, jars, dispensers)
+    free_jars, free_dispensers = available(business, day)
+    if free_jars < 0 or free_dispensers < 0:
+        _change(business.id, day, -jars, -dispensers)
+        return False
+    return True
+
+
+def release(business_id, day, jars, dispensers):
+    """Frees a collected booking's items and drops rows that no longer hold anything."""
+    _change(business_id, day, -jars, -dispensers)
+    db.session.execute(delete(EventReservation).where(
+        EventReservation.business_id == business_id, EventReservation.date == day,
+        EventReservation.jars_reserved <= 0, EventReservation.dispensers_reserved <= 0
+    ), execution_options={'synchronize_session': False})
+
+
+def calendar(business, days=90):
+    """[(date, jars reserved, dispensers reserved, jars free)] for the next `days` days, from one range query."""
+    today = date.today()
+    rows = db.session.query(EventReservation.date, EventReservation.jars_reserved, EventReservation.dispensers_reserved).filter(
+        EventReservation.business_id == business.id, EventReservation.date < today + timedelta(days=days)
+    ).all()
+    overdue_jars = sum(row.jars_reserved for row in rows if row.date < today)
+    by_date = {row.date: row for row in rows if row.date >= today}
+    result = []
+    for offset in range(days):
+        day = today + timedelta(days=offset)
+        row = by_date.get(day)
+        jars = row.jars_reserved if row else 0
+        dispensers = row.dispensers_reserved if row else 0
+        result.append((day, jars, dispensers, (business.jar_stock or 0) - overdue_jars - jars))
+    return result
@@ -9,6 +9,10 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField, IntegerField, SelectField
 from wtforms.validators import DataRequired, Length, ValidationError, NumberRange
 from app.manager.routes import subscription_required
+from app.tenant import get_business
+from app.counters import adjust
+from app.ledger import post
+from app import reservations
 
 
 class NewProductSaleForm(FlaskForm):
@@ -28,12 +32,14 @@ class NewProductSaleForm(FlaskForm):
         if not self.business:
             raise ValidationError("Could not identify the business for stock validation.")
         
+        # Stock counts items out at events too; a sale mustn't eat into any upcoming booking
+        jars_free, dispensers_free = reservations.sellable(self.business)
         if self.product_name.data == 'New Jar':
-            if quantity.data > self.business.jar_stock:
-                raise ValidationError(f'Not enough jars in stock. Only {self.business.jar_stock} available.')
+            if quantity.data > jars_free:
+                raise ValidationError(f'Not enough jars in stock. Only {max(jars_free, 0)} available.')
         elif self.product_name.data == 'Dispenser':
-            if quantity.data > self.business.dispenser_stock:
-                raise ValidationError(f'Not enough dispensers in stock. Only {self.business.dispenser_stock} available.')
+            if quantity.data > dispensers_free:
+                raise ValidationError(f'Not enough dispensers in stock. Only {max(dispensers_free, 0)} available.')
 
 
 @bp.route('/new_product', methods=['GET', 'POST'])
@@ -44,7 +50,7 @@ def new_product_sale():
         flash("You are not assigned to a business and cannot perform this action.", "warning")
         return redirect(url_for('delivery.dashboard'))
 
-    business = Business.query.get(current_user.business_id)
+    business = get_business()
     # Pass the business object to the form for validation
     form = NewProductSaleForm(business=business)
     
@@ -53,11 +59,16 @@ def new_product_sale():
         quantity = form.quantity.data
         
         # --- DEDUCT FROM STOCK ---
+        # The form check above can race with another sale; the guarded update can't oversell
+        stock_column = 'jar_stock' if product_name == 'New Jar' else 'dispenser_stock'
+        if adjust(Business, business.id, guard=True, **{stock_column: -quantity}) is None:
+            db.session.refresh(business)
+            flash(f'Not enough stock left. Only {getattr(business, stock_column)} available.', 'danger')
+            return redirect(url_for('sales.new_product_sale'))
+
         if product_name == 'New Jar':
-            business.jar_stock -= quantity
             price_per_item = business.new_jar_price
         else: # Dispenser
-            business.dispenser_stock -= quantity
             price_per_item = business.new_dispenser_price
 
         total_amount = quantity * price_per_item
@@ -74,9 +85,7 @@ def new_product_sale():
         )
         db.session.add(sale)
 
-        user = User.query.get(current_user.id)
-        if user.cash_balance is None: user.cash_balance = 0.0
-        user.cash_balance += total_amount
+        post('cash', current_user.id, total_amount, 'sale', current_user.business_id, source=sale)
         
         db.session.commit()
         
@@ -0,0 +1,155 @@
+# File: app/search_index.py
+
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app import db
+from app.models import Customer
+
+# Only the columns returned by delivery.search_customers are kept in memory.
+SEARCH_COLUMNS = (Customer.id, Customer.name, Customer.mobile_number, Customer.area,
+                  Customer.village, Customer.daily_jars, Customer.price_per_jar)
+SEARCH_FIELDS = ('id', 'name', 'mobile_number', 'area', 'village', 'daily_jars', 'price_per_jar')
+
+
+def normalize(text):
+    """Lower-cases and collapses whitespace so 'Ram  Kumar' and 'ram kumar' compare equal."""
+    return ' '.join((text or '').casefold().split())
+
+
+class _TenantIndex:
+    """Search structures for the customers of a single business."""
+
+    def __init__(self, rows):
+        self.rows = {row[0]: tuple(row) for row in rows}
+        # Sorted array of (normalized name, id) for prefix lookups with bisect
+        self.names = sorted((normalize(row[1]), row[0]) for row in rows)
+        # Digit trie over mobile numbers; each node is {digit: child, '#': [ids ending here]}
+        self.trie = {}
+        for row in rows:
+            node = self.trie
+            for digit in (row[2] or ''):
+                node = node.setdefault(digit, {})
+            node.setdefault('#', []).append(row[0])
+        self.built_at = time.monotonic()
+        self.last_used = self.built_at
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _mobile_prefix(self, digits, limit, found):
+        node = self.trie
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                return
+        stack = [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            for customer_id in node.get('#', ()):
+                found.setdefault(customer_id, None)
+            stack.extend(node[key] for key in sorted(node, reverse=True) if key != '#')
+
+    def _name_prefix(self, term, limit, found):
+        position = bisect.bisect_left(self.names, (term,))
+        while position < len(self.names) and len(found) < limit:
+            name, customer_id = self.names[position]
+            if not name.startswith(term):
+                break
+            found.setdefault(customer_id, None)
+            position += 1
+
+    def search(self, query, limit=10):
+        term = normalize(query)
+        if not term:
+            return []
+        found = OrderedDict()  # keeps insertion order and removes duplicates
+
+        if term.isdigit():
+            self._mobile_prefix(term, limit, found)
+        self._name_prefix(term, limit, found)
+
+        # Fall back to a substring scan so results match the old ILIKE '%q%' behaviour
+        if len(found) < limit:
+            for name, customer_id in self.names:
+                if term in name or term in (self.rows[customer_id][2] or ''):
+                    found.setdefault(customer_id, None)
+                    if len(found) >= limit:
+                        break
+
+        return [dict(zip(SEARCH_FIELDS, self.rows[customer_id])) for customer_id in list(found)[:limit]]
+
+
+class CustomerSearchIndex:
+    """
+    Lazily built, per-business in-memory index for the live customer search.
+    Tenants are evicted when idle, when their entry gets older than the TTL
+    (which bounds staleness across gunicorn workers), or when more than
+    CUSTOMER_SEARCH_INDEX_MAX_TENANTS businesses are cached.
+    """
+
+    def __init__(self):
+        self._tenants = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _config(self, key):
+        return current_app.config[f'CUSTOMER_SEARCH_INDEX_{key}']
+
+    def _evict(self, now):
+        idle_seconds = self._config('IDLE_SECONDS')
+        ttl = self._config('TTL')
+        for business_id, tenant in list(self._tenants.items()):
+            if now - tenant.last_used > idle_seconds or now - tenant.built_at > ttl:
+                del self._tenants[business_id]
+        max_tenants = self._config('MAX_TENANTS')
+        while len(self._tenants) > max_tenants:
+            self._tenants.popitem(last=False)  # least recently used
+
+    def _build(self, business_id):
+        max_customers = self._config('MAX_CUSTOMERS')
+        rows = db.session.query(*SEARCH_COLUMNS).filter(
+            Customer.business_id == business_id
+        ).limit(max_customers + 1).all()
+        if len(rows) > max_customers:
+            return None  # Too large to hold in memory; the caller queries the database
+        return _TenantIndex(rows)
+
+    def get(self, business_id):
+        """Returns the tenant index, building it on first use, or None if it cannot be cached."""
+        if not self._config('ENABLED') or not business_id:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            tenant = self._tenants.get(business_id)
+            if tenant is not None:
+                tenant.last_used = now
+                self._tenants.move_to_end(business_id)
+                return tenant
+
+        tenant = self._build(business_id)
+        if tenant is not None:
+            with self._lock:
+                self._tenants[business_id] = tenant
+                self._evict(time.monotonic())
+        return tenant
+
+    def search(self, business_id, query, limit=10):
+        """Returns a list of result dicts, or None when the database should be queried instead."""
+        tenant = self.get(business_id)
+        if tenant is None:
+            return None
+        return tenant.search(query, limit)
+
+    def invalidate(self, business_id):
+        with self._lock:
+            self._tenants.pop(business_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._tenants.clear()
+
+
+customer_search_index = CustomerSearchIndex()
@@ -15,6 +15,14 @@ from werkzeug.utils import secure_filename
 from sqlalchemy import func, cast, Date
 import calendar
 from app.email import send_order_status_update_email
+from app.identity import identifier_taken
+from app.counters import adjust
+from app.pagination import keyset_paginate, SortKey
+from app.loaders import load
+from app.projections import SUPPLIER_PRODUCT_LIST
+from app.reorder import DRAFT
+from app import report_cache
+from app.analytics import supplier_metrics
 
 class OrderStatusForm(FlaskForm):
     status = SelectField('Order Status', choices=[('Pending', 'Pending'), ('Confirmed', 'Confirmed'), ('Shipped', 'Shipped'), ('Delivered', 'Delivered'), ('Cancelled', 'Cancelled')], validators=[DataRequired()])
@@ -47,8 +55,7 @@ class SupplierProfileForm(FlaskForm):
 
     def validate_email(self, email):
         if email.data and email.data != self.original_email:
-            user = User.query.filter(User.email == email.data, User.id != current_user.id).first()
-            if user:
+            if identifier_taken('email', email.data, exclude=current_user):
                 raise ValidationError('This email address is already registered.')
 
 class ChangePasswordForm(FlaskForm):
@@ -251,7 +258,13 @@ def procurement_payment_success():
 @supplier_required
 def dashboard():
     supplier_profile = SupplierProfile.query.filter_by(user_id=current_user.id).first_or_404()
-    orders = PurchaseOrder.query.filter_by(supplier_id=supplier_profile.id).order_by(PurchaseOrder.order_date.desc()).all()
+    orders = keyset_paginate(
+        PurchaseOrder.query.options(*load('supplier_order_list')).filter(
+            PurchaseOrder.supplier_id == supplier_profile.id, PurchaseOrder.status != DRAFT
+        ),
+        [SortKey(PurchaseOrder.order_date, descending=True), SortKey(PurchaseOrder.id, descending=True)],
+        cursor=request.args.get('cursor'), per_page=20
+    )
     return render_template('supplier/dashboard.html', title="Supplier Dashboard", orders=orders, user=current_user)
 
 @bp.route('/products')
@@ -259,7 +272,9 @@ def dashboard():
 @supplier_required
 def product_list():
     supplier_profile = SupplierProfile.query.filter_by(user_id=current_user.id).first_or_404()
-    products = SupplierProduct.query.filter_by(supplier_id=supplier_profile.id).order_by(SupplierProduct.name).all()
+    products = db.session.query(*SUPPLIER_PRODUCT_LIST).filter(
+        SupplierProduct.supplier_id == supplier_profile.id
+    ).order_by(SupplierProduct.name).all()
     return render_template('supplier/product_list.html', title="Manage My Products", products=products)
 
 @bp.route('/add_product', methods=['GET', 'POST'])
@@ -323,8 +338,8 @@ def delete_product(product_id):
 @login_required
 @supplier_required
 def order_details(order_id):
-    order = PurchaseOrder.query.get_or_404(order_id)
-    if order.supplier.user_id != current_user.id:
+    order = PurchaseOrder.query.options(*load('purchase_order_document')).get_or_404(order_id)
+    if order.supplier.user_id != current_user.id or order.status == DRAFT:
         abort(403)
     
     is_locked = order.status in ['Delivered', 'Cancelled']
@@ -341,11 +356,9 @@ def order_details(order_id):
             order.completion_date = datetime.utcnow() # <-- SET COMPLETION DATE
             business = Business.query.get(order.business_id)
             if business:
-                for item in order.items:
-                    if item.product.category == 'Jars':
-                        business.jar_stock += item.quantity
-                    elif item.product.category == 'Dispensers':
-                        business.dispenser_stock += item.quantity
+                jars = sum(item.quantity for item in order.items if item.product.category == 'Jars')
+                dispensers = sum(item.quantity for item in order.items if item.product.category == 'Dispensers')
+                adjust(Business, business.id, jar_stock=jars, dispenser_stock=dispensers)
                 flash(f'Stock for {business.name} has been updated.', 'info')
 
         if new_status == 'Delivered' and not order.invoice_number:
@@ -368,8 +381,8 @@ def order_details(order_id):
 @login_required
 @supplier_required
 def view_procurement_invoice(order_id):
-    order = PurchaseOrder.query.get_or_404(order_id)
-    if order.supplier.user_id != current_user.id:
+    order = PurchaseOrder.query.options(*load('purchase_order_document')).get_or_404(order_id)
+    if order.supplier.user_id != current_user.id or order.status == DRAFT:
         abort(403)
     manager = User.query.filter_by(business_id=order.business_id, role='manager').first()
     return render_template('procurement/invoice_template.html', order=order, manager=manager)
@@ -440,45 +453,13 @@ def reports():
     else:
         end_of_month = datetime(report_year, report_month + 1, 1)
 
-    sales_items = db.session.query(
-        PurchaseOrderItem.quantity,
-        PurchaseOrderItem.price_at_purchase,
-        SupplierProduct.manufacture_price,
-        SupplierProduct.name
-    ).join(PurchaseOrder).join(SupplierProduct).filter(
-        PurchaseOrder.supplier_id == supplier_profile.id,
-        PurchaseOrder.status == 'Delivered',
-        PurchaseOrder.completion_date >= start_of_month,  # <-- USE COMPLETION DATE
-        PurchaseOrder.completion_date < end_of_month    # <-- USE COMPLETION DATE
-    ).all()
-
-    total_sales_amount = 0
-    total_cost = 0
-    product_summary = {}
-
-    for item in sales_items:
-        sale_value = item.quantity * item.price_at_purchase
-        cost_value = item.quantity * (item.manufacture_price or 0)
-        
-        total_sales_amount += sale_value
-        total_cost += cost_value
-
-        if item.name not in product_summary:
-            product_summary[item.name] = {'quantity': 0, 'sales': 0, 'income': 0}
-        
-        product_summary[item.name]['quantity'] += item.quantity
-        product_summary[item.name]['sales'] += sale_value
-        product_summary[item.name]['income'] += (sale_value - cost_value)
-
-    net_income = total_sales_amount - total_cost
+    # Cached per data version of the supplier, which every order and product change bumps
+    payload = report_cache.cached_report('supplier', supplier_profile.id, (report_year, report_month),
+                                         lambda: supplier_metrics(supplier_profile.id, start_of_month, end_of_month))
 
     return render_template('supplier/reports.html',
                            title="Monthly Report",
                            report_month=report_month,
                            report_year=report_year,
                            current_year=today_utc.year,
-                           total_sales_amount=total_sales_amount,
-                           total_cost=total_cost,
-                           net_income=net_income,
-                           product_summary=product_summary)
-
+                           **payload)
@@ -0,0 +1,41 @@
+# File: app/tenant.py
+
+from flask import g, has_request_context
+from flask_login import current_user
+from app import db
+from app.models import Business
+
+
+def get_business(for_update=False):
+    """
+    Returns the current user's Business, loaded at most once per request and kept in g.business.
+
+    Pass for_update=True before changing stock: the row is (re)selected with
+    SELECT ... FOR UPDATE and stays locked until the current transaction ends.
+    SQLite ignores the lock clause.
+    """
+    if not has_request_context() or not current_user.is_authenticated:
+        return None
+    business_id = getattr(current_user, 'business_id', None)
+    if not business_id:
+        return None
+
+    business = g.get('business')
+    transaction = db.session().get_transaction()
+    locked = transaction is not None and g.get('business_lock') is transaction
+
+    if business is None or (for_update and not locked):
+        query = Business.query.filter_by(id=business_id)
+        if for_update:
+            query = query.with_for_update().populate_existing()
+        business = query.first()
+        g.business = business
+        if for_update:
+            g.business_lock = db.session().get_transaction()
+    return business
+
+
+def loaded_business():
+    """The request's Business if a view or decorator already loaded it, without querying."""
+    return g.get('business') if has_request_context() else None
+
@@ -0,0 +1,106 @@
+# File: app/timeline.py
+
+from datetime import datetime
+from sqlalchemy import select, union_all, literal, cast, func, tuple_, null, Integer, Float, String
+from app import db
+from app.models import DailyLog, JarRequest, EventBooking, Invoice, coded_text
+
+KINDS = ('delivery', 'event', 'invoice', 'request')
+
+# Typed NULLs for the columns a branch doesn't have: PostgreSQL types a bare NULL in
+# a subquery as text, which can't then be matched with the other branches' numbers
+NO_QUANTITY, NO_AMOUNT, NO_REFERENCE = cast(null(), Integer), cast(null(), Float), cast(null(), String)
+
+
+def _date_as_timestamp(column):
+    """Invoices only have a date; compare it as midnight in the same format as the other timestamps."""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # SQLite stores DateTime as 'YYYY-MM-DD HH:MM:SS.ffffff' text
+        return func.strftime('%Y-%m-%d %H:%M:%S.000000', column)
+    return cast(column, db.DateTime)
+
+
+def _branches(customer_id):
+    """(select, timestamp column, date-only column or None) for every activity source."""
+    return [
+        (select(
+            DailyLog.timestamp.label('ts'), literal('delivery').label('kind'), DailyLog.id.label('id'),
+            DailyLog.jars_delivered.label('quantity'), DailyLog.amount_collected.label('amount'),
+            coded_text(DailyLog.payment_status).label('status'), NO_REFERENCE.label('reference')
+        ).where(DailyLog.customer_id == customer_id), DailyLog.timestamp, None),
+        (select(
+            JarRequest.request_timestamp, literal('request'), JarRequest.id,
+            JarRequest.quantity, NO_AMOUNT, coded_text(JarRequest.status), NO_REFERENCE
+        ).where(JarRequest.customer_id == customer_id), JarRequest.request_timestamp, None),
+        (select(
+            EventBooking.request_timestamp, literal('event'), EventBooking.id,
+            EventBooking.quantity, EventBooking.amount, coded_text(EventBooking.status), cast(EventBooking.event_date, db.String)
+        ).where(EventBooking.customer_id == customer_id), EventBooking.request_timestamp, None),
+        (select(
+            _date_as_timestamp(Invoice.issue_date), literal('invoice'), Invoice.id,
+            NO_QUANTITY, Invoice.total_amount, coded_text(Invoice.status), Invoice.invoice_number
+        ).where(Invoice.customer_id == customer_id), None, Invoice.issue_date),
+    ]
+
+
+def encode_cursor(row):
+    return f"{row.ts.isoformat()}~{row.kind}~{row.id}"
+
+
+def decode_cursor(value, kinds=KINDS):
+    """Returns (timestamp, kind, id) or None for a missing or malformed cursor."""
+    try:
+        ts, kind, row_id = value.split('~')
+        if kind not in kinds:
+            return None
+        return datetime.fromisoformat(ts), kind, int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def customer_timeline(customer_id, before=None, after=None, per_page=10):
+    """
+    One page of a customer's deliveries, jar requests, event bookings and invoices,
+    newest first, as a single UNION ALL with keyset pagination on (timestamp, kind, id).
+
+    Each branch is limited to per_page + 1 rows on its (customer_id, timestamp) index
+    before the union, so a page costs the same on the first day and after five years.
+
+    Returns (rows, newer_cursor, older_cursor); a cursor is None when there is no such page.
+    """
+    cursor = decode_cursor(after) or decode_cursor(before)
+    newer = cursor is not None and decode_cursor(after) is not None
+
+    parts = []
+    for query, ts_column, date_column in _branches(customer_id):
+        if cursor:
+            if date_column is not None:
+                bound = cursor[0].date()
+                query = query.where(date_column >= bound if newer else date_column <= bound)
+            else:
+                query = query.where(ts_column >= cursor[0] if newer else ts_column <= cursor[0])
+        order_column = date_column if date_column is not None else ts_column
+        query = query.order_by(order_column.asc() if newer else order_column.desc()).limit(per_page + 1)
+        parts.append(select(query.subquery()))
+    timeline = union_all(*parts).subquery()
+
+    key = tuple_(timeline.c.ts, timeline.c.kind, timeline.c.id)
+    query = select(timeline)
+    if cursor:
+        query = query.where(key > tuple_(*cursor) if newer else key < tuple_(*cursor))
+    if newer:
+        query = query.order_by(timeline.c.ts.asc(), timeline.c.kind.asc(), timeline.c.id.asc())
+    else:
+        query = query.order_by(timeline.c.ts.desc(), timeline.c.kind.desc(), timeline.c.id.desc())
+    rows = db.session.execute(query.limit(per_page + 1)).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if newer:
+        rows.reverse()
+        newer_cursor = encode_cursor(rows[0]) if rows and has_more else None
+        older_cursor = encode_cursor(rows[-1]) if rows else None
+    else:
+        newer_cursor = encode_cursor(rows[0]) if rows and cursor else None
+        older_cursor = encode_cursor(rows[-1]) if rows and has_more else None
+    return rows, newer_cursor, older_cursor
@@ -0,0 +1,46 @@
+# File: app/unit_of_work.py
+
+from functools import wraps
+from flask import g
+from app import db
+
+
+def after_commit(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) once the request's unit of work has committed, so an
+    email or push notification never goes out for a transaction that was rolled back.
+    Outside a unit of work it runs straight away.
+    """
+    callbacks = g.get('after_commit')
+    if callbacks is None:
+        func(*args, **kwargs)
+    else:
+        callbacks.append((func, args, kwargs))
+
+
+def unit_of_work(view):
+    """
+    One transaction per request. The view and the helpers it calls only add and flush;
+    the session is committed once after the view returns, or rolled back if it raises
+    (abort() included). Put it below @login_required:
+
+        @bp.route('/log_delivery/<int:customer_id>', methods=['POST'])
+        @login_required
+        @unit_of_work
+        def log_delivery(customer_id):
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.after_commit = []
+        try:
+            response = view(*args, **kwargs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            callbacks = g.pop('after_commit', [])
+        for func, func_args, func_kwargs in callbacks:
+            func(*func_args, **func_kwargs)
+        return response
+    return wrapper
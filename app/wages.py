@@ -1,9 +1,10 @@
 # /water_supply_app/app/wages.py
 
-from .models import User, DailyLog, Expense, Business # Import Business
+from .models import User, Expense
 from . import db
+from .ledger import post
+from .payroll import day_attendance
 from datetime import date, datetime, time
-from sqlalchemy import func
 
 def deduct_daily_wages(app):
     """
@@ -17,10 +18,12 @@ def deduct_daily_wages(app):
         end_of_day = datetime.combine(today, time.max)
         
         # Filter for staff who are on daily wages
-        staff_members = User.query.filter_by(role='staff', wage_type='daily').all()
+        staff_members = User.query.filter_by(role='staff', wage_type='daily').order_by(User.business_id, User.id).all()
         
         print(f"--- [SCHEDULER] Running Daily Wage Deduction for {today.isoformat()} ---")
 
+        # Today's attendance for all of a business's staff at once (app.payroll)
+        attendance_by_business = {}
         for staff in staff_members:
             # Ensure staff has a daily wage set and belongs to a business with settings
             if not staff.daily_wage or staff.daily_wage <= 0 or not staff.business:
@@ -29,44 +32,32 @@ def deduct_daily_wages(app):
 
             business_settings = staff.business # Get the business object
 
-            # Fetch jar counts from the associated business settings
-            full_day_min = business_settings.full_day_jar_count
-            half_day_min = business_settings.half_day_jar_count
-
             # If thresholds are not set in business, skip calculation for this staff
-            if full_day_min is None or half_day_min is None:
+            if business_settings.full_day_jar_count is None or business_settings.half_day_jar_count is None:
                  print(f"Skipping {staff.username}: Business attendance thresholds not set.")
                  continue
 
-            
-            jars_sold = db.session.query(func.sum(DailyLog.jars_delivered)).filter(
-                DailyLog.user_id == staff.id,
-                DailyLog.timestamp.between(start_of_day, end_of_day)
-            ).scalar() or 0
+            if business_settings.id not in attendance_by_business:
+                attendance_by_business[business_settings.id] = day_attendance(business_settings, start_of_day, end_of_day)
+            attendance_status, jars_sold = attendance_by_business[business_settings.id].get(staff.id, ("Absent", 0))
 
             wage_to_deduct = 0
-            attendance_status = "Absent"
-
-            if jars_sold >= full_day_min:
+            if attendance_status == "Full Day":
                 wage_to_deduct = staff.daily_wage
-                attendance_status = "Full Day"
-            elif jars_sold >= half_day_min:
+            elif attendance_status == "Half Day":
                 wage_to_deduct = staff.daily_wage / 2
-                attendance_status = "Half Day"
 
             if wage_to_deduct > 0:
-                # Ensure cash balance is not None before deducting
-                if staff.cash_balance is None:
-                    staff.cash_balance = 0.0
-                staff.cash_balance -= wage_to_deduct
                 
                 wage_expense = Expense(
                     amount=wage_to_deduct,
                     description=f"Daily Wage ({attendance_status})",
+                    category='wage',
                     user_id=staff.id,
                     timestamp=datetime.utcnow()
                 )
                 db.session.add(wage_expense)
+                post('cash', staff.id, -wage_to_deduct, 'wage', staff.business_id, source=wage_expense)
                 print(f"Deducted ₹{wage_to_deduct:.2f} from {staff.username} ({attendance_status}, {jars_sold} jars).")
             else:
                 print(f"No daily wage deducted for {staff.username} ({attendance_status}, {jars_sold} jars).")
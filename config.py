@@ -44,6 +44,53 @@ class Config:
     VAPID_PRIVATE_KEY = os.environ.get('VAPID_PRIVATE_KEY')
     VAPID_ADMIN_EMAIL = os.environ.get('VAPID_ADMIN_EMAIL')
 
+    # --- In-memory customer search index (delivery live search) ---
+    CUSTOMER_SEARCH_INDEX_ENABLED = os.environ.get('CUSTOMER_SEARCH_INDEX_ENABLED', 'true').lower() in ['true', 'on', '1']
+    CUSTOMER_SEARCH_INDEX_MAX_TENANTS = int(os.environ.get('CUSTOMER_SEARCH_INDEX_MAX_TENANTS', 50))
+    CUSTOMER_SEARCH_INDEX_MAX_CUSTOMERS = int(os.environ.get('CUSTOMER_SEARCH_INDEX_MAX_CUSTOMERS', 20000))
+    CUSTOMER_SEARCH_INDEX_IDLE_SECONDS = int(os.environ.get('CUSTOMER_SEARCH_INDEX_IDLE_SECONDS', 900))
+    CUSTOMER_SEARCH_INDEX_TTL = int(os.environ.get('CUSTOMER_SEARCH_INDEX_TTL', 300))
+
+    # --- Bulk customer import (CSV/XLSX) ---
+    CUSTOMER_IMPORT_BATCH_SIZE = int(os.environ.get('CUSTOMER_IMPORT_BATCH_SIZE', 500))
+    CUSTOMER_IMPORT_HASH_WORKERS = int(os.environ.get('CUSTOMER_IMPORT_HASH_WORKERS', 4))
+
+    # --- Nightly jar forecast (app/forecast.py) ---
+    FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', 365))
+    FORECAST_HORIZON_DAYS = int(os.environ.get('FORECAST_HORIZON_DAYS', 7))
+    FORECAST_ALPHA = float(os.environ.get('FORECAST_ALPHA', 0.05))
+
+    # --- Nightly reorder suggestions and draft purchase orders (app/reorder.py), in days ---
+    REORDER_WINDOW_DAYS = int(os.environ.get('REORDER_WINDOW_DAYS', 30))
+    REORDER_LEAD_DAYS = int(os.environ.get('REORDER_LEAD_DAYS', 3))
+    REORDER_SAFETY_DAYS = int(os.environ.get('REORDER_SAFETY_DAYS', 2))
+    REORDER_COVER_DAYS = int(os.environ.get('REORDER_COVER_DAYS', 14))
+
+    # --- Nightly period close (app/periods.py): last month is frozen once this many days of the new month have passed ---
+    PERIOD_CLOSE_GRACE_DAYS = int(os.environ.get('PERIOD_CLOSE_GRACE_DAYS', 3))
+
+    # --- Monthly table partitions on PostgreSQL (app/partitions.py): months created ahead of the current one ---
+    PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+
+    # --- Report cache (app/report_cache.py): entries kept per worker, 0 disables; optional Redis shared by all workers (pip install redis) ---
+    REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 256))
+    REPORT_CACHE_REDIS_URL = os.environ.get('REPORT_CACHE_REDIS_URL')
+    REPORT_CACHE_SHARED_TTL = int(os.environ.get('REPORT_CACHE_SHARED_TTL', 86400))
+    # Businesses with at least this many customers get manager.reports computed in the background (app/reports.py); 0 disables
+    REPORT_ASYNC_MIN_CUSTOMERS = int(os.environ.get('REPORT_ASYNC_MIN_CUSTOMERS', 5000))
+    REPORT_JOB_KEEP_HOURS = int(os.environ.get('REPORT_JOB_KEEP_HOURS', 24))
+    # Queued/running report jobs older than this are taken as lost (e.g. their worker was killed) and started again
+    REPORT_JOB_TIMEOUT_MINUTES = int(os.environ.get('REPORT_JOB_TIMEOUT_MINUTES', 15))
+
+    # --- Principal cache (load_user), in seconds; 0 disables ---
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 30))
+
+    # --- Log the number of SQL queries per request and add an X-Query-Count header ---
+    QUERY_COUNT_LOGGING = os.environ.get('QUERY_COUNT_LOGGING', 'false').lower() in ['true', 'on', '1']
+
+    # --- Raise on any relationship a route's loader profile doesn't cover (app/loaders.py); for tests and development ---
+    SQLALCHEMY_RAISELOAD = os.environ.get('SQLALCHEMY_RAISELOAD', 'false').lower() in ['true', 'on', '1']
+
     # --- Babel (Internationalization) ---
     LANGUAGES = {
         'en': 'English',
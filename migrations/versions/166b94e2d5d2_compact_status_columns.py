@@ -0,0 +1,130 @@
+"""Compact status columns
+
+Revision ID: 166b94e2d5d2
+Revises: ebc92a424d91
+Create Date: 2026-10-19 07:52:56.242233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '166b94e2d5d2'
+down_revision = 'ebc92a424d91'
+branch_labels = None
+depends_on = None
+
+
+# String columns stored as SMALLINT codes from now on (app.models.Coded): table ->
+# [(column, values in code order, old string length, old server default)]
+COLUMNS = {
+    'user': [('role', ('admin', 'manager', 'staff', 'supplier'), 10, None)],
+    'customer': [('customer_type', ('customer', 'dealer'), 10, 'customer')],
+    'daily_log': [('payment_status', ('Paid', 'Due'), 20, None),
+                  ('payment_method', ('Cash', 'Online', 'Due'), 20, None),
+                  ('origin', ('staff_log', 'customer_request'), 20, 'staff_log')],
+    'jar_request': [('status', ('Pending', 'Delivered'), 20, None)],
+    'event_booking': [('status', ('Pending', 'Confirmed', 'Delivered', 'Completed'), 20, None)],
+    'purchase_order': [('status', ('Draft', 'Pending', 'COD - Placed', 'Paid - Online', 'Payment Failed', 'Confirmed',
+                                   'Shipped', 'Delivered', 'Cancelled'), 20, None)],
+    'invoice': [('status', ('Unpaid', 'Paid', 'Overdue'), 20, None)],
+}
+
+# Full indexes on the old string columns, replaced by the partial indexes below
+OLD_INDEXES = [('user', 'ix_user_role', ['role']),
+               ('jar_request', 'ix_jar_request_status', ['status']),
+               ('event_booking', 'ix_event_booking_status', ['status'])]
+
+# (table, name, columns, WHERE on the codes)
+PARTIAL_INDEXES = [
+    ('user', 'ix_user_business_staff', ['business_id', 'username'], 'role = 2'),
+    ('customer', 'ix_customer_business_dealer', ['business_id', 'name'], 'customer_type = 1'),
+    ('daily_log', 'ix_daily_log_due', ['customer_id'], 'payment_status = 1'),
+    ('jar_request', 'ix_jar_request_pending', ['request_timestamp'], 'status = 0'),
+    ('event_booking', 'ix_event_booking_open', ['event_date'], 'status IN (0, 1, 2)'),
+    ('event_booking', 'ix_event_booking_completed', ['collection_timestamp'], 'status = 3'),
+    ('purchase_order', 'ix_purchase_order_draft', ['business_id', 'supplier_id'], 'status = 0'),
+    ('invoice', 'ix_invoice_unpaid', ['customer_id'], 'status = 0'),
+]
+
+
+def _quote(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _to_codes(column, values):
+    return f'CASE "{column}" ' + ' '.join(f'WHEN {_quote(value)} THEN {code}' for code, value in enumerate(values)) + ' END'
+
+
+def _to_strings(column, values):
+    return f'CASE "{column}" ' + ' '.join(f'WHEN {code} THEN {_quote(value)}' for code, value in enumerate(values)) + ' END'
+
+
+def _check_values(conn):
+    """Refuses to start if a row holds a value without a code, rather than losing it."""
+    problems = []
+    for table, columns in COLUMNS.items():
+        for column, values, _, _ in columns:
+            unknown = conn.execute(sa.text(
+                f'SELECT DISTINCT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL AND "{column}" NOT IN ('
+                + ', '.join(_quote(value) for value in values) + ')'
+            )).scalars().all()
+            if unknown:
+                problems.append(f'{table}.{column}: {unknown}')
+    if problems:
+        raise RuntimeError('Values without a code; fix these rows or add the values to app.models and this '
+                           'migration first: ' + '; '.join(problems))
+
+
+def _convert(conn, table, columns, to_codes):
+    """Converts the columns of one table in place, between strings and codes."""
+    changes = []
+    for column, values, length, default in columns:
+        string_type, code_type = sa.String(length=length), sa.SmallInteger()
+        string_default = _quote(default) if default else None
+        code_default = str(values.index(default)) if default else None
+        if to_codes:
+            changes.append((column, string_type, code_type, string_default, code_default, _to_codes(column, values)))
+        else:
+            changes.append((column, code_type, string_type, code_default, string_default, _to_strings(column, values)))
+
+    if conn.dialect.name == 'postgresql':
+        for column, old_type, new_type, old_default, new_default, using in changes:
+            if old_default is not None:
+                op.alter_column(table, column, server_default=None)
+            op.alter_column(table, column, type_=new_type, existing_type=old_type, postgresql_using=using)
+            if new_default is not None:
+                op.alter_column(table, column, server_default=sa.text(new_default))
+        return
+
+    # SQLite can't change a column's type: rewrite the values, then let batch mode copy the table
+    for column, _, _, _, _, using in changes:
+        conn.execute(sa.text(f'UPDATE "{table}" SET "{column}" = {using}'))
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        for column, old_type, new_type, old_default, new_default, _ in changes:
+            batch_op.alter_column(column, type_=new_type, existing_type=old_type,
+                                  server_default=sa.text(new_default) if new_default is not None else None,
+                                  existing_server_default=sa.text(old_default) if old_default is not None else None)
+
+
+def upgrade():
+    conn = op.get_bind()
+    _check_values(conn)
+    for table, name, _ in OLD_INDEXES:
+        op.drop_index(op.f(name), table_name=table)
+    for table, columns in COLUMNS.items():
+        _convert(conn, table, columns, to_codes=True)
+    for table, name, columns, where in PARTIAL_INDEXES:
+        op.create_index(name, table, columns, unique=False,
+                        postgresql_where=sa.text(where), sqlite_where=sa.text(where))
+
+
+def downgrade():
+    conn = op.get_bind()
+    for table, name, _, _ in PARTIAL_INDEXES:
+        op.drop_index(name, table_name=table)
+    for table, columns in COLUMNS.items():
+        _convert(conn, table, columns, to_codes=False)
+    for table, name, columns in OLD_INDEXES:
+        op.create_index(op.f(name), table, columns, unique=False)
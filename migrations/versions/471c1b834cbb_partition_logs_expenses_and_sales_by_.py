@@ -0,0 +1,125 @@
+"""Partition logs expenses and sales by month
+
+Revision ID: 471c1b834cbb
+Revises: 166b94e2d5d2
+Create Date: 2026-10-19 09:12:40.518306
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '471c1b834cbb'
+down_revision = '166b94e2d5d2'
+branch_labels = None
+depends_on = None
+
+
+# On PostgreSQL these tables become range-partitioned by month on "timestamp"
+# (app/partitions.py). The partition key has to be part of the primary key, so it
+# becomes (id, timestamp) there and timestamp becomes NOT NULL everywhere. SQLite
+# only gets the NOT NULL.
+TABLES = {
+    'daily_log': {
+        'indexes': [('ix_daily_log_timestamp', ['timestamp'], None),
+                    ('ix_daily_log_customer_id_timestamp', ['customer_id', 'timestamp'], None),
+                    ('ix_daily_log_due', ['customer_id'], 'payment_status = 1')],
+        'foreign_keys': [('fk_daily_log_customer_id_customer', 'customer', 'customer_id'),
+                         ('fk_daily_log_user_id_user', 'user', 'user_id')],
+    },
+    'expense': {
+        'indexes': [('ix_expense_timestamp', ['timestamp'], None),
+                    ('ix_expense_user_category_timestamp', ['user_id', 'category', 'timestamp'], None)],
+        'foreign_keys': [('fk_expense_user_id_user', 'user', 'user_id')],
+    },
+    'product_sale': {
+        'indexes': [('ix_product_sale_timestamp', ['timestamp'], None)],
+        'foreign_keys': [('fk_product_sale_business_id_business', 'business', 'business_id'),
+                         ('fk_product_sale_user_id_user', 'user', 'user_id')],
+    },
+}
+
+# Rows that never had a timestamp: before every monthly partition, so they end up in the default one
+MISSING_TIMESTAMP = '1970-01-01 00:00:00'
+
+# Months created ahead of the current one; the nightly job keeps this up from here (PARTITION_MONTHS_AHEAD)
+MONTHS_AHEAD = 3
+
+
+def _add_months(year, month, n):
+    index = year * 12 + month - 1 + n
+    return index // 12, index % 12 + 1
+
+
+def _months(conn, table):
+    """(year, month) of every month from the oldest row's to MONTHS_AHEAD months from now."""
+    oldest = conn.execute(sa.text(
+        f'SELECT MIN("timestamp") FROM "{table}_unpartitioned" WHERE "timestamp" > :missing'
+    ), {'missing': MISSING_TIMESTAMP}).scalar()
+    now = datetime.utcnow()
+    year, month = (oldest.year, oldest.month) if oldest else (now.year, now.month)
+    last = _add_months(now.year, now.month, MONTHS_AHEAD)
+    while (year, month) <= last:
+        yield year, month
+        year, month = _add_months(year, month, 1)
+
+
+def _recreate_keys(table, spec, primary_key):
+    op.create_primary_key(f'pk_{table}', table, primary_key)
+    for name, columns, where in spec['indexes']:
+        op.create_index(name, table, columns, unique=False, postgresql_where=sa.text(where) if where else None)
+    for name, referred_table, column in spec['foreign_keys']:
+        op.create_foreign_key(name, table, referred_table, [column], ['id'])
+
+
+def _copy_into(conn, table, old):
+    """Moves the rows of `old` into the new `table` and hands it the id sequence."""
+    conn.execute(sa.text(f'INSERT INTO "{table}" SELECT * FROM "{old}"'))
+    sequence = conn.execute(sa.text('SELECT pg_get_serial_sequence(:table, \'id\')'), {'table': old}).scalar()
+    if sequence:
+        conn.execute(sa.text(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id'))
+    conn.execute(sa.text(f'DROP TABLE "{old}" CASCADE'))
+
+
+def upgrade():
+    conn = op.get_bind()
+    for table in TABLES:
+        conn.execute(sa.text(f'UPDATE "{table}" SET "timestamp" = :missing WHERE "timestamp" IS NULL'),
+                     {'missing': MISSING_TIMESTAMP})
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=False)
+
+    if conn.dialect.name != 'postgresql':
+        return
+
+    for table, spec in TABLES.items():
+        old = f'{table}_unpartitioned'
+        op.rename_table(table, old)
+        conn.execute(sa.text(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                             f'PARTITION BY RANGE ("timestamp")'))
+        conn.execute(sa.text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+        for year, month in _months(conn, table):
+            next_year, next_month = _add_months(year, month, 1)
+            conn.execute(sa.text(
+                f'CREATE TABLE "{table}_p{year}{month:02d}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{year}-{month:02d}-01') TO ('{next_year}-{next_month:02d}-01')"))
+        _copy_into(conn, table, old)
+        _recreate_keys(table, spec, ['id', 'timestamp'])
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        for table, spec in TABLES.items():
+            old = f'{table}_partitioned'
+            op.rename_table(table, old)
+            conn.execute(sa.text(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+            # Dropping the partitioned table drops its partitions too
+            _copy_into(conn, table, old)
+            _recreate_keys(table, spec, ['id'])
+
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,81 @@
+"""Add login_identity table for unified login and uniqueness checks
+
+Revision ID: 666ad1250e8f
+Revises: 8601181ce170
+Create Date: 2026-10-19 10:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '666ad1250e8f'
+down_revision = '8601181ce170'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    login_identity = op.create_table('login_identity',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('identifier', sa.String(length=120), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.CheckConstraint("kind IN ('username', 'email', 'mobile')", name=op.f('ck_login_identity_ck_login_identity_kind')),
+    sa.CheckConstraint('(user_id IS NULL) != (customer_id IS NULL)', name=op.f('ck_login_identity_ck_login_identity_owner')),
+    sa.ForeignKeyConstraint(['customer_id'], ['customer.id'], name=op.f('fk_login_identity_customer_id_customer'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name=op.f('fk_login_identity_user_id_user'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_login_identity'))
+    )
+    with op.batch_alter_table('login_identity', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_login_identity_identifier'), ['identifier'], unique=False)
+        batch_op.create_index(batch_op.f('ix_login_identity_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_login_identity_customer_id'), ['customer_id'], unique=False)
+        batch_op.create_index('uq_login_identity_kind_identifier', ['kind', 'identifier'], unique=True,
+                              postgresql_where=sa.text("kind != 'mobile'"), sqlite_where=sa.text("kind != 'mobile'"))
+
+    # --- Backfill from existing users and customers ---
+    # Usernames/emails that only differ by case were allowed before; the first
+    # owner (employees before customers) keeps the identifier, and every clash
+    # is reported so the others can be given a new one.
+    conn = op.get_bind()
+    rows = []
+    seen = {}
+    collisions = []
+    sources = [
+        ('user_id', sa.text('SELECT id, username, email, mobile_number FROM "user" ORDER BY id')),
+        ('customer_id', sa.text('SELECT id, username, email, mobile_number FROM customer ORDER BY id')),
+    ]
+    for owner_column, query in sources:
+        for owner_id, username, email, mobile_number in conn.execute(query):
+            for kind, value in (('username', username), ('email', email), ('mobile', mobile_number)):
+                identifier = (value or '').strip().lower()
+                if not identifier:
+                    continue
+                key = (kind, identifier, owner_column, owner_id) if kind == 'mobile' else (kind, identifier)
+                if key in seen:
+                    if kind != 'mobile':
+                        collisions.append(f'{owner_column[:-3]} {owner_id} {kind} {value!r} '
+                                          f'(kept by {seen[key][0][:-3]} {seen[key][1]})')
+                    continue
+                seen[key] = (owner_column, owner_id)
+                rows.append({'kind': kind, 'identifier': identifier, 'user_id': None, 'customer_id': None, owner_column: owner_id})
+    if rows:
+        op.bulk_insert(login_identity, rows)
+    if collisions:
+        print(f'WARNING: {len(collisions)} login identifier(s) already belong to someone else and were not '
+              'added; these can\'t log in with them until they are changed:')
+        for collision in collisions:
+            print(f'  - {collision}')
+
+
+def downgrade():
+    with op.batch_alter_table('login_identity', schema=None) as batch_op:
+        batch_op.drop_index('uq_login_identity_kind_identifier')
+        batch_op.drop_index(batch_op.f('ix_login_identity_customer_id'))
+        batch_op.drop_index(batch_op.f('ix_login_identity_user_id'))
+        batch_op.drop_index(batch_op.f('ix_login_identity_identifier'))
+
+    op.drop_table('login_identity')